@@ -1,45 +1,106 @@
 # /Lumina_Beauty_MVC/app.py
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, abort, \
+    make_response, g
 from collections import Counter
 import copy
+import math
 import model  # Importa nosso arquivo model.py
-from werkzeug.security import check_password_hash
+import senhas
+import os
 import secrets
 from string import ascii_letters, digits, punctuation
 import re
 
-# Bibliotecas para o QR Code
-import qrcode
-import io
-import base64
+# QR Code do Pix (com cache)
+import pix
+
+# Latência, tamanho e SQL por rota (exposto em /admin/metrics)
+import metricas
+import consultas_lentas
+import perfis
+
+# Imagens responsivas (srcset + cache longo)
+import imagens
+
+# Grades de produtos já renderizadas (por versão do catálogo)
+import fragmentos
+
+# ETag / Last-Modified: 304 para quem já tem a página
+import condicional
+
+# Sugestões da busca em memória (limite de resultados)
+import sugestoes
+
+# Recomendação do Quiz por tags (limite de resultados)
+import recomendador
+
+# Cotação de frete (faixas de CEP, peso e valor)
+import frete
+
+# Endereço por CEP (base local compilada, sem API externa)
+import ceps
 
 app = Flask(__name__)
 app.secret_key = 'chave_sereta_lumina'
 
-# --- (CONTROLLER) FUNÇÕES AUXILIARES ---
+# Caches do catálogo são por processo: no começo de cada requisição confere
+# se outro worker/script mudou o catálogo; no fim devolve a conexão ao pool
+app.before_request(model.sincronizar_catalogo)
+app.teardown_appcontext(model.close_db_connection)
+metricas.instalar(app)
+perfis.instalar(app)
+imagens.instalar(app)
+app.jinja_env.globals['frete_gratis_acima'] = frete.FRETE_GRATIS_ACIMA
 
 
-@app.context_processor
-def inject_user_info():
-    """Injeta informações do usuário e contagem do carrinho em todos os templates."""
-    total_itens = session.get('total_itens_badge', 0)
+@app.errorhandler(senhas.FilaCheia)
+def servidor_ocupado(e):
+    """Fila de hash de senha cheia: responde 503 na hora em vez de travar."""
+    return "Servidor ocupado. Tente novamente em alguns segundos.", 503, {'Retry-After': '2'}
 
-    if 'user_id' in session:
-        return {
-            'user_info': {
+
+# --- (CONTROLLER) FUNÇÕES AUXILIARES ---
+
+
+def estado_usuario():
+    """
+    Tudo que as páginas mostram do usuário (menu e contador do carrinho).
+    Calculado uma vez por requisição: usado nos templates e no ETag.
+    """
+    if 'estado_usuario' not in g:
+        total_itens = 0
+        if 'user_id' in session:
+            # O carrinho fica no banco; só clientes têm carrinho
+            if session.get('user_papel') == 'cliente':
+                total_itens = model.get_total_itens_carrinho(session['user_id'])
+            user_info = {
                 'logado': True,
                 'nome': session.get('user_nome', 'Usuário'),
                 'papel': session.get('user_papel', 'cliente')
-            },
-            'total_itens_carrinho': total_itens
-        }
+            }
+        else:
+            user_info = {'logado': False}
+        g.estado_usuario = (user_info, total_itens)
+    return g.estado_usuario
+
+
+@app.context_processor
+def inject_user_info():
+    """Injeta informações do usuário e contagem do carrinho em todos os templates."""
+    user_info, total_itens = estado_usuario()
     return {
-        'user_info': {'logado': False},
+        'user_info': dict(user_info),
         'total_itens_carrinho': total_itens
     }
 
 
+def etag_pagina(*partes):
+    """ETag de uma página HTML: o conteúdo + o usuário + a versão dos templates."""
+    user_info, total_itens = estado_usuario()
+    return condicional.etag(*partes, sorted(user_info.items()), total_itens, condicional.versao_templates())
+
+
 # --- (CONTROLLER) FUNÇÕES AUXILIARES ---
 
 # --- (CONTROLLER) FUNÇÕES AUXILIARES ---
@@ -72,16 +133,16 @@ def calcular_total_itens(carrinho):
     return sum(item['quantidade'] for item in carrinho if isinstance(item, dict) and 'quantidade' in item)
 
 
-# Dicionário de simulação de frete por prefixo de CEP (região)
-FRETE_REGIOES = {
-    '88': 12.50,  # SC (Ex: Florianópolis)
-    '89': 10.00,  # SC (Ex: Joinville/Blumenau)
-    '01': 18.00,  # SP (Capital)
-    '02': 18.00,  # SP (Capital)
-    '20': 22.00,  # RJ (Capital)
-    '69': 45.00,  # AM (Manaus)
-}
-FRETE_PADRAO = 25.00  # Resto do Brasil
+def avisar_sem_estoque(sem_estoque, carrinho):
+    """Avisa quais produtos do carrinho acabaram antes de fechar a compra."""
+    nomes_carrinho = {item['id']: item['nome'] for item in carrinho}
+    for produto in sem_estoque:
+        nome = produto['nome'] or nomes_carrinho.get(produto['id'], 'Produto')
+        if produto['estoque'] > 0:
+            flash(f"'{nome}' tem apenas {produto['estoque']} unidade(s) em estoque.", "danger")
+        else:
+            flash(f"Desculpe, o produto '{nome}' esgotou.", "danger")
+
 
 # --- (CONTROLLER) API DE BUSCA (NOVO) ---
 
@@ -90,113 +151,200 @@ FRETE_PADRAO = 25.00  # Resto do Brasil
 
 @app.route('/api/buscar_produtos')
 def api_buscar_produtos():
-    query = request.args.get('q', '').lower()
+    query = request.args.get('q', '').strip()
 
     # Se a busca for vazia, retorna lista vazia
     if not query:
         return jsonify([])
 
-    # Tenta buscar os produtos de forma segura
-    todos_produtos = []
+    # Quantos resultados devolver (padrão 20, no máximo 50)
+    limite = request.args.get('limite', 20, type=int)
+    limite = max(1, min(limite, 50))
+
+    # Busca no índice de texto (ignora acentos e ordena por relevância)
     try:
-        # Tenta pegar todos de uma vez (se existir essa função no seu model)
-        if hasattr(model, 'get_produtos'):
-            todos_produtos = model.get_produtos()
-        elif hasattr(model, 'get_all_produtos'):
-            todos_produtos = model.get_all_produtos()
-        else:
-            # Plano B: Busca categoria por categoria (AGORA COM pinceis E skincare)
-            categorias = ['rosto', 'olhos', 'labios', 'kits', 'pinceis', 'skincare']
-            for cat in categorias:
-                lista = model.get_produtos_by_categoria(cat)
-                if lista:
-                    todos_produtos.extend(lista)
+        resultados = model.buscar_produtos(query, limite)
     except Exception as e:
         print(f"Erro ao buscar no banco: {e}")
         return jsonify([])
 
-    # Filtra os produtos pelo termo digitado (Nome ou Categoria)
-    resultados = []
-    ids_vistos = set()
-
-    for p in todos_produtos:
-        # Verifica se o termo está no nome ou na categoria
-        termo_no_nome = query in p['nome'].lower()
-        termo_na_cat = 'categoria' in p and query in str(
-            p['categoria']).lower()
-
-        if (termo_no_nome or termo_na_cat) and p['id'] not in ids_vistos:
-            resultados.append({
-                'id': p['id'],
-                'nome': p['nome'],
-                'preco': p['preco'],
-                'imagem': p['imagem'],
-                'categoria': p.get('categoria', 'Produto')
-            })
-            ids_vistos.add(p['id'])
-
+    # A busca-enquanto-digita repete as mesmas letras: se o resultado não
+    # mudou, o navegador reaproveita o que já tem (304, sem JSON na rede)
+    versoes = [(p['id'], p.pop('atualizado_em')) for p in resultados]
+    etag = condicional.etag('busca', query, limite, versoes)
+    modificado_em = condicional.data(max([v for _, v in versoes if v] + [model.ultima_saida()]))
+    if condicional.nao_modificado(etag, modificado_em):
+        return condicional.resposta_304(etag, modificado_em)
+
+    for p in resultados:
+        p['categoria'] = p.get('categoria') or 'Produto'
+
+    return condicional.preparar(jsonify(resultados), etag, modificado_em)
+
+
+@app.route('/api/sugestoes')
+def api_sugestoes():
+    """
+    Sugestões enquanto o cliente digita: os mais vendidos cujo nome (ou
+    categoria) começa com o texto. Vem de um índice em memória, sem banco.
+    A busca completa (no meio do texto, por relevância) é /api/buscar_produtos.
+    """
+    query = request.args.get('q', '').strip()
+    limite = max(1, min(request.args.get('limite', 8, type=int), sugestoes.MAX_SUGESTOES))
+    resultados = model.sugerir_produtos(query, limite)
+    for p in resultados:
+        p['categoria'] = p.get('categoria') or 'Produto'
     return jsonify(resultados)
 
 
+MAX_TAGS_QUIZ = 32  # Respostas do quiz somam bem menos que isso
+
+
+@app.route('/api/quiz/recomendar')
+def api_quiz_recomendar():
+    """
+    Produtos para as respostas do Quiz: /api/quiz/recomendar?tags=skincare,natural,glow,skincare
+    Tag repetida (em mais de uma resposta) pesa mais. Vem de uma matriz em
+    memória com cache por combinação de respostas, sem banco. Só vêm produtos
+    com ao menos uma tag em comum: a lista pode vir vazia (o quiz trata).
+    """
+    tags = [t for t in request.args.get('tags', '').split(',') if t.strip()][:MAX_TAGS_QUIZ]
+    limite = max(1, min(request.args.get('limite', 4, type=int), recomendador.MAX_RECOMENDACOES))
+    produtos = model.recomendar_quiz(tags, limite)
+    for p in produtos:
+        p['categoria'] = p.get('categoria') or 'Produto'
+        p['url'] = url_for('ver_produto', id=p['id'])
+    return jsonify({'produtos': produtos})
+
+
+# Chaves dos parceiros do marketplace para a cotação em lote (separadas por vírgula)
+CHAVES_PARCEIROS = {c.strip() for c in os.environ.get('LUMINA_FRETE_CHAVES', '').split(',') if c.strip()}
+MAX_COTACOES_LOTE = 500
+
+
+def _medida_parceiro(valor):
+    """Peso ou subtotal enviado pelo parceiro: número finito e não negativo."""
+    numero = float(valor or 0)
+    if not math.isfinite(numero) or numero < 0:
+        raise ValueError(f"medida inválida: {valor!r}")
+    return numero
+
+
+def _cotacao_parceiro(pedido):
+    """Uma cotação do lote. Erro volta no próprio item (o lote não falha inteiro)."""
+    if not isinstance(pedido, dict):
+        return {'erro': 'formato inválido'}
+    cep = pedido.get('cep')
+    try:
+        if pedido.get('itens') is not None:
+            carrinho = []
+            for item in pedido['itens']:
+                quantidade = int(item.get('quantidade', 1))
+                produto = model.get_produto_by_id(int(item['produto_id']))
+                if produto is None or quantidade < 1:
+                    return {'cep': cep, 'erro': f"item inválido: {item}"}
+                carrinho.append({**produto, 'quantidade': quantidade})
+            cotacao = frete.cotar_carrinho(cep, carrinho)
+        else:
+            cotacao = frete.cotar(cep, _medida_parceiro(pedido.get('peso_gramas')),
+                                  _medida_parceiro(pedido.get('subtotal')))
+    except (KeyError, TypeError, ValueError, AttributeError, OverflowError):
+        return {'cep': cep, 'erro': 'formato inválido'}
+    if cotacao is None:
+        return {'cep': cep, 'erro': 'CEP inválido ou fora da área de entrega'}
+    return cotacao
+
+
+@app.route('/api/frete/cotacoes', methods=['POST'])
+def api_cotacoes_frete():
+    """
+    Cotação de frete em lote para os parceiros do marketplace (cabeçalho X-Api-Key).
+    Corpo JSON, em uma das formas:
+        {"ceps": ["88010-400", "01310-100"], "itens": [{"produto_id": 1, "quantidade": 2}]}
+        {"cotacoes": [{"cep": "88010-400", "itens": [...]},
+                      {"cep": "69005-000", "peso_gramas": 800, "subtotal": 120.0}]}
+    As respostas vêm na mesma ordem dos pedidos.
+    """
+    if session.get('user_papel') != 'admin' and request.headers.get('X-Api-Key') not in CHAVES_PARCEIROS:
+        return jsonify({'erro': 'chave de API inválida'}), 401
+
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return jsonify({'erro': 'envie um objeto JSON'}), 400
+    pedidos = dados.get('cotacoes')
+    if pedidos is None and isinstance(dados.get('ceps'), list):
+        # Mesmo carrinho (ou peso/valor) para vários CEPs
+        base = {k: dados[k] for k in ('itens', 'peso_gramas', 'subtotal') if k in dados}
+        pedidos = [{'cep': cep, **base} for cep in dados['ceps']]
+    if not isinstance(pedidos, list):
+        return jsonify({'erro': "informe 'cotacoes' ou 'ceps'"}), 400
+    if len(pedidos) > MAX_COTACOES_LOTE:
+        return jsonify({'erro': f'no máximo {MAX_COTACOES_LOTE} cotações por chamada'}), 413
+
+    return jsonify({
+        'frete_gratis_acima': frete.FRETE_GRATIS_ACIMA,
+        'cotacoes': [_cotacao_parceiro(p) for p in pedidos],
+    })
+
+
+@app.route('/api/cep/<cep>')
+def api_cep(cep):
+    """Endereço de um CEP (preenchimento automático do cadastro), direto da base local."""
+    if frete.limpar_cep(cep) is None:
+        return jsonify({'erro': 'CEP deve ter 8 dígitos'}), 400
+    if not ceps.disponivel():
+        return jsonify({'erro': 'base de CEPs indisponível'}), 503
+    endereco = ceps.buscar(cep)
+    if endereco is None:
+        return jsonify({'erro': 'CEP não encontrado'}), 404
+    endereco['linha'] = ceps.linha_endereco(endereco)
+    resposta = jsonify(endereco)
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = 86400  # A base só muda quando é recompilada
+    return resposta
+
+
 # --- (CONTROLLER) ROTAS PÚBLICAS (VISÃO DO CLIENTE) ---
 
 @app.route('/')
 def index():
-    produtos_todos = model.get_all_produtos()
-    return render_template('index.html', produtos=produtos_todos)
+    # A grade sai pronta do cache; só é renderizada de novo quando o catálogo muda
+    grade = fragmentos.cache_fragmentos.obter('index', lambda: fragmentos.renderizar(
+        'parciais/grade_index.html', produtos=model.get_all_produtos()))
+
+    if not session:
+        # Visitante sem sessão (sem login, carrinho ou flash): a página é igual para todos
+        return fragmentos.cache_fragmentos.obter('index:anonimo', lambda: render_template(
+            'index.html', grade_produtos=grade))
+    return render_template('index.html', grade_produtos=grade)
 
 
 @app.route('/categoria/<string:nome_categoria>')
 def categoria_produtos(nome_categoria):
-    # 1. Conecta ao banco e busca TODOS os produtos da categoria primeiro
-    conn = model.get_db_connection()
-    # Usa 'lower()' para garantir que ache 'cabelos' mesmo se buscar 'Cabelos'
-    produtos_db = conn.execute('SELECT * FROM produtos WHERE LOWER(categoria) = ?', (nome_categoria.lower(),)).fetchall()
-    conn.close()
-
-    # Transforma em lista de dicionários para podermos filtrar no Python
-    produtos = [dict(p) for p in produtos_db]
-
     # --- LÓGICA DE FILTROS ---
-    
-    # 2. Captura os dados da URL (o que vem do formulário)
+
+    # 1. Captura os dados da URL (o que vem do formulário)
     min_price = request.args.get('min')
     max_price = request.args.get('max')
     estoque_only = request.args.get('estoque') # Vem 'on' se marcado
     sort_by = request.args.get('sort')
+    cursor = request.args.get('apos') # Cursor da próxima página
 
-    # 3. Filtro de Preço Mínimo
+    # 2. Converte os preços (se o usuário digitou letra no preço, ignora)
+    valor_min = None
     if min_price and min_price.strip():
         try:
             valor_min = float(min_price)
-            produtos = [p for p in produtos if p['preco'] >= valor_min]
         except ValueError:
-            pass # Se o usuário digitou letra no preço, ignora
+            pass
 
-    # 4. Filtro de Preço Máximo
+    valor_max = None
     if max_price and max_price.strip():
         try:
             valor_max = float(max_price)
-            produtos = [p for p in produtos if p['preco'] <= valor_max]
         except ValueError:
             pass
 
-    # 5. Filtro de Estoque (Apenas disponíveis)
-    if estoque_only == 'on':
-        produtos = [p for p in produtos if p['estoque'] > 0]
-
-    # 6. Ordenação
-    if sort_by == 'menor_preco':
-        produtos.sort(key=lambda x: x['preco']) # Do menor pro maior
-    elif sort_by == 'maior_preco':
-        produtos.sort(key=lambda x: x['preco'], reverse=True) # Do maior pro menor
-    elif sort_by == 'az':
-        produtos.sort(key=lambda x: x['nome'].lower()) # A-Z
-    elif sort_by == 'za':
-        produtos.sort(key=lambda x: x['nome'].lower(), reverse=True) # Z-A
-
-    # --- FIM DA LÓGICA ---
-
     # Para manter os valores no formulário depois de recarregar a página
     filtros_atuais = {
         'min': min_price,
@@ -205,12 +353,53 @@ def categoria_produtos(nome_categoria):
         'sort': sort_by
     }
 
-    return render_template(
+    def gerar_grade():
+        # 3. O banco filtra, ordena e pagina numa única consulta indexada
+        produtos, proxima_pagina = model.filtrar_produtos_categoria(
+            nome_categoria,
+            preco_min=valor_min,
+            preco_max=valor_max,
+            apenas_estoque=(estoque_only == 'on'),
+            ordem=sort_by,
+            cursor=cursor
+        )
+        # Total com os filtros (todas as páginas, não só esta); fica em cache junto com a grade
+        total = model.contar_produtos_categoria(
+            nome_categoria,
+            preco_min=valor_min,
+            preco_max=valor_max,
+            apenas_estoque=(estoque_only == 'on')
+        )
+        grade = fragmentos.renderizar(
+            'parciais/grade_categoria.html',
+            produtos=produtos,
+            titulo_categoria=nome_categoria,
+            filtros=filtros_atuais,
+            proxima_pagina=proxima_pagina
+        )
+        return grade, total
+
+    # 4. Nenhum produto da categoria mudou desde a última visita? 304, sem renderizar nada
+    modificado_em = model.versao_categoria(nome_categoria)
+    etag = etag_pagina('categoria', nome_categoria, modificado_em)
+    modificado_em = condicional.data(modificado_em)
+    if condicional.nao_modificado(etag, modificado_em):
+        return condicional.resposta_304(etag, modificado_em)
+
+    # 5. Mesma categoria + mesmos filtros = mesma grade (até o catálogo mudar)
+    chave = ('categoria', nome_categoria, min_price, max_price, estoque_only, sort_by, cursor)
+    grade, quantidade = fragmentos.cache_fragmentos.obter(chave, gerar_grade)
+
+    # --- FIM DA LÓGICA ---
+
+    resposta = make_response(render_template(
         'produtos.html', 
-        produtos=produtos, 
+        grade_produtos=grade,
+        quantidade_produtos=quantidade,
         titulo_categoria=nome_categoria,
         filtros=filtros_atuais
-    )
+    ))
+    return condicional.preparar(resposta, etag, modificado_em)
 
 
 @app.route('/contato')
@@ -261,8 +450,11 @@ def login():
                 f"DEBUG: Senha plana armazenada: {user.get('senha_plana', 'NÃO ENCONTRADA')}")
 
             # TENTA VALIDAR COM HASH
-            if check_password_hash(user['senha'], senha):
+            if senhas.verificar(user['senha'], senha):
                 print(f"DEBUG: Login com HASH bem-sucedido")
+                # Hash antigo (parâmetros diferentes dos atuais): gera um novo
+                if senhas.precisa_rehash(user['senha']):
+                    model.atualizar_hash_senha(user['id'], senhas.gerar_hash(senha))
                 session['user_id'] = user['id']
                 session['user_nome'] = user['nome']
                 session['user_papel'] = user['papel']
@@ -275,6 +467,8 @@ def login():
             # SE HASH FALHAR, TENTA VALIDAR COM SENHA PLANA (como fallback)
             elif user.get('senha_plana') == senha:
                 print(f"DEBUG: Login com SENHA PLANA bem-sucedido")
+                # O hash guardado não bate com a senha: corrige
+                model.atualizar_hash_senha(user['id'], senhas.gerar_hash(senha))
                 session['user_id'] = user['id']
                 session['user_nome'] = user['nome']
                 session['user_papel'] = user['papel']
@@ -485,43 +679,57 @@ def excluir_conta():
 # --- (CONTROLLER) ROTAS DO CARRINHO E CHECKOUT ---
 
 
+def total_com_frete(user_id, carrinho):
+    """Subtotal do carrinho + frete já calculado (0 se ainda não calculou)."""
+    frete, _ = model.get_frete_carrinho(user_id)
+    return calcular_total_carrinho(carrinho) + (frete or 0)
+
+
 @app.route('/carrinho')
 @model.login_required(roles=['cliente'])
 def ver_carrinho():
-    carrinho = session.get('carrinho', [])
-    if not isinstance(carrinho, list):
-        carrinho = []
-        session['carrinho'] = carrinho
+    user_id = session['user_id']
+    carrinho = model.get_carrinho(user_id)
 
     total_carrinho = calcular_total_carrinho(carrinho)
-    session['total_carrinho'] = total_carrinho
-    session['total_itens_badge'] = calcular_total_itens(carrinho)
-
-    # Limpeza se vazio
-    if not carrinho:
-        session.pop('frete', None)
-        session.pop('frete_label', None)
+    valor_frete, frete_label = model.get_frete_carrinho(user_id)
 
     # --- LÓGICA DE FRETE BLINDADA ---
-    if total_carrinho > 250.00:
-        session['frete'] = 0
-        session['frete_label'] = 'Frete Grátis'
-    elif session.get('frete_label') == 'Frete Grátis':
-        # Se chegou aqui é porque o total é <= 250 mas o label ainda diz Grátis.
-        # Precisamos remover!
-        session.pop('frete', None)
-        session.pop('frete_label', None)
-
-    frete = session.get('frete', 0)
-    frete_label = session.get('frete_label', '(a calcular)')
-    total_com_frete = total_carrinho + frete
+    if not carrinho:
+        # Limpeza se vazio
+        if valor_frete is not None:
+            model.set_frete_carrinho(user_id, None, None)
+        valor_frete, frete_label = None, None
+    elif frete.gratis(total_carrinho):
+        if frete_label != 'Frete Grátis':
+            model.set_frete_carrinho(user_id, 0, 'Frete Grátis')
+        valor_frete, frete_label = 0, 'Frete Grátis'
+    elif valor_frete is not None:
+        # O peso e o valor do carrinho mudam o frete: recalcula para o CEP já
+        # informado (se o frete era grátis e não há CEP, volta a "a calcular")
+        cep = model.get_cep_carrinho(user_id)
+        cotacao = frete.cotar_carrinho(cep, carrinho) if cep else None
+        if cotacao is None:
+            model.set_frete_carrinho(user_id, None, None)
+            valor_frete, frete_label = None, None
+        elif (cotacao['valor'], frete.rotulo(cotacao)) != (valor_frete, frete_label):
+            valor_frete, frete_label = cotacao['valor'], frete.rotulo(cotacao)
+            model.set_frete_carrinho(user_id, valor_frete, frete_label)
+
+    valor_frete = valor_frete or 0
+    frete_label = frete_label or '(a calcular)'
+    total_com_frete = total_carrinho + valor_frete
+
+    # Sugestões a partir dos itens do carrinho (listas prontas de compras_juntas.py)
+    relacionados = model.get_comprados_juntos_carrinho([item['id'] for item in carrinho])
 
     return render_template('carrinho.html',
                            carrinho=carrinho,
                            total=total_carrinho,
-                           frete=frete,
+                           frete=valor_frete,
                            frete_label=frete_label,
                            total_com_frete=total_com_frete,
+                           relacionados=relacionados,
                            step='carrinho')
 
 
@@ -541,45 +749,25 @@ def adicionar_carrinho(id):
         flash(f"Desculpe, o produto '{produto_db['nome']}' acabou de esgotar!", "danger")
         return redirect(request.referrer or url_for('index'))
 
-    # 3. Prepara Carrinho
-    carrinho = session.get('carrinho', [])
-    if not isinstance(carrinho, list): 
-        carrinho = []
-
-    quantidade = int(request.form.get('quantidade', 1))
+    try:
+        quantidade = int(request.form.get('quantidade', 1))
+    except ValueError:
+        quantidade = 0
     print(f"Quantidade solicitada: {quantidade}")
+    if quantidade < 1:
+        flash("Quantidade inválida.", "warning")
+        return redirect(request.referrer or url_for('ver_produto', id=id))
 
-    # 4. Verifica duplicidade e adiciona
-    item_carrinho = next((i for i in carrinho if i['id'] == id), None)
+    # 2. Soma no carrinho do banco (uma linha por produto; o limite do estoque fica no SQL)
+    situacao, quantidade_total = model.adicionar_ao_carrinho(session['user_id'], id, quantidade)
 
-    if item_carrinho:
-        if (item_carrinho['quantidade'] + quantidade) > produto_db['estoque']:
-            flash(f"Estoque insuficiente.", "warning")
-        else:
-            item_carrinho['quantidade'] += quantidade
-            flash(f"Atualizado para {item_carrinho['quantidade']} unidades!", "success")
+    if situacao == 'sem_estoque':
+        flash(f"Estoque insuficiente.", "warning")
+    elif situacao == 'atualizado':
+        flash(f"Atualizado para {quantidade_total} unidades!", "success")
     else:
-        # ATENÇÃO: Removi a descrição para economizar espaço no cookie
-        novo_item = {
-            'id': produto_db['id'],
-            'nome': produto_db['nome'],
-            'preco': produto_db['preco'],
-            # 'imagem': produto_db['imagem'], 
-            'estoque': produto_db['estoque'],
-            'quantidade': quantidade
-        }
-        carrinho.append(novo_item)
         flash(f"'{produto_db['nome']}' adicionado!", "success")
 
-    # 5. Tenta Salvar
-    try:
-        session['carrinho'] = carrinho
-        session['total_itens_badge'] = calcular_total_itens(carrinho)
-        session.modified = True
-        print(f"SUCESSO: Carrinho atualizado. Total itens: {len(carrinho)}")
-    except Exception as e:
-        print(f"ERRO AO SALVAR SESSÃO: {e}")
-
     # Redireciona direto para o carrinho para confirmar visualmente
     return redirect(url_for('ver_carrinho'))
 
@@ -587,36 +775,23 @@ def adicionar_carrinho(id):
 @app.route('/atualizar_quantidade/<int:id>/<acao>')
 @model.login_required(roles=['cliente'])
 def atualizar_quantidade(id, acao):
-    carrinho = session.get('carrinho', [])
-    if not isinstance(carrinho, list):
-        return redirect(url_for('ver_carrinho'))
+    user_id = session['user_id']
+
+    if acao == 'aumentar':
+        # Só aumenta se ainda houver estoque
+        if not model.alterar_quantidade_carrinho(user_id, id, 1):
+            flash(f"Estoque máximo atingido!", "warning")
+    elif acao == 'diminuir':
+        model.alterar_quantidade_carrinho(user_id, id, -1) # Mínimo 1
 
-    for item in carrinho:
-        if item['id'] == id:
-            if acao == 'aumentar':
-                # Verifica estoque (simples)
-                if item['quantidade'] < item.get('estoque', 999): 
-                    item['quantidade'] += 1
-                else:
-                    flash(f"Estoque máximo atingido!", "warning")
-            elif acao == 'diminuir':
-                item['quantidade'] -= 1
-                if item['quantidade'] < 1:
-                    item['quantidade'] = 1 # Mínimo 1
-            break
-    
-    session['carrinho'] = carrinho
-    
     # Força o recálculo imediato
-    total_atual = calcular_total_carrinho(carrinho)
-    session['total_carrinho'] = total_atual
-    session['total_itens_badge'] = calcular_total_itens(carrinho)
+    total_atual = calcular_total_carrinho(model.get_carrinho(user_id))
     
     # --- CORREÇÃO DA LÓGICA DE FRETE ---
-    # Se baixou de 250 e estava grátis, remove o benefício
-    if total_atual <= 250.00 and session.get('frete_label') == 'Frete Grátis':
-        session.pop('frete', None)
-        session.pop('frete_label', None)
+    # Se baixou do valor do frete grátis e estava grátis, remove o benefício
+    _, frete_label = model.get_frete_carrinho(user_id)
+    if not frete.gratis(total_atual) and frete_label == 'Frete Grátis':
+        model.set_frete_carrinho(user_id, None, None)
         flash("O valor total diminuiu. O frete grátis foi removido.", "info")
     
     return redirect(url_for('ver_carrinho'))
@@ -625,17 +800,7 @@ def atualizar_quantidade(id, acao):
 @app.route('/remover_carrinho/<int:id>', methods=['POST'])
 @model.login_required(roles=['cliente'])
 def remover_carrinho(id):
-    carrinho = session.get('carrinho', [])
-    if not isinstance(carrinho, list):
-        carrinho = []
-    
-    # Filtra mantendo apenas quem NÃO tem o ID removido
-    novo_carrinho = [item for item in carrinho if item['id'] != id]
-    
-    session['carrinho'] = novo_carrinho
-    session['total_carrinho'] = calcular_total_carrinho(novo_carrinho)
-    session['total_itens_badge'] = calcular_total_itens(novo_carrinho)
-    
+    model.remover_do_carrinho(session['user_id'], id)
     flash("Item removido.", "info")
     return redirect(url_for('ver_carrinho'))
 
@@ -643,12 +808,13 @@ def remover_carrinho(id):
 @app.route('/calcular_frete', methods=['POST'])
 @model.login_required(roles=['cliente'])
 def calcular_frete():
+    user_id = session['user_id']
     cep = request.form.get('cep', '').strip()
-    total_carrinho = session.get('total_carrinho', 0)
+    carrinho = model.get_carrinho(user_id)
+    total_carrinho = calcular_total_carrinho(carrinho)
 
-    if total_carrinho > 250.00:
-        session['frete'] = 0
-        session['frete_label'] = 'Frete Grátis'
+    if frete.gratis(total_carrinho):
+        model.set_frete_carrinho(user_id, 0, 'Frete Grátis')
         flash("Você ganhou Frete Grátis!", "success")
         return redirect(url_for('ver_carrinho'))
 
@@ -656,22 +822,31 @@ def calcular_frete():
 
     if not cep_limpo.isdigit() or len(cep_limpo) != 8:
         flash("Coloque um cep existente (formato inválido).", "danger")
-        session.pop('frete', None)
-        session.pop('frete_label', None)
+        model.set_frete_carrinho(user_id, None, None)
         return redirect(url_for('ver_carrinho'))
 
-    if cep_limpo == '00000000' or cep_limpo == '99999999':
+    # Com a base de CEPs, só passa CEP que existe; sem ela, barra ao menos os óbvios
+    if ceps.disponivel():
+        cep_inexistente = ceps.buscar(cep_limpo) is None
+    else:
+        cep_inexistente = cep_limpo in ('00000000', '99999999')
+
+    if cep_inexistente:
         flash("Coloque um cep existente (CEP não encontrado).", "danger")
-        session.pop('frete', None)
-        session.pop('frete_label', None)
+        model.set_frete_carrinho(user_id, None, None)
         return redirect(url_for('ver_carrinho'))
 
-    prefixo = cep_limpo[0:2]
-    frete_simulado = FRETE_REGIOES.get(prefixo, FRETE_PADRAO)
+    # Faixa do CEP + peso e valor do carrinho
+    cotacao = frete.cotar_carrinho(cep_limpo, carrinho)
+    if cotacao is None:
+        flash("Ainda não entregamos nesse CEP.", "danger")
+        model.set_frete_carrinho(user_id, None, None)
+        return redirect(url_for('ver_carrinho'))
 
-    session['frete'] = frete_simulado
-    session['frete_label'] = f"R$ {frete_simulado:.2f}"
-    flash(f"Frete calculado para {cep}: R$ {frete_simulado:.2f}", "success")
+    model.set_frete_carrinho(user_id, cotacao['valor'], frete.rotulo(cotacao), cep_limpo)
+    prazo = '1 dia útil' if cotacao['prazo_dias'] == 1 else f"{cotacao['prazo_dias']} dias úteis"
+    flash(f"Frete calculado para {cotacao['cep']} - {cotacao['zona']}: R$ {cotacao['valor']:.2f} "
+          f"(entrega em até {prazo})", "success")
 
     return redirect(url_for('ver_carrinho'))
 
@@ -679,19 +854,18 @@ def calcular_frete():
 @app.route('/checkout/pagamento')
 @model.login_required(roles=['cliente'])
 def checkout_pagamento():
-    carrinho = session.get('carrinho', {})
+    user_id = session['user_id']
+    carrinho = model.get_carrinho(user_id)
     if not carrinho:
         flash("Seu carrinho está vazio.", "warning")
         return redirect(url_for('ver_carrinho'))
 
-    if session.get('frete_label', '(a calcular)') == '(a calcular)':
+    _, frete_label = model.get_frete_carrinho(user_id)
+    if frete_label is None:
         flash("Por favor, calcule o frete antes de continuar.", "warning")
         return redirect(url_for('ver_carrinho'))
 
-    total_carrinho = session.get('total_carrinho', 0)
-    frete = session.get('frete', 0)
-    total_final = total_carrinho + frete
-    session['total_final'] = total_final
+    total_final = total_com_frete(user_id, carrinho)
 
     return render_template('pagamento.html', total=total_final, step='pagamento')
 
@@ -699,50 +873,70 @@ def checkout_pagamento():
 @app.route('/checkout/pagar_pix')
 @model.login_required(roles=['cliente'])
 def pagar_pix():
-    total = session.get('total_final', 0)
+    user_id = session['user_id']
+    total = total_com_frete(user_id, model.get_carrinho(user_id))
     if total <= 0:
         flash("Não há nada a pagar.", "warning")
         return redirect(url_for('ver_carrinho'))
 
-    pix_key = f"000201260014br.gov.bcb.pix2500...simulacao...{total}"
-
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(pix_key)
-    qr.make(fit=True)
-    img = qr.make_image(fill='black', back_color='white')
-
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    img_data = buf.getvalue()
-    qr_code_base64 = base64.b64encode(img_data).decode('utf-8')
+    pix_key = pix.gerar_payload(total)
 
+    # A imagem vem de uma rota própria com cache (não vai mais em base64 no HTML)
     return render_template('pagar_pix.html',
                            total=total,
                            step='pagamento',
                            pix_key=pix_key,
-                           qr_code_base64=qr_code_base64)
+                           qr_code_url=url_for('pix_qr_code', valor=f"{total:.2f}", formato='svg'))
+
+
+# Valor da imagem do QR Code: até 7 dígitos e 2 casas decimais
+VALOR_PIX = re.compile(r'\d{1,7}\.\d{2}')
+
+
+@app.route('/pix/qr/<valor>.<formato>')
+def pix_qr_code(valor, formato):
+    """Imagem do QR Code Pix (SVG ou PNG), com ETag para o navegador guardar."""
+    if formato not in pix.FORMATOS:
+        return "Formato inválido.", 404
+    # Só o formato que o checkout gera ("123.45"): nada de nan, inf ou 1e300
+    if not VALOR_PIX.fullmatch(valor):
+        return "Valor inválido.", 404
+    total = float(valor)
+    if total <= 0:
+        return "Valor inválido.", 404
+
+    payload = pix.gerar_payload(total)
+    etag = pix.etag(payload, formato)
+
+    # Navegador já tem essa imagem: responde 304 sem gerar nada
+    if etag in request.if_none_match:
+        resposta = app.response_class(status=304)
+    else:
+        resposta = app.response_class(pix.gerar_imagem(payload, formato), mimetype=pix.FORMATOS[formato])
+
+    resposta.set_etag(etag)
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = 86400
+    return resposta
 
 
 @app.route('/pagamento/cartao', methods=['GET', 'POST'])
 @model.login_required(roles=['cliente'])
 def pagamento_cartao():
-    carrinho = session.get('carrinho', [])
+    user_id = session['user_id']
+    carrinho = model.get_carrinho(user_id)
     if not carrinho:
         return redirect(url_for('index'))
 
-    subtotal = sum(item['preco'] * item['quantidade'] for item in carrinho)
-    frete = session.get('frete', 0)
-    total_final = subtotal + frete
+    total_final = total_com_frete(user_id, carrinho)
 
     if request.method == 'POST':
-        user_id = session.get('user_id')
-        
         # Busca endereço
         user_data = model.get_user_by_id(user_id)
         endereco_destino = user_data['endereco'] if user_data and user_data['endereco'] else "Endereço não cadastrado"
 
-        # SALVA NO BANCO
-        pedido_id = model.registrar_pedido(
+        # SALVA NO BANCO (pedido + itens + estoque numa transação só)
+        pedido_id, sem_estoque = model.finalizar_compra(
             user_id=user_id,
             carrinho=carrinho,
             total_venda=total_final,
@@ -750,14 +944,13 @@ def pagamento_cartao():
             endereco=endereco_destino
         )
 
+        if sem_estoque:
+            avisar_sem_estoque(sem_estoque, carrinho)
+            return redirect(url_for('ver_carrinho'))
+
         if pedido_id:
-            # Baixa estoque e limpa sessão
-            for item in carrinho:
-                model.baixar_estoque(item['id'], item['quantidade'])
-            
-            session.pop('carrinho', None)
-            session.pop('frete', None)
-            session['total_itens_badge'] = 0
+            # Esvazia o carrinho
+            model.limpar_carrinho(user_id)
             
             # Redireciona para Meus Pedidos ou Confirmação
             flash(f"Compra realizada com sucesso! Pedido #{pedido_id}", "success")
@@ -774,23 +967,21 @@ def checkout_confirmacao():
     """Finaliza o pedido via PIX e salva no banco."""
     
     # 1. Validações Básicas
-    carrinho = session.get('carrinho', [])
     user_id = session.get('user_id')
+    carrinho = model.get_carrinho(user_id)
     
     if not carrinho:
         return redirect(url_for('index'))
 
     # 2. Prepara dados para salvar
-    subtotal = sum(item['preco'] * item['quantidade'] for item in carrinho)
-    frete = session.get('frete', 0)
-    total_final = subtotal + frete
+    total_final = total_com_frete(user_id, carrinho)
     
     # Busca endereço do usuário para constar no pedido
     user_data = model.get_user_by_id(user_id)
     endereco_destino = user_data['endereco'] if user_data and user_data['endereco'] else "Endereço não cadastrado"
 
-    # 3. SALVA NO BANCO DE DADOS
-    pedido_id = model.registrar_pedido(
+    # 3. SALVA NO BANCO DE DADOS (pedido + itens + estoque numa transação só)
+    pedido_id, sem_estoque = model.finalizar_compra(
         user_id=user_id,
         carrinho=carrinho,
         total_venda=total_final,
@@ -798,14 +989,13 @@ def checkout_confirmacao():
         endereco=endereco_destino
     )
 
+    if sem_estoque:
+        avisar_sem_estoque(sem_estoque, carrinho)
+        return redirect(url_for('ver_carrinho'))
+
     if pedido_id:
-        # 4. Sucesso: Baixa Estoque e Limpa Sessão
-        for item in carrinho:
-            model.baixar_estoque(item['id'], item['quantidade'])
-            
-        session.pop('carrinho', None)
-        session.pop('frete', None)
-        session['total_itens_badge'] = 0
+        # 4. Sucesso: Esvazia o carrinho
+        model.limpar_carrinho(user_id)
         
         # Renderiza a página de sucesso mostrando o número do pedido
         return render_template('confirmacao.html', pedido_id=pedido_id)
@@ -828,9 +1018,10 @@ def admin_produtos():
             categoria = request.form['categoria']
             descricao = request.form['descricao']
             imagem = request.form['imagem']
+            tags = request.form.get('tags', '')
 
             model.add_produto(nome, preco, descricao,
-                              imagem, estoque, categoria)
+                              imagem, estoque, categoria, tags)
             flash(f"Produto '{nome}' adicionado com sucesso!", "success")
         except ValueError:
             flash("Preço e Estoque devem ser números válidos.", "danger")
@@ -857,9 +1048,10 @@ def editar_produto(id):
             categoria = request.form['categoria']
             descricao = request.form['descricao']
             imagem = request.form['imagem']
+            tags = request.form.get('tags')
 
             model.update_produto(id, nome, preco, descricao,
-                                 imagem, estoque, categoria)
+                                 imagem, estoque, categoria, tags)
 
             flash(f"Produto '{nome}' atualizado com sucesso!", "success")
             return redirect(url_for('admin_produtos'))
@@ -886,13 +1078,8 @@ def excluir_produto(id):
 @model.login_required(roles=['admin'])
 def deletar_todos_produtos():
     try:
-        # Conecta ao banco de dados
-        conn = model.get_db_connection()
-        
-        # Deleta todos os produtos
-        conn.execute('DELETE FROM produtos')
-        conn.commit()
-        conn.close()
+        # Deleta todos os produtos (e limpa o cache do catálogo)
+        model.delete_all_produtos()
         
         flash('Todos os produtos foram deletados com sucesso!', 'success')
         
@@ -903,6 +1090,84 @@ def deletar_todos_produtos():
     return redirect(url_for('admin_produtos'))
 
 
+@app.route('/admin/metrics')
+@model.login_required(roles=['admin'])
+def admin_metricas():
+    """Métricas no formato de texto do Prometheus."""
+    cache = model.cache_catalogo.estatisticas()
+    fragmentos_html = fragmentos.cache_fragmentos.estatisticas()
+    hash_senha = senhas.metricas.estatisticas()
+    extras = [
+        ('lumina_cache_catalogo_hits_total', 'counter', 'Acertos do cache do catálogo.', cache['hits']),
+        ('lumina_cache_catalogo_misses_total', 'counter', 'Faltas do cache do catálogo.', cache['misses']),
+        ('lumina_cache_catalogo_produtos', 'gauge', 'Produtos no cache do catálogo.', cache['produtos']),
+        ('lumina_cache_catalogo_versao', 'gauge', 'Versão do catálogo (sobe a cada mudança).', cache['versao']),
+        ('lumina_cache_fragmentos_hits_total', 'counter', 'Grades servidas do cache de HTML.', fragmentos_html['hits']),
+        ('lumina_cache_fragmentos_misses_total', 'counter', 'Grades renderizadas de novo.', fragmentos_html['misses']),
+        ('lumina_hash_senha_em_andamento', 'gauge', 'Hashes de senha na fila ou calculando.', hash_senha['em_andamento']),
+        ('lumina_hash_senha_recusados_total', 'counter', 'Hashes recusados (fila cheia).', hash_senha['recusados']),
+    ]
+    return app.response_class(metricas.rotas.prometheus(extras),
+                              content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/admin/consultas_lentas', methods=['GET', 'POST'])
+@model.login_required(roles=['admin'])
+def admin_consultas_lentas():
+    """Consultas SQL que passaram do limite (com plano de execução)."""
+    if request.method == 'POST':
+        acao = request.form.get('acao')
+        if acao == 'limpar':
+            consultas_lentas.limpar()
+            flash("Registro de consultas lentas limpo.", "success")
+        elif acao == 'desligar':
+            consultas_lentas.configurar(None)
+            flash("Registro de consultas lentas desligado.", "success")
+        else:
+            try:
+                limite = float(request.form.get('limite_ms', ''))
+                if limite < 0:
+                    raise ValueError
+                consultas_lentas.configurar(limite)
+                flash(f"Registrando consultas acima de {limite:g} ms.", "success")
+            except ValueError:
+                flash("O limite deve ser um número de milissegundos.", "danger")
+        return redirect(url_for('admin_consultas_lentas'))
+
+    return render_template('admin_consultas_lentas.html',
+                           registros=consultas_lentas.recentes(),
+                           limite_ms=consultas_lentas.limite_ms())
+
+
+@app.route('/admin/perfis', methods=['GET', 'POST'])
+@model.login_required(roles=['admin'])
+def admin_perfis():
+    """Perfis de requisições salvos (flame graph), por rota."""
+    if request.method == 'POST':
+        try:
+            porcentagem = float(request.form.get('amostra', ''))
+            if not 0 <= porcentagem <= 100:
+                raise ValueError
+            perfis.configurar(porcentagem / 100)
+            flash(f"Perfilando {porcentagem:g}% das requisições.", "success")
+        except ValueError:
+            flash("A amostra deve ser uma porcentagem entre 0 e 100.", "danger")
+        return redirect(url_for('admin_perfis'))
+
+    return render_template('admin_perfis.html',
+                           por_rota=perfis.listar(),
+                           amostra=perfis.FRACAO_AMOSTRA * 100)
+
+
+@app.route('/admin/perfis/<nome>')
+@model.login_required(roles=['admin'])
+def baixar_perfil(nome):
+    caminho = perfis.caminho(nome)
+    if caminho is None:
+        abort(404)
+    return send_file(os.path.abspath(caminho), mimetype='text/plain', as_attachment=True, download_name=nome)
+
+
 @app.route('/produto/<int:id>')
 def ver_produto(id):
     # Busca o produto pelo ID (usando a função que já existe no model)
@@ -911,8 +1176,19 @@ def ver_produto(id):
     if not produto:
         flash("Produto não encontrado.", "warning")
         return redirect(url_for('index'))
-        
-    return render_template('detalhes_produto.html', produto=produto)
+
+    # "Quem comprou, levou também": lista pronta (compras_juntas.py), uma leitura no índice
+    relacionados, versao_relacionados = model.get_comprados_juntos(produto['id'])
+
+    # Produto (e a lista de relacionados) igual ao da última visita? 304, sem renderizar
+    etag = etag_pagina('produto', produto['id'], produto.get('atualizado_em'), versao_relacionados)
+    modificado_em = condicional.data(max(produto.get('atualizado_em') or 0, versao_relacionados))
+    if condicional.nao_modificado(etag, modificado_em):
+        return condicional.resposta_304(etag, modificado_em)
+
+    resposta = make_response(render_template('detalhes_produto.html', produto=produto,
+                                             relacionados=relacionados))
+    return condicional.preparar(resposta, etag, modificado_em)
 
 
 def gerar_senha_temporaria(comprimento=12):
@@ -944,19 +1220,29 @@ def senha_revelada():
 @app.route('/meus_pedidos')
 @model.login_required(roles=['cliente'])
 def meus_pedidos():
-    """Lista todas as compras do usuário logado."""
+    """Lista as compras do usuário logado (com itens), uma página por vez."""
     user_id = session['user_id']
-    lista_pedidos = model.get_meus_pedidos(user_id)
-    return render_template('meus_pedidos.html', pedidos=lista_pedidos)
+    lista_pedidos, proxima_pagina = model.get_meus_pedidos(user_id, cursor=request.args.get('apos'))
+    return render_template('meus_pedidos.html', pedidos=lista_pedidos, proxima_pagina=proxima_pagina)
 
 @app.route('/pedido/<int:pedido_id>')
 @model.login_required(roles=['cliente'])
 def detalhes_pedido(pedido_id):
-    """(Opcional) Mostra os itens de um pedido específico."""
-    # Nota: Você precisaria criar uma função 'get_itens_pedido' no model 
-    # se quiser ver os detalhes (shampoo, batom) deste pedido específico.
-    # Por enquanto, vamos apenas renderizar uma página simples ou redirecionar.
-    return "Detalhes do pedido em construção..."
+    """Mostra os itens de um pedido específico."""
+    pedido = model.get_pedido_detalhado(pedido_id, session['user_id'])
+    if not pedido:
+        flash("Pedido não encontrado.", "warning")
+        return redirect(url_for('meus_pedidos'))
+    return render_template('detalhes_pedido.html', pedido=pedido)
+
+@app.route('/api/pedidos/<int:pedido_id>')
+@model.login_required(roles=['cliente'])
+def api_detalhes_pedido(pedido_id):
+    """Mesmo conteúdo de /pedido/<id>, em JSON."""
+    pedido = model.get_pedido_detalhado(pedido_id, session['user_id'])
+    if not pedido:
+        return jsonify({'erro': 'Pedido não encontrado.'}), 404
+    return jsonify(pedido)
     
 @app.route('/sobre')
 def sobre():
@@ -967,4 +1253,9 @@ def sobre():
 # teste de commit
 # --- Ponto de Entrada ---
 if __name__ == '__main__':
+    # Em desenvolvimento já aplica as migrações pendentes e gera as imagens
+    # que faltarem. Em produção rode 'python migracoes.py' e 'python imagens.py' no deploy.
+    import migracoes
+    migracoes.migrar(verbose=True)
+    imagens.gerar_derivadas(verbose=True)
     app.run(debug=True)
\ No newline at end of file
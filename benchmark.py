@@ -0,0 +1,239 @@
+"""
+Microbenchmarks do model.py e dos helpers do carrinho.
+
+    python benchmark.py                                   -> roda e salva em bench_resultados.json
+    python benchmark.py --tamanhos pequeno,medio,grande   -> escolhe as bases
+    python benchmark.py --salvar-baseline                 -> grava o resultado como baseline
+    python benchmark.py --baseline bench_baseline.json    -> compara e FALHA (exit 1) se piorou
+
+Cada tamanho usa uma base sintética (gerar_dados.py) guardada em DIR_BASES,
+criada só na primeira vez: a mesma semente gera sempre a mesma base,
+então os números de execuções diferentes são comparáveis. Os benchmarks
+rodam numa CÓPIA da base (registrar_pedido e baixar_estoque escrevem),
+para a próxima execução começar do mesmo estado.
+
+Para cada função medimos a mediana e o mínimo do tempo por chamada (µs).
+As funções com cache em memória aparecem duas vezes: 'quente' (cache cheio)
+e 'frio' (cache limpo a cada chamada, ou seja, o custo do banco).
+
+A regressão é a mediana ficar mais de LIMITE_PADRAO acima da baseline
+(mesmo tamanho, mesma função) e pelo menos MIN_DIFERENCA_US mais lenta. Compare só números da mesma máquina.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import timeit
+from datetime import datetime
+
+import model
+import gerar_dados
+
+DIR_BASES = 'bench_bases'
+ARQUIVO_RESULTADOS = 'bench_resultados.json'
+ARQUIVO_BASELINE = 'bench_baseline.json'
+REPETICOES = 5
+LIMITE_PADRAO = 0.25  # 25% mais lento que a baseline = regressão
+MIN_DIFERENCA_US = 2.0  # Abaixo disso é ruído do relógio (funções de ~1 µs)
+
+# Volumes de cada base (mesmos parâmetros de gerar_dados.gerar)
+TAMANHOS = {
+    'pequeno': dict(usuarios=1_000, produtos=500, linhas=10_000),
+    'medio': dict(usuarios=20_000, produtos=5_000, linhas=200_000),
+    'grande': dict(usuarios=200_000, produtos=50_000, linhas=2_000_000),
+}
+SEMENTE = 42
+
+
+def _preparar_base(tamanho):
+    """Aponta o model para uma cópia da base do tamanho pedido (gera se ainda não existir)."""
+    os.makedirs(DIR_BASES, exist_ok=True)
+    original = os.path.join(DIR_BASES, f'bench_{tamanho}.db')
+    if not os.path.exists(original):
+        print(f"--- Gerando base '{tamanho}' (só na primeira vez) ---")
+        gerar_dados.gerar(original, semente=SEMENTE, **TAMANHOS[tamanho])
+
+    copia = os.path.join(DIR_BASES, f'bench_{tamanho}.execucao.db')
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(copia + sufixo):
+            os.remove(copia + sufixo)
+    shutil.copyfile(original, copia)
+    model.DB_NAME = copia
+    model.cache_catalogo.invalidar()
+    return copia
+
+
+def _contexto():
+    """Escolhe na base os argumentos usados pelos benchmarks."""
+    conn = model.get_db_connection()
+    # Cliente com mais pedidos (pior caso do histórico) e um cliente típico
+    pesado = conn.execute('''
+        SELECT user_id FROM pedidos GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1
+    ''').fetchone()[0]
+    tipico = conn.execute('''
+        SELECT user_id FROM pedidos GROUP BY user_id ORDER BY COUNT(*) DESC
+        LIMIT 1 OFFSET (SELECT COUNT(DISTINCT user_id) FROM pedidos) / 2
+    ''').fetchone()[0]
+    usuario = conn.execute('SELECT username, email FROM users WHERE id = ?', (tipico,)).fetchone()
+    produtos = [dict(p) for p in conn.execute('SELECT id, nome, preco, estoque FROM produtos ORDER BY id LIMIT 20')]
+    # Estoque "infinito" para baixar_estoque medir sempre o caminho da escrita
+    conn.execute('UPDATE produtos SET estoque = 1000000000 WHERE id = ?', (produtos[0]['id'],))
+    conn.commit()
+    conn.close()
+
+    carrinho = [dict(p, quantidade=(i % 3) + 1) for i, p in enumerate(produtos)]
+    return {
+        'user_pesado': pesado,
+        'user_tipico': tipico,
+        'username': usuario['username'],
+        'email': usuario['email'],
+        'produto_id': produtos[0]['id'],
+        'carrinho': carrinho,
+        'total': round(sum(p['preco'] * p['quantidade'] for p in carrinho), 2),
+    }
+
+
+def _frio(funcao):
+    """Versão sem cache: limpa o cache do catálogo antes de cada chamada."""
+    def medir():
+        model.cache_catalogo.invalidar()
+        return funcao()
+    return medir
+
+
+def _casos(ctx):
+    """Lista de (nome, função sem argumentos) a medir."""
+    # Import tardio: o app importa Flask, templates etc. (só precisamos dos helpers)
+    import app as aplicacao
+    cliente = aplicacao.app.test_client()
+    produto_id = ctx['produto_id']
+
+    return [
+        ('get_all_produtos (quente)', model.get_all_produtos),
+        ('get_all_produtos (frio)', _frio(model.get_all_produtos)),
+        ('get_produtos_by_categoria (quente)', lambda: model.get_produtos_by_categoria('rosto')),
+        ('get_produtos_by_categoria (frio)', _frio(lambda: model.get_produtos_by_categoria('rosto'))),
+        ('get_produto_by_id (quente)', lambda: model.get_produto_by_id(produto_id)),
+        ('get_produto_by_id (frio)', _frio(lambda: model.get_produto_by_id(produto_id))),
+        ('filtrar_produtos_categoria', lambda: model.filtrar_produtos_categoria('rosto', ordem='menor_preco')),
+        ('get_user_by_username', lambda: model.get_user_by_username(ctx['username'])),
+        ('get_user_by_email', lambda: model.get_user_by_email(ctx['email'])),
+        ('get_user_by_id', lambda: model.get_user_by_id(ctx['user_tipico'])),
+        ('get_meus_pedidos (cliente típico)', lambda: model.get_meus_pedidos(ctx['user_tipico'])),
+        ('get_meus_pedidos (cliente pesado)', lambda: model.get_meus_pedidos(ctx['user_pesado'])),
+        ('registrar_pedido', lambda: model.registrar_pedido(
+            ctx['user_tipico'], ctx['carrinho'], ctx['total'], 'Pix', 'Rua do Benchmark, 1')),
+        ('baixar_estoque', lambda: model.baixar_estoque(produto_id, 1)),
+        ('calcular_total_carrinho', lambda: aplicacao.calcular_total_carrinho(ctx['carrinho'])),
+        ('calcular_total_itens', lambda: aplicacao.calcular_total_itens(ctx['carrinho'])),
+        ('buscar_produtos', lambda: model.buscar_produtos('batom matte')),
+        ('api_buscar_produtos (rota)', lambda: cliente.get('/api/buscar_produtos?q=batom+matte')),
+    ]
+
+
+def _medir(funcao, repeticoes=REPETICOES):
+    """Tempo por chamada em µs (cada repetição roda por pelo menos ~0,2s)."""
+    timer = timeit.Timer(funcao)
+    numero, _ = timer.autorange()
+    tempos = [t / numero * 1e6 for t in timer.repeat(repeat=repeticoes, number=numero)]
+    return {
+        'mediana_us': round(statistics.median(tempos), 3),
+        'min_us': round(min(tempos), 3),
+        'execucoes': numero * repeticoes,
+    }
+
+
+def rodar(tamanhos, filtro=None):
+    """Roda os benchmarks em cada tamanho. Retorna o dict de resultados (formato do JSON)."""
+    db_original = model.DB_NAME
+    resultados = {}
+    try:
+        for tamanho in tamanhos:
+            _preparar_base(tamanho)
+            ctx = _contexto()
+            print(f"--- BASE '{tamanho}' ({TAMANHOS[tamanho]}) ---")
+            resultados[tamanho] = {}
+            for nome, funcao in _casos(ctx):
+                if filtro and filtro not in nome:
+                    continue
+                funcao()  # Aquece (cache, statements compilados)
+                medida = _medir(funcao)
+                resultados[tamanho][nome] = medida
+                print(f"   {nome:<38} {medida['mediana_us']:>12.1f} µs  (min {medida['min_us']:.1f})")
+    finally:
+        model.DB_NAME = db_original
+        model.cache_catalogo.invalidar()
+
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'maquina': platform.node(),
+        'repeticoes': REPETICOES,
+        'resultados': resultados,
+    }
+
+
+def comparar(atual, baseline, limite=LIMITE_PADRAO):
+    """
+    Compara as medianas com a baseline.
+    Retorna a lista de regressões: (tamanho, nome, baseline_us, atual_us, variação).
+    """
+    regressoes = []
+    for tamanho, medidas in atual['resultados'].items():
+        base_tamanho = baseline.get('resultados', {}).get(tamanho, {})
+        for nome, medida in medidas.items():
+            base = base_tamanho.get(nome)
+            if not base:
+                continue  # Benchmark novo: nada para comparar ainda
+            variacao = medida['mediana_us'] / base['mediana_us'] - 1
+            if variacao > limite and medida['mediana_us'] - base['mediana_us'] >= MIN_DIFERENCA_US:
+                regressoes.append((tamanho, nome, base['mediana_us'], medida['mediana_us'], variacao))
+    return regressoes
+
+
+def _salvar(dados, caminho):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Microbenchmarks do model.py e do carrinho.')
+    parser.add_argument('--tamanhos', default='pequeno,medio',
+                        help=f"separados por vírgula: {', '.join(TAMANHOS)}")
+    parser.add_argument('--filtro', help='só benchmarks cujo nome contém este texto')
+    parser.add_argument('--saida', default=ARQUIVO_RESULTADOS)
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--limite', type=float, default=LIMITE_PADRAO,
+                        help='piora tolerada (0.25 = 25%%)')
+    parser.add_argument('--salvar-baseline', action='store_true',
+                        help=f'também grava o resultado em {ARQUIVO_BASELINE}')
+    args = parser.parse_args()
+
+    tamanhos = [t.strip() for t in args.tamanhos.split(',') if t.strip()]
+    desconhecidos = [t for t in tamanhos if t not in TAMANHOS]
+    if desconhecidos:
+        print(f"ERRO: tamanho(s) desconhecido(s): {', '.join(desconhecidos)}")
+        sys.exit(2)
+
+    atual = rodar(tamanhos, args.filtro)
+    _salvar(atual, args.saida)
+    print(f"--- Resultados salvos em {args.saida} ---")
+    if args.salvar_baseline:
+        _salvar(atual, ARQUIVO_BASELINE)
+        print(f"--- Baseline atualizada ({ARQUIVO_BASELINE}) ---")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)
+        regressoes = comparar(atual, baseline, args.limite)
+        if regressoes:
+            print(f"--- REGRESSÃO: {len(regressoes)} benchmark(s) mais de {args.limite:.0%} mais lentos ---")
+            for tamanho, nome, antes, depois, variacao in regressoes:
+                print(f"   [{tamanho}] {nome}: {antes:.1f} µs -> {depois:.1f} µs (+{variacao:.0%})")
+            sys.exit(1)
+        print(f"--- OK: nenhum benchmark piorou mais de {args.limite:.0%} ---")
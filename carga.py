@@ -0,0 +1,271 @@
+"""
+Teste de carga de ponta a ponta (da vitrine até o checkout).
+
+    python carga.py                                  -> 20 clientes por 30s numa base de carga
+    python carga.py --clientes 200 --duracao 120     -> "Black Friday"
+    python carga.py --banco lumina_carga.db          -> usa uma base já gerada (gerar_dados.py)
+    python carga.py --url http://127.0.0.1:8000 --banco lumina_carga.db
+                                                     -> servidor já rodando (ex: gunicorn)
+
+Sem --url, o app sobe num servidor WSGI local (werkzeug, com threads) numa
+porta livre. Cada cliente simulado é uma thread com a própria sessão (cookie)
+e repete o fluxo até o tempo acabar:
+
+    login -> index -> categoria -> busca -> adicionar ao carrinho
+          -> frete -> pagamento (cartão ou Pix) -> meus pedidos
+
+No fim mostra requisições/s e latência p50/p95/p99 por rota e confere
+os invariantes no banco: nenhum estoque negativo e todo pedido com itens.
+Sai com código 1 se algum invariante quebrar.
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+import model
+import gerar_dados
+
+BASE_PADRAO = 'lumina_carga.db'
+VOLUME_BASE_PADRAO = dict(usuarios=5_000, produtos=2_000, linhas=50_000)
+CATEGORIAS = [c[0] for c in gerar_dados.CATEGORIAS]
+TERMOS_BUSCA = ['batom', 'base matte', 'sérum', 'paleta', 'pincel', 'gloss', 'kit', 'glow', 'rosé', 'lumina']
+CEPS = ['01310-100', '20040-002', '30130-010', '40020-000', '80010-000', '88010-400', '90010-150', '69005-000']
+PRODUTOS_DISPUTADOS = 200  # Os mais vendidos: vários clientes brigando pelo mesmo estoque
+
+
+class Cliente:
+    """Um cliente simulado: conexão HTTP própria e cookie de sessão."""
+
+    def __init__(self, url, medicoes):
+        partes = urlsplit(url)
+        self.conexao = http.client.HTTPConnection(partes.hostname, partes.port, timeout=60)
+        self.cookies = {}
+        self.medicoes = medicoes  # rota -> lista de (segundos, status)
+
+    def requisitar(self, rota, metodo, caminho, formulario=None):
+        """Faz a requisição (sem seguir redirect) e guarda o tempo na 'rota'."""
+        corpo = urlencode(formulario) if formulario is not None else None
+        cabecalhos = {}
+        if corpo is not None:
+            cabecalhos['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            cabecalhos['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+
+        inicio = time.perf_counter()
+        try:
+            self.conexao.request(metodo, caminho, body=corpo, headers=cabecalhos)
+            resposta = self.conexao.getresponse()
+            resposta.read()
+            status = resposta.status
+        except (OSError, http.client.HTTPException):
+            self.conexao.close()
+            status = 0  # Falha de conexão
+            resposta = None
+        self.medicoes.setdefault(rota, []).append((time.perf_counter() - inicio, status))
+
+        if resposta is not None:
+            for valor in resposta.headers.get_all('Set-Cookie') or []:
+                for nome, morsel in SimpleCookie(valor).items():
+                    self.cookies[nome] = morsel.value
+        return status
+
+
+def _fluxo(cliente, username, senha, produtos, fim, rng):
+    """Loga uma vez e repete o passeio de compra até o tempo acabar."""
+    while time.time() < fim:
+        status = cliente.requisitar('login', 'POST', '/login', {'username': username, 'senha': senha})
+        if status == 302:
+            break
+        time.sleep(2 if status == 503 else 1)  # Fila de hash cheia: espera como o navegador faria
+    else:
+        return
+
+    compras = 0
+    while time.time() < fim:
+        cliente.requisitar('index', 'GET', '/')
+        categoria = rng.choice(CATEGORIAS)
+        cliente.requisitar('categoria_produtos', 'GET', f'/categoria/{categoria}?sort=menor_preco')
+        cliente.requisitar('api_buscar_produtos', 'GET',
+                           '/api/buscar_produtos?' + urlencode({'q': rng.choice(TERMOS_BUSCA)}))
+        for produto_id in rng.sample(produtos, rng.randint(1, 3)):
+            cliente.requisitar('adicionar_carrinho', 'POST', f'/adicionar_carrinho/{produto_id}',
+                               {'quantidade': rng.randint(1, 2)})
+        cliente.requisitar('calcular_frete', 'POST', '/calcular_frete', {'cep': rng.choice(CEPS)})
+        if compras % 2 == 0:
+            cliente.requisitar('pagamento_cartao', 'POST', '/pagamento/cartao', {})
+        else:
+            cliente.requisitar('checkout_confirmacao', 'GET', '/checkout/confirmacao')
+        cliente.requisitar('meus_pedidos', 'GET', '/meus_pedidos')
+        compras += 1
+
+
+def _percentil(ordenados, p):
+    """Percentil por posição (lista já ordenada)."""
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def _relatorio(medicoes, duracao):
+    """Agrupa as medições por rota. Retorna {rota: {...}} com tempos em ms."""
+    por_rota = {}
+    for rota, amostras in sorted(medicoes.items()):
+        tempos = sorted(t * 1000 for t, _ in amostras)
+        por_rota[rota] = {
+            'requisicoes': len(amostras),
+            'por_segundo': round(len(amostras) / duracao, 1),
+            'recusadas_503': sum(1 for _, s in amostras if s == 503),
+            'erros': sum(1 for _, s in amostras if s == 0 or (s >= 400 and s != 503)),
+            'media_ms': round(statistics.fmean(tempos), 2),
+            'p50_ms': round(_percentil(tempos, 50), 2),
+            'p95_ms': round(_percentil(tempos, 95), 2),
+            'p99_ms': round(_percentil(tempos, 99), 2),
+            'max_ms': round(tempos[-1], 2),
+        }
+    return por_rota
+
+
+def verificar_invariantes():
+    """Confere o banco depois da carga. Retorna a lista de problemas (vazia = OK)."""
+    conn = model.get_db_connection()
+    problemas = []
+    negativos = conn.execute('SELECT COUNT(*) FROM produtos WHERE estoque < 0').fetchone()[0]
+    if negativos:
+        problemas.append(f"{negativos} produto(s) com estoque negativo")
+    sem_itens = conn.execute('''
+        SELECT COUNT(*) FROM pedidos p
+        WHERE NOT EXISTS (SELECT 1 FROM itens_pedido i WHERE i.pedido_id = p.id)
+    ''').fetchone()[0]
+    if sem_itens:
+        problemas.append(f"{sem_itens} pedido(s) sem itens")
+    conn.close()
+    return problemas
+
+
+def _preparar_base(banco):
+    """Aponta o model para a base de carga (gera uma pequena se não existir)."""
+    if not os.path.exists(banco):
+        print(f"--- Base {banco} não existe: gerando {VOLUME_BASE_PADRAO} ---")
+        gerar_dados.gerar(banco, **VOLUME_BASE_PADRAO)
+    model.DB_NAME = banco
+    model.cache_catalogo.invalidar()
+
+
+def _amostra(clientes, rng):
+    """Escolhe os usuários que vão comprar e os produtos disputados."""
+    conn = model.get_db_connection()
+    usuarios = [r[0] for r in conn.execute('''
+        SELECT username FROM users WHERE papel = 'cliente' AND email LIKE '%@carga.lumina'
+    ''')]
+    produtos = [r[0] for r in conn.execute('''
+        SELECT p.id FROM produtos p JOIN itens_pedido i ON i.produto_id = p.id
+        WHERE p.estoque > 0 GROUP BY p.id ORDER BY COUNT(*) DESC LIMIT ?
+    ''', (PRODUTOS_DISPUTADOS,))]
+    conn.close()
+    if len(usuarios) < clientes:
+        raise ValueError(f"a base só tem {len(usuarios)} clientes de carga (pedidos {clientes})")
+    if not produtos:
+        raise ValueError("a base não tem produtos com estoque")
+    return rng.sample(usuarios, clientes), produtos
+
+
+def _subir_servidor():
+    """Sobe o app num servidor WSGI local (com threads) numa porta livre."""
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # Sem uma linha de log por requisição
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_port}'
+
+
+def rodar(clientes, duracao, banco, url=None, semente=42):
+    """Roda a carga e retorna (relatorio_por_rota, duracao_real, problemas)."""
+    _preparar_base(banco)
+    rng = random.Random(semente)
+    usuarios, produtos = _amostra(clientes, rng)
+
+    servidor = None
+    if url is None:
+        servidor, url = _subir_servidor()
+
+    fim = time.time() + duracao
+    medicoes = [{} for _ in range(clientes)]  # Uma por thread: nada de lock no caminho quente
+    threads = [
+        threading.Thread(target=_fluxo, args=(
+            Cliente(url, medicoes[i]), usuarios[i], gerar_dados.SENHA_PADRAO,
+            produtos, fim, random.Random(semente + i)))
+        for i in range(clientes)
+    ]
+
+    print(f"--- {clientes} clientes por {duracao}s contra {url} ---")
+    inicio = time.perf_counter()
+    # Os prints de DEBUG das rotas iriam inundar a saída: descarta enquanto a carga roda
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    decorrido = time.perf_counter() - inicio
+
+    if servidor is not None:
+        servidor.shutdown()
+
+    juntas = {}
+    for m in medicoes:
+        for rota, amostras in m.items():
+            juntas.setdefault(rota, []).extend(amostras)
+    return _relatorio(juntas, decorrido), decorrido, verificar_invariantes()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Teste de carga do fluxo de compra.')
+    parser.add_argument('--clientes', type=int, default=20)
+    parser.add_argument('--duracao', type=int, default=30, help='segundos')
+    parser.add_argument('--banco', default=BASE_PADRAO, help='base de carga (gerada se não existir)')
+    parser.add_argument('--url', help='servidor já rodando (senão sobe um local)')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help='salva o relatório em JSON')
+    args = parser.parse_args()
+
+    if os.path.abspath(args.banco) == os.path.abspath(model.DB_NAME):
+        print(f"ERRO: '{args.banco}' é o banco da loja; use uma base de carga")
+        sys.exit(2)
+
+    try:
+        relatorio, decorrido, problemas = rodar(args.clientes, args.duracao, args.banco, args.url, args.semente)
+    except ValueError as e:
+        print(f"ERRO: {e}")
+        sys.exit(2)
+
+    total = sum(r['requisicoes'] for r in relatorio.values())
+    print(f"{'rota':<22}{'req':>8}{'req/s':>9}{'503':>6}{'erros':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for rota, r in relatorio.items():
+        print(f"{rota:<22}{r['requisicoes']:>8}{r['por_segundo']:>9.1f}{r['recusadas_503']:>6}{r['erros']:>7}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+    print(f"--- TOTAL: {total} requisições em {decorrido:.1f}s ({total / decorrido:.1f} req/s) ---")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump({'clientes': args.clientes, 'duracao_s': round(decorrido, 1),
+                       'total_requisicoes': total, 'rotas': relatorio,
+                       'invariantes': problemas}, arquivo, ensure_ascii=False, indent=2)
+
+    if problemas:
+        print("--- INVARIANTES QUEBRADOS ---")
+        for problema in problemas:
+            print(f"   ! {problema}")
+        sys.exit(1)
+    print("--- Invariantes OK: nenhum estoque negativo, todo pedido tem itens ---")
@@ -0,0 +1,213 @@
+"""
+Consulta de endereço por CEP, local (sem chamar API de fora).
+
+    python ceps.py compilar enderecos.csv            -> gera ARQUIVO_CEPS
+    python ceps.py compilar enderecos.csv outro.bin  -> gera outro arquivo
+    python ceps.py 01310-100                         -> consulta um CEP
+
+    ceps.buscar('01310-100')
+        -> {'cep': '01310-100', 'logradouro': 'Avenida Paulista', 'bairro': 'Bela Vista',
+            'cidade': 'São Paulo', 'uf': 'SP'}     (None se o CEP não existir)
+
+O CSV de entrada (vírgula ou ponto e vírgula, com cabeçalho) tem as colunas:
+
+    cep,logradouro,bairro,cidade,uf
+
+O arquivo compilado é binário e ordenado pelo CEP:
+
+    cabeçalho   MAGICO, quantidade de registros, posição dos textos
+    registros   um por CEP, tamanho fixo (cep, logradouro, bairro, cidade, uf)
+    textos      cada texto uma vez só (bairro e cidade se repetem muito),
+                com o tamanho na frente; os registros guardam a posição
+
+Ele é aberto com mmap: quem guarda o arquivo na memória é o sistema
+operacional, uma vez só para todos os workers, e só as páginas que as
+buscas tocam. O CEP é achado com busca binária direto nos registros
+(~20 leituras para 1 milhão de CEPs).
+
+Configuração por variável de ambiente:
+    LUMINA_CEPS   outro arquivo compilado (padrão ceps.bin)
+"""
+import csv
+import mmap
+import os
+import struct
+import sys
+import threading
+
+from frete import formatar_cep, limpar_cep
+
+ARQUIVO_CEPS = os.environ.get(
+    'LUMINA_CEPS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ceps.bin'))
+
+MAGICO = b'LUMCEP01'
+CABECALHO = struct.Struct('<8sII')   # mágico, quantidade, posição dos textos
+REGISTRO = struct.Struct('<IIII2s')  # cep, logradouro, bairro, cidade (posições), uf
+TAMANHO_TEXTO = struct.Struct('<H')
+CEP = struct.Struct('<I')            # Os 4 primeiros bytes de cada registro
+
+
+# --- COMPILAÇÃO ---
+
+
+def _ler_csv(caminho):
+    with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+        cabecalho = arquivo.readline()
+        arquivo.seek(0)
+        delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+        yield from csv.DictReader(arquivo, delimiter=delimitador)
+
+
+def _uf_valida(uf):
+    """Sigla de estado: exatamente duas letras ASCII (o registro guarda 2 bytes)."""
+    return len(uf) == 2 and uf.isascii() and uf.isalpha()
+
+
+def compilar(origem, destino=None, verbose=False):
+    """
+    Lê o CSV e grava o arquivo binário ordenado. Linhas com CEP ou UF inválidos
+    ficam de fora (contadas como inválidas). Retorna quantos CEPs foram gravados.
+    """
+    destino = destino or ARQUIVO_CEPS
+    registros = {}
+    invalidos = repetidos = 0
+    for linha in _ler_csv(origem):
+        cep = limpar_cep(linha.get('cep'))
+        uf = (linha.get('uf') or '').strip().upper()
+        if cep is None or not _uf_valida(uf):
+            invalidos += 1
+            continue
+        if int(cep) in registros:
+            repetidos += 1  # Vale a primeira linha
+            continue
+        registros[int(cep)] = tuple((linha.get(c) or '').strip()
+                                    for c in ('logradouro', 'bairro', 'cidade')) + (uf,)
+
+    textos = bytearray()
+    posicoes = {}
+
+    def texto(valor):
+        if valor not in posicoes:
+            dados = valor.encode('utf-8')[:0xFFFF]
+            posicoes[valor] = len(textos)
+            textos.extend(TAMANHO_TEXTO.pack(len(dados)))
+            textos.extend(dados)
+        return posicoes[valor]
+
+    corpo = bytearray()
+    for numero in sorted(registros):
+        logradouro, bairro, cidade, uf = registros[numero]
+        corpo.extend(REGISTRO.pack(numero, texto(logradouro), texto(bairro), texto(cidade),
+                                   uf.encode('ascii')))
+
+    # Grava ao lado e troca de uma vez: quem estiver lendo o antigo não vê arquivo pela metade
+    temporario = f'{destino}.tmp'
+    with open(temporario, 'wb') as saida:
+        saida.write(CABECALHO.pack(MAGICO, len(registros), CABECALHO.size + len(corpo)))
+        saida.write(corpo)
+        saida.write(textos)
+    os.replace(temporario, destino)
+    _base.clear()
+
+    if verbose:
+        print(f"   -> {len(registros)} CEPs, {len(posicoes)} textos distintos, "
+              f"{os.path.getsize(destino) // 1024} KB ({invalidos} inválidos, {repetidos} repetidos ignorados)")
+    return len(registros)
+
+
+# --- CONSULTA ---
+
+
+class BaseCeps:
+    """Arquivo compilado aberto com mmap (só leitura; pode ser usado por várias threads)."""
+
+    def __init__(self, caminho):
+        with open(caminho, 'rb') as arquivo:
+            self.mtime = os.fstat(arquivo.fileno()).st_mtime_ns
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        magico, self.quantidade, self._inicio_textos = CABECALHO.unpack_from(self._mapa, 0)
+        if magico != MAGICO:
+            raise ValueError(f"{caminho} não é um arquivo de CEPs compilado")
+
+    def _cep(self, i):
+        return CEP.unpack_from(self._mapa, CABECALHO.size + i * REGISTRO.size)[0]
+
+    def _texto(self, posicao):
+        inicio = self._inicio_textos + posicao
+        tamanho = TAMANHO_TEXTO.unpack_from(self._mapa, inicio)[0]
+        inicio += TAMANHO_TEXTO.size
+        return self._mapa[inicio:inicio + tamanho].decode('utf-8')
+
+    def buscar(self, cep):
+        """Endereço de um CEP (8 dígitos) ou None."""
+        numero = int(cep)
+        baixo, alto = 0, self.quantidade
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if self._cep(meio) < numero:
+                baixo = meio + 1
+            else:
+                alto = meio
+        if baixo == self.quantidade or self._cep(baixo) != numero:
+            return None
+        _, logradouro, bairro, cidade, uf = REGISTRO.unpack_from(self._mapa, CABECALHO.size + baixo * REGISTRO.size)
+        return {
+            'cep': formatar_cep(cep),
+            'logradouro': self._texto(logradouro),
+            'bairro': self._texto(bairro),
+            'cidade': self._texto(cidade),
+            'uf': uf.rstrip(b'\x00').decode('ascii'),
+        }
+
+
+_base = {}  # 'base' -> BaseCeps aberta (reaberta se o arquivo for recompilado)
+_lock = threading.Lock()
+
+
+def base():
+    """Base aberta, ou None se o arquivo ainda não foi compilado."""
+    try:
+        mtime = os.stat(ARQUIVO_CEPS).st_mtime_ns
+    except OSError:
+        return None
+    atual = _base.get('base')
+    if atual is None or atual.mtime != mtime:
+        with _lock:
+            atual = _base.get('base')
+            if atual is None or atual.mtime != mtime:
+                # O mapa antigo é fechado sozinho quando ninguém mais o usa
+                atual = _base['base'] = BaseCeps(ARQUIVO_CEPS)
+    return atual
+
+
+def disponivel():
+    """Existe base de CEPs? (sem ela só dá para conferir o formato)"""
+    return base() is not None
+
+
+def buscar(cep):
+    """Endereço do CEP ('01310-100' ou '01310100') ou None (formato inválido, sem base ou CEP inexistente)."""
+    cep = limpar_cep(cep)
+    atual = base()
+    if cep is None or atual is None:
+        return None
+    return atual.buscar(cep)
+
+
+def linha_endereco(endereco):
+    """Endereço numa linha só, como vai no cadastro ('Avenida Paulista, Bela Vista, São Paulo - SP, 01310-100')."""
+    partes = [p for p in (endereco['logradouro'], endereco['bairro']) if p]
+    partes.append(f"{endereco['cidade']} - {endereco['uf']}")
+    partes.append(endereco['cep'])
+    return ', '.join(partes)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (3, 4) and sys.argv[1] == 'compilar':
+        print("--- COMPILANDO BASE DE CEPS ---")
+        total = compilar(sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else None, verbose=True)
+        print(f"--- {total} CEP(s) gravado(s) em {sys.argv[3] if len(sys.argv) == 4 else ARQUIVO_CEPS} ---")
+    elif len(sys.argv) == 2:
+        print(buscar(sys.argv[1]) or "CEP não encontrado.")
+    else:
+        print("Uso: python ceps.py compilar <arquivo.csv> [saida.bin]  |  python ceps.py <cep>")
@@ -0,0 +1,158 @@
+"""
+"Quem comprou, levou também": produtos comprados juntos, calculados fora do site.
+
+    python compras_juntas.py                   -> processa os pedidos novos desde a última vez
+    python compras_juntas.py --tudo            -> refaz tudo do zero
+    python compras_juntas.py --banco carga.db  -> outro banco
+
+Rode de tempos em tempos (cron, ex: de hora em hora). A cada execução:
+
+    1. lê de itens_pedido só os pedidos com id maior que o último processado
+       (guardado em catalogo_meta), em lotes de LOTE_ITENS itens;
+    2. soma +1 em compras_pares para cada par de produtos distintos do mesmo
+       pedido (matriz esparsa: só existem os pares que já saíram juntos);
+    3. regrava, para os produtos que ganharam pares, os TOP_K parceiros mais
+       frequentes em compras_juntas.
+
+Cada lote é uma transação com o ponto de parada junto: se cair no meio,
+a próxima execução continua dali sem contar pedido duas vezes.
+
+O site só lê compras_juntas (model.get_comprados_juntos), uma faixa da chave
+primária por produto: nada é calculado durante a requisição.
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+from itertools import combinations, groupby
+
+import migracoes
+import model
+
+TOP_K = 8             # Parceiros guardados por produto
+LOTE_ITENS = 200_000  # Itens de pedido lidos por transação (pedidos nunca são partidos)
+
+CHAVE_ULTIMO_PEDIDO = 'compras_juntas_pedido'
+
+
+def _ultimo_pedido(conn):
+    linha = conn.execute('SELECT valor FROM catalogo_meta WHERE chave = ?', (CHAVE_ULTIMO_PEDIDO,)).fetchone()
+    return linha[0] if linha else 0
+
+
+def _fim_do_lote(conn, depois_de, itens):
+    """Último pedido do próximo lote (cerca de 'itens' itens depois de 'depois_de'); None = vai até o fim."""
+    linha = conn.execute('''
+        SELECT pedido_id FROM itens_pedido WHERE pedido_id > ?
+        ORDER BY pedido_id LIMIT 1 OFFSET ?
+    ''', (depois_de, itens)).fetchone()
+    return linha[0] if linha else None
+
+
+def _contar_pares(linhas):
+    """[(pedido_id, produto_id)] em ordem de pedido -> Counter {(a, b): pedidos} com a < b."""
+    pares = Counter()
+    for _, itens in groupby(linhas, key=lambda l: l[0]):
+        produtos = sorted({produto_id for _, produto_id in itens})
+        pares.update(combinations(produtos, 2))
+    return pares
+
+
+def _regravar_top(conn, produto_id, k, carimbo):
+    """Regrava os k parceiros mais frequentes do produto (só se a lista mudou)."""
+    novos = conn.execute('''
+        SELECT outro_id, vezes FROM compras_pares WHERE produto_id = ?
+        ORDER BY vezes DESC, outro_id LIMIT ?
+    ''', (produto_id, k)).fetchall()
+    atuais = conn.execute('''
+        SELECT relacionado_id, vezes FROM compras_juntas WHERE produto_id = ? ORDER BY posicao
+    ''', (produto_id,)).fetchall()
+    novos = [tuple(n) for n in novos]
+    if novos == [tuple(a) for a in atuais]:
+        return False
+    conn.execute('DELETE FROM compras_juntas WHERE produto_id = ?', (produto_id,))
+    conn.executemany('''
+        INSERT INTO compras_juntas (produto_id, posicao, relacionado_id, vezes, gravado_em)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(produto_id, posicao, outro, vezes, carimbo) for posicao, (outro, vezes) in enumerate(novos)])
+    return True
+
+
+def atualizar(tudo=False, k=TOP_K, lote_itens=LOTE_ITENS, verbose=False):
+    """Processa os pedidos novos. Retorna um resumo (dict)."""
+    migracoes.migrar()
+    conn = model.get_db_connection()
+    resumo = {'pedidos_ate': 0, 'pares': 0, 'produtos_regravados': 0}
+    inicio = time.perf_counter()
+    try:
+        if tudo:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM compras_pares')
+            conn.execute('DELETE FROM compras_juntas')
+            conn.execute('DELETE FROM catalogo_meta WHERE chave = ?', (CHAVE_ULTIMO_PEDIDO,))
+            conn.commit()
+
+        ultimo = _ultimo_pedido(conn)
+        while True:
+            fim = _fim_do_lote(conn, ultimo, lote_itens)
+            if fim is None:
+                fim = conn.execute('SELECT MAX(pedido_id) FROM itens_pedido').fetchone()[0] or 0
+                if fim <= ultimo:
+                    break
+            linhas = conn.execute('''
+                SELECT pedido_id, produto_id FROM itens_pedido
+                WHERE pedido_id > ? AND pedido_id <= ? ORDER BY pedido_id
+            ''', (ultimo, fim)).fetchall()
+            pares = _contar_pares(linhas)
+            tocados = {p for par in pares for p in par}
+            carimbo = time.time_ns() // 1000
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Confere o ponto de parada dentro da transação: outra execução pode ter passado na frente
+                if _ultimo_pedido(conn) != ultimo:
+                    raise RuntimeError("outra execução de compras_juntas.py está rodando")
+                conn.executemany('''
+                    INSERT INTO compras_pares (produto_id, outro_id, vezes) VALUES (?, ?, ?)
+                    ON CONFLICT (produto_id, outro_id) DO UPDATE SET vezes = vezes + excluded.vezes
+                ''', [(x, y, n) for (a, b), n in pares.items() for x, y in ((a, b), (b, a))])
+                regravados = sum(_regravar_top(conn, p, k, carimbo) for p in sorted(tocados))
+                conn.execute('''
+                    INSERT INTO catalogo_meta (chave, valor) VALUES (?, ?)
+                    ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor
+                ''', (CHAVE_ULTIMO_PEDIDO, fim))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            ultimo = fim
+            resumo['pares'] += len(pares)
+            resumo['produtos_regravados'] += regravados
+            if verbose:
+                print(f"   -> até o pedido {fim}: {len(linhas)} itens, {len(pares)} pares, "
+                      f"{regravados} produto(s) com lista nova")
+        resumo['pedidos_ate'] = ultimo
+    finally:
+        conn.close()
+    resumo['segundos'] = round(time.perf_counter() - inicio, 1)
+    return resumo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Atualiza os produtos comprados juntos a partir dos pedidos.')
+    parser.add_argument('--tudo', action='store_true', help='apaga tudo e reprocessa todos os pedidos')
+    parser.add_argument('--banco', default=model.DB_NAME, help='arquivo SQLite')
+    parser.add_argument('--k', type=int, default=TOP_K,
+                        help='parceiros guardados por produto (ao mudar, rode com --tudo)')
+    args = parser.parse_args()
+
+    model.DB_NAME = args.banco
+    print(f"--- COMPRADOS JUNTOS ({args.banco}{', do zero' if args.tudo else ''}) ---")
+    try:
+        resumo = atualizar(tudo=args.tudo, k=args.k, verbose=True)
+    except RuntimeError as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
+    print(f"--- FIM: pedidos até #{resumo['pedidos_ate']}, {resumo['pares']} pares somados, "
+          f"{resumo['produtos_regravados']} produto(s) atualizados em {resumo['segundos']}s ---")
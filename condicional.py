@@ -0,0 +1,109 @@
+"""
+GET condicional (ETag / Last-Modified) para as páginas do catálogo.
+
+A rota calcula um validador barato ANTES de renderizar (a data de alteração
+do produto, da categoria ou do resultado da busca) e pergunta:
+
+    etag = condicional.etag('produto', produto['id'], produto['atualizado_em'])
+    if condicional.nao_modificado(etag):
+        return condicional.resposta_304(etag)
+    ...
+    return condicional.preparar(make_response(render_template(...)), etag)
+
+Se o navegador já tem aquela versão (If-None-Match / If-Modified-Since), a
+resposta é um 304 vazio: sem template, sem JSON e sem corpo na rede.
+
+As páginas HTML mostram coisas do usuário (nome no menu, carrinho), então o
+ETag leva também o estado do usuário (estado_usuario) e a versão dos
+templates. Last-Modified só vai em respostas iguais para todos (visitante sem
+sessão ou API): a data sozinha não sabe que o usuário fez login.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+
+from flask import current_app, request, session
+
+import imagens
+
+PASTA_TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+_versao_templates = []  # (hash, mtime mais recente); calculada na primeira requisição
+
+
+def _templates():
+    """Impressão digital dos templates e do manifesto de imagens: muda a cada deploy que mexe neles."""
+    if not _versao_templates:
+        arquivos = [imagens.MANIFESTO]
+        for pasta, _, nomes in os.walk(PASTA_TEMPLATES):
+            arquivos.extend(os.path.join(pasta, n) for n in nomes)
+        assinatura = []
+        for caminho in sorted(arquivos):
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue
+            assinatura.append((caminho, info.st_mtime_ns, info.st_size))
+        _versao_templates.append((hashlib.sha1(repr(assinatura).encode()).hexdigest()[:8],
+                                  max((a[1] for a in assinatura), default=0) // 1000))
+    return _versao_templates[0]
+
+
+def versao_templates():
+    return _templates()[0]
+
+
+def etag(*partes):
+    """ETag (sem aspas) a partir das partes que definem o conteúdo da resposta."""
+    return hashlib.sha1(repr(partes).encode()).hexdigest()[:20]
+
+
+def data(micros):
+    """
+    produtos.atualizado_em (microssegundos) -> datetime UTC para o Last-Modified
+    (None se não houver). Nunca antes do último deploy dos templates.
+    """
+    if not micros:
+        return None
+    return datetime.fromtimestamp(max(micros, _templates()[1]) // 1_000_000, tz=timezone.utc)
+
+
+def publico():
+    """A resposta é igual para qualquer um? (visitante sem sessão: sem login, carrinho ou flash)"""
+    return not session
+
+
+def pode_validar():
+    """Mensagem flash pendente some depois de mostrada: essa página não pode ser reaproveitada."""
+    return '_flashes' not in session
+
+
+def nao_modificado(valor_etag, modificado_em=None):
+    """O navegador já tem esta versão? If-None-Match manda; If-Modified-Since só vale sem ele."""
+    if not pode_validar():
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(valor_etag)
+    if modificado_em is not None and request.if_modified_since and publico():
+        return modificado_em <= request.if_modified_since
+    return False
+
+
+def preparar(resposta, valor_etag, modificado_em=None):
+    """Coloca os validadores (e o Cache-Control que obriga a revalidar) na resposta."""
+    if not pode_validar():
+        return resposta
+    resposta.set_etag(valor_etag, weak=True)
+    if modificado_em is not None and publico():
+        resposta.last_modified = modificado_em
+    # no-cache = pode guardar, mas pergunta ao servidor antes de usar (If-None-Match)
+    resposta.cache_control.no_cache = True
+    if not publico():
+        resposta.cache_control.private = True  # Proxy não guarda a página de um usuário
+    resposta.vary.add('Cookie')
+    return resposta
+
+
+def resposta_304(valor_etag, modificado_em=None):
+    """304 Not Modified (sem corpo) com os mesmos cabeçalhos de validação."""
+    return preparar(current_app.response_class(status=304), valor_etag, modificado_em)
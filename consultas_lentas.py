@@ -0,0 +1,113 @@
+"""
+Registro de consultas lentas (opcional).
+
+Ligado pela variável de ambiente LUMINA_CONSULTA_LENTA_MS (ex: 50) ou pela
+página /admin/consultas_lentas. Todo comando SQL das conexões do model que
+passar do limite é guardado (os mais recentes, até MAX_REGISTROS) com:
+
+    - o SQL e os parâmetros MASCARADOS (só tipo e tamanho, nunca o valor);
+    - o EXPLAIN QUERY PLAN (mostra "SCAN tabela" = leitura da tabela inteira);
+    - a rota que fez a consulta.
+
+Desligado (limite None), o custo é um "if" por comando.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from flask import has_request_context, request
+
+MAX_REGISTROS = 200
+MAX_PLANOS = 500  # Planos guardados por SQL (o plano não muda com os parâmetros)
+
+_limite_env = os.environ.get('LUMINA_CONSULTA_LENTA_MS')
+LIMITE_S = float(_limite_env) / 1000 if _limite_env else None  # None = desligado
+
+_registros = deque(maxlen=MAX_REGISTROS)
+_planos = {}
+_lock = threading.Lock()
+
+# Só estes comandos têm plano (BEGIN, COMMIT, PRAGMA... não)
+_COM_PLANO = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def configurar(limite_ms):
+    """Liga (limite em ms) ou desliga (None) o registro."""
+    global LIMITE_S
+    LIMITE_S = limite_ms / 1000 if limite_ms is not None else None
+
+
+def limite_ms():
+    return LIMITE_S * 1000 if LIMITE_S is not None else None
+
+
+def _mascarar(valor):
+    if valor is None:
+        return 'NULL'
+    if isinstance(valor, (str, bytes)):
+        return f'{type(valor).__name__}[{len(valor)}]'
+    return type(valor).__name__
+
+
+def mascarar_parametros(parametros):
+    """Troca cada valor pelo tipo (e tamanho): nada de senha ou e-mail no log."""
+    if isinstance(parametros, dict):
+        return {nome: _mascarar(v) for nome, v in parametros.items()}
+    return [_mascarar(v) for v in parametros]
+
+
+def _plano(conn, sql, parametros):
+    """EXPLAIN QUERY PLAN do comando (em cache por texto do SQL)."""
+    plano = _planos.get(sql)
+    if plano is not None:
+        return plano
+    if not sql.lstrip().upper().startswith(_COM_PLANO):
+        return []
+    try:
+        # Connection.execute da classe base: não passa pelo cursor medido (sem recursão)
+        linhas = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parametros).fetchall()
+        plano = [linha[3] for linha in linhas]
+    except sqlite3.Error as e:
+        plano = [f'(plano indisponível: {e})']
+    if len(_planos) >= MAX_PLANOS:
+        _planos.clear()
+    _planos[sql] = plano
+    return plano
+
+
+def registrar(conn, sql, parametros, segundos):
+    """Guarda um comando lento. Retorna o registro (o cursor atualiza o tempo depois)."""
+    if has_request_context():
+        rota = f'{request.endpoint or "desconhecido"} ({request.method} {request.path})'
+    else:
+        rota = 'fora de requisição'
+    # Os parâmetros só servem para montar o plano; no registro vão mascarados
+    plano = _plano(conn, sql, parametros)
+    registro = {
+        'quando': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'ms': round(segundos * 1000, 2),
+        'rota': rota,
+        'sql': ' '.join(sql.split()),
+        'parametros': mascarar_parametros(parametros),
+        'plano': plano,
+        'varredura': any(p.startswith('SCAN ') and ' USING ' not in p and 'VIRTUAL TABLE' not in p
+                         for p in plano),
+    }
+    with _lock:
+        _registros.append(registro)
+    print(f"CONSULTA LENTA ({registro['ms']} ms) em {rota}: {registro['sql'][:200]}")
+    return registro
+
+
+def recentes():
+    """Registros do mais novo para o mais antigo."""
+    with _lock:
+        return list(reversed(_registros))
+
+
+def limpar():
+    with _lock:
+        _registros.clear()
+        _planos.clear()
@@ -0,0 +1,84 @@
+"""
+Cache de HTML já renderizado das páginas do catálogo.
+
+As grades de produtos (home e categorias) só mudam quando o catálogo muda,
+mas eram montadas produto a produto em toda requisição. Aqui elas ficam
+guardadas prontas, com a versão do catálogo (model.cache_catalogo.versao)
+na chave: quando o admin edita um produto (ou um produto esgota), a versão
+sobe e as grades antigas deixam de valer sozinhas, sem invalidação manual.
+Escritas de outros workers ou scripts também contam: a versão do banco
+(catalogo_meta) é conferida no começo de cada requisição
+(model.sincronizar_catalogo) e, se mudou, a versão local sobe.
+
+O que é de cada usuário (nome no menu, contador do carrinho, mensagens
+flash) continua FORA do cache: o template da página é renderizado normalmente
+e só recebe a grade pronta. A exceção é a home de visitante sem sessão, que
+é igual para todos e sai inteira do cache (ver app.index).
+
+Obs: editar um template não muda a versão; reinicie o servidor depois de
+mexer em templates/parciais/.
+"""
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from markupsafe import Markup
+
+import model
+
+
+class CacheFragmentos:
+    """HTML renderizado por chave (LRU), válido só para a versão atual do catálogo."""
+
+    def __init__(self, max_itens=256):
+        self.max_itens = max_itens
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._versao = None
+        self._itens = OrderedDict()  # chave -> valor renderizado
+
+    def obter(self, chave, gerar):
+        """Valor guardado para 'chave' ou, se não houver, o resultado de gerar() (que é guardado)."""
+        versao = model.cache_catalogo.versao
+        with self._lock:
+            if versao != self._versao:
+                # Catálogo mudou: tudo que estava guardado é de uma versão antiga
+                self._itens.clear()
+                self._versao = versao
+            valor = self._itens.get(chave)
+            if valor is not None:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return valor
+            self.misses += 1
+
+        # Renderiza fora do lock (duas threads podem gerar a mesma chave; tudo bem)
+        valor = gerar()
+        with self._lock:
+            # Se o catálogo mudou durante a renderização, o valor já nasceu velho
+            if versao == self._versao == model.cache_catalogo.versao:
+                self._itens[chave] = valor
+                while len(self._itens) > self.max_itens:
+                    self._itens.popitem(last=False)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'itens': len(self._itens)}
+
+
+cache_fragmentos = CacheFragmentos()
+
+
+def renderizar(nome_template, **contexto):
+    """
+    Renderiza um trecho de template SEM os context processors do app
+    (inject_user_info): o que sai daqui pode ser servido para qualquer usuário.
+    """
+    template = current_app.jinja_env.get_template(nome_template)
+    return Markup(template.render(**contexto))
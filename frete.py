@@ -0,0 +1,200 @@
+"""
+Cotação de frete por faixa de CEP, peso e valor do pedido.
+
+    frete.cotar('88010-400', peso_gramas=800, subtotal=120.0)
+        -> {'cep': '88010-400', 'uf': 'SC', 'zona': 'Florianópolis (SC)',
+            'valor': 7.5, 'prazo_dias': 1, 'gratis': False}
+    frete.cotar_carrinho('88010-400', carrinho)   -> o mesmo, a partir dos itens
+    frete.gratis(subtotal)                        -> passa do valor do frete grátis?
+
+As faixas de CEP vêm de ARQUIVO_ZONAS (CSV, uma linha por faixa):
+
+    cep_inicio,cep_fim,uf,zona,preco_base,adicional_kg,prazo_dias
+
+    preco_base    frete de até 300 g para a faixa
+    adicional_kg  R$ por kg (ou fração) acima de 5 kg
+    prazo_dias    dias úteis
+
+As faixas ficam em listas ordenadas pelo início; o CEP é achado com bisect
+(O(log n), não importa se são 60 ou 6000 faixas). Sobre o preço da faixa
+entram as faixas de peso (FAIXAS_PESO) e de valor (FAIXAS_VALOR); acima de
+FRETE_GRATIS_ACIMA o frete é grátis. Como muitos pedidos caem na mesma
+combinação (faixa de CEP, faixa de peso, faixa de valor), o preço de cada
+combinação é memorizado (lru_cache), num cache de cada tabela: recarregar
+troca tabela e cache juntos, numa atribuição só.
+
+Configuração por variável de ambiente:
+    LUMINA_FRETE_GRATIS   valor mínimo do frete grátis (padrão 250.00)
+    LUMINA_FRETE_ZONAS    outro arquivo de faixas
+"""
+import csv
+import math
+import os
+import threading
+from bisect import bisect_right
+from functools import lru_cache
+
+ARQUIVO_ZONAS = os.environ.get(
+    'LUMINA_FRETE_ZONAS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frete_zonas.csv'))
+FRETE_GRATIS_ACIMA = float(os.environ.get('LUMINA_FRETE_GRATIS', 250.00))
+
+# Peso até (g) -> multiplicador do preço base. Acima do último: último + adicional_kg por kg extra
+FAIXAS_PESO = [(300, 1.00), (1000, 1.25), (2000, 1.60), (5000, 2.30)]
+
+# Subtotal a partir de (R$) -> desconto no frete (do maior para o menor)
+FAIXAS_VALOR = [(150.00, 0.50), (0.00, 0.00)]
+
+# Peso por categoria para produtos cadastrados sem peso (embalagem inclusa)
+PESO_PADRAO_CATEGORIA = {
+    'labios': 60,
+    'olhos': 80,
+    'pinceis': 120,
+    'rosto': 150,
+    'skincare': 250,
+    'kits': 600,
+}
+PESO_PADRAO = 200
+
+
+def limpar_cep(cep):
+    """'88010-400' / '88.010-400' -> '88010400' (None se não tiver 8 dígitos)."""
+    digitos = ''.join(c for c in str(cep or '') if c.isdigit())
+    return digitos if len(digitos) == 8 else None
+
+
+def formatar_cep(cep):
+    return f'{cep[:5]}-{cep[5:]}'
+
+
+class TabelaZonas:
+    """Faixas de CEP ordenadas pelo início (busca com bisect)."""
+
+    def __init__(self, linhas):
+        faixas = sorted(linhas, key=lambda f: f['inicio'])
+        for anterior, atual in zip(faixas, faixas[1:]):
+            if atual['inicio'] <= anterior['fim']:
+                raise ValueError(f"faixas de CEP sobrepostas: {anterior['zona']} e {atual['zona']}")
+        self.inicios = [f['inicio'] for f in faixas]
+        self.faixas = faixas
+        # Cache de preços desta tabela (uma tabela nova começa com o dela, vazio)
+        self.preco = lru_cache(maxsize=4096)(self._preco)
+
+    @classmethod
+    def do_csv(cls, caminho):
+        with open(caminho, encoding='utf-8', newline='') as arquivo:
+            linhas = [{
+                'inicio': int(limpar_cep(l['cep_inicio'])),
+                'fim': int(limpar_cep(l['cep_fim'])),
+                'uf': l['uf'],
+                'zona': l['zona'],
+                'preco_base': float(l['preco_base']),
+                'adicional_kg': float(l['adicional_kg']),
+                'prazo_dias': int(l['prazo_dias']),
+            } for l in csv.DictReader(arquivo)]
+        return cls(linhas)
+
+    def indice(self, cep):
+        """Posição da faixa que contém o CEP (8 dígitos), ou None se nenhuma contém."""
+        numero = int(cep)
+        i = bisect_right(self.inicios, numero) - 1
+        if i >= 0 and numero <= self.faixas[i]['fim']:
+            return i
+        return None
+
+    def _preco(self, indice_zona, faixa_peso, kg_extra, faixa_valor):
+        """Preço de uma combinação de faixas (memorizado: é o mesmo para todos os CEPs da faixa)."""
+        zona = self.faixas[indice_zona]
+        valor = zona['preco_base'] * FAIXAS_PESO[faixa_peso][1] + zona['adicional_kg'] * kg_extra
+        valor *= 1 - FAIXAS_VALOR[faixa_valor][1]
+        return round(valor, 2)
+
+
+_tabela = None
+_lock = threading.Lock()
+
+
+def tabela():
+    """Tabela de zonas (lida do CSV no primeiro uso)."""
+    global _tabela
+    if _tabela is None:
+        with _lock:
+            if _tabela is None:
+                _tabela = TabelaZonas.do_csv(ARQUIVO_ZONAS)
+    return _tabela
+
+
+def recarregar(caminho=None):
+    """Relê o arquivo de faixas (ex: tabela nova da transportadora)."""
+    global _tabela, ARQUIVO_ZONAS
+    nova = TabelaZonas.do_csv(caminho or ARQUIVO_ZONAS)
+    with _lock:
+        ARQUIVO_ZONAS = caminho or ARQUIVO_ZONAS
+        _tabela = nova  # O cache de preços vem junto: nenhuma cotação mistura tabela velha e nova
+
+
+def gratis(subtotal):
+    """O pedido já ganhou frete grátis?"""
+    return subtotal > FRETE_GRATIS_ACIMA
+
+
+def _faixa_peso(peso_gramas):
+    """(índice da faixa de peso, kg acima da última faixa)."""
+    for i, (limite, _) in enumerate(FAIXAS_PESO):
+        if peso_gramas <= limite:
+            return i, 0
+    return len(FAIXAS_PESO) - 1, math.ceil((peso_gramas - FAIXAS_PESO[-1][0]) / 1000)
+
+
+def _faixa_valor(subtotal):
+    for i, (minimo, _) in enumerate(FAIXAS_VALOR):
+        if subtotal >= minimo:
+            return i
+    return len(FAIXAS_VALOR) - 1
+
+
+def cotar(cep, peso_gramas=0, subtotal=0.0):
+    """Cotação para um CEP. None se o CEP for inválido ou não estiver em nenhuma faixa."""
+    cep = limpar_cep(cep)
+    if cep is None:
+        return None
+    tab = tabela()
+    i = tab.indice(cep)
+    if i is None:
+        return None
+    zona = tab.faixas[i]
+    valor = 0.0 if gratis(subtotal) else tab.preco(i, *_faixa_peso(max(peso_gramas, 0)), _faixa_valor(subtotal))
+    return {
+        'cep': formatar_cep(cep),
+        'uf': zona['uf'],
+        'zona': zona['zona'],
+        'valor': valor,
+        'prazo_dias': zona['prazo_dias'],
+        'gratis': valor == 0.0,
+    }
+
+
+def peso_item(item):
+    """Peso (g) de UMA unidade: o cadastrado ou o padrão da categoria."""
+    peso = item.get('peso_gramas')
+    if peso:
+        return peso
+    categoria = (item.get('categoria') or '').strip().lower()
+    return PESO_PADRAO_CATEGORIA.get(categoria, PESO_PADRAO)
+
+
+def cotar_carrinho(cep, carrinho):
+    """Cotação a partir dos itens (dicts com preco, quantidade e peso_gramas/categoria)."""
+    peso = sum(peso_item(item) * item['quantidade'] for item in carrinho)
+    subtotal = sum(item['preco'] * item['quantidade'] for item in carrinho)
+    cotacao = cotar(cep, peso, subtotal)
+    if cotacao is not None:
+        cotacao['peso_gramas'] = peso
+        cotacao['subtotal'] = round(subtotal, 2)
+    return cotacao
+
+
+def rotulo(cotacao):
+    """Texto mostrado no carrinho."""
+    if cotacao['gratis']:
+        return 'Frete Grátis'
+    return f"R$ {cotacao['valor']:.2f}"
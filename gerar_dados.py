@@ -0,0 +1,288 @@
+"""
+Gerador de base sintética grande (para testes de carga e benchmarks).
+
+    python gerar_dados.py --banco carga.db --usuarios 1000000 --produtos 200000 --linhas 10000000
+    python gerar_dados.py --banco bench.db --usuarios 2000 --produtos 1000 --linhas 50000 --semente 7
+
+Preenche users, produtos, pedidos e itens_pedido num arquivo SEPARADO
+(nunca no banco da loja). Mesma semente + mesmos volumes -> mesmo banco.
+
+A distribuição tenta parecer uma loja de verdade:
+    - categorias com pesos diferentes (muito "rosto", pouco "kits");
+    - preço log-normal em volta da mediana de cada categoria;
+    - poucos produtos vendem muito (Zipf) e poucos clientes compram muito;
+    - pedidos de 1 a 6 itens, espalhados pelos últimos DIAS_HISTORICO dias.
+
+Todos os clientes gerados entram com a senha SENHA_PADRAO.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import model
+import migracoes
+import senhas
+
+SENHA_PADRAO = 'carga123'
+LOTE = 100_000                 # Linhas por transação
+DIAS_HISTORICO = 730
+DATA_FINAL = datetime(2026, 1, 1)  # Fixa: a semente reproduz as mesmas datas
+
+# (categoria, peso, preço mediano, tipos de produto)
+CATEGORIAS = [
+    ('rosto', 30, 79.90, ['Base', 'Corretivo', 'Pó Compacto', 'Blush', 'Iluminador', 'Primer']),
+    ('olhos', 24, 59.90, ['Máscara de Cílios', 'Delineador', 'Paleta de Sombras', 'Lápis de Olho']),
+    ('labios', 20, 39.90, ['Batom', 'Gloss', 'Lápis de Boca', 'Lip Tint', 'Balm']),
+    ('skincare', 13, 109.90, ['Sérum', 'Hidratante', 'Protetor Solar', 'Tônico', 'Esfoliante']),
+    ('pinceis', 8, 69.90, ['Pincel', 'Esponja', 'Kit Pincéis', 'Curvex']),
+    ('kits', 5, 349.90, ['Kit', 'Maleta', 'Necessaire']),
+]
+ADJETIVOS = ['Matte', 'Glow', 'Nude', 'Rosé', 'Velvet', 'Intense', 'Soft', 'Radiance', 'Pro', 'Natural']
+# Tags do Quiz de cada adjetivo (a categoria já conta como tag)
+TAGS_ADJETIVO = {
+    'Matte': 'matte', 'Glow': 'glow', 'Nude': 'natural', 'Rosé': 'natural,pele', 'Velvet': 'matte,pele',
+    'Intense': 'dramatico,ousado', 'Soft': 'natural,rapido', 'Radiance': 'glow,pele',
+    'Pro': 'dramatico', 'Natural': 'natural,rapido',
+}
+LINHAS_PRODUTO = ['Lumina', 'Aurora', 'Bella', 'Essence', 'Prisma', 'Seda', 'Flor', 'Luxe']
+
+NOMES = ['Ana', 'Beatriz', 'Camila', 'Daniela', 'Eduarda', 'Fernanda', 'Gabriela', 'Helena',
+         'Isabela', 'Julia', 'Larissa', 'Mariana', 'Natália', 'Patrícia', 'Rafaela', 'Sofia',
+         'Bruno', 'Carlos', 'Diego', 'Lucas', 'Pedro', 'Rafael', 'Thiago', 'Vinícius']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Ferreira',
+              'Almeida', 'Ribeiro', 'Carvalho', 'Gomes', 'Martins', 'Rocha', 'Barbosa']
+RUAS = ['Rua das Flores', 'Av. Brasil', 'Rua XV de Novembro', 'Av. Paulista', 'Rua da Praia',
+        'Rua Sete de Setembro', 'Av. Beira Mar', 'Rua Bela Vista']
+CIDADES = ['São Paulo/SP', 'Rio de Janeiro/RJ', 'Belo Horizonte/MG', 'Curitiba/PR',
+           'Florianópolis/SC', 'Porto Alegre/RS', 'Salvador/BA', 'Recife/PE', 'Manaus/AM']
+
+ITENS_POR_PEDIDO = ([1, 2, 3, 4, 5, 6], [35, 25, 18, 10, 7, 5])
+QUANTIDADE_ITEM = ([1, 2, 3], [80, 15, 5])
+STATUS = (['Pago', 'Enviado', 'Entregue'], [10, 15, 75])
+METODOS = (['Pix', 'Cartão de Crédito'], [45, 55])
+
+
+def _endereco(user_id):
+    """Endereço fixo de cada usuário (função do id: não precisa guardar 1M de textos)."""
+    cep = 1000000 + (user_id * 7919) % 98000000
+    return (f"{RUAS[user_id % len(RUAS)]}, {user_id % 2000 + 1} - "
+            f"{CIDADES[user_id % len(CIDADES)]} - CEP {cep:08d}")
+
+
+def _pesos_zipf(n, expoente):
+    """Pesos 1/rank^s: o 1º sai muito, o 2º metade disso, ... (cauda longa)."""
+    return [1 / (rank ** expoente) for rank in range(1, n + 1)]
+
+
+def _sorteador(rng, valores, pesos):
+    """
+    Sorteio ponderado sem overhead: acumula os pesos uma vez e cada
+    sorteio vira um random() + bisect (random.choices refaz isso a cada chamada).
+    """
+    acumulado = list(accumulate(pesos))
+    total = acumulado[-1]
+    return lambda: valores[bisect(acumulado, rng.random() * total)]
+
+
+def _em_lotes(conn, sql, linhas, tamanho=LOTE):
+    """executemany em transações de 'tamanho' linhas. Retorna quantas gravou."""
+    total = 0
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            conn.execute('BEGIN')
+            conn.executemany(sql, lote)
+            conn.commit()
+            total += len(lote)
+            lote = []
+    if lote:
+        conn.execute('BEGIN')
+        conn.executemany(sql, lote)
+        conn.commit()
+        total += len(lote)
+    return total
+
+
+def _proximo_id(conn, tabela):
+    return conn.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {tabela}').fetchone()[0]
+
+
+# --- GERADORES DE LINHAS ---
+
+
+def _linhas_usuarios(rng, primeiro_id, quantidade, senha_hash):
+    for user_id in range(primeiro_id, primeiro_id + quantidade):
+        nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}"
+        telefone = f"({rng.randint(11, 99)}) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"
+        yield (user_id, nome, f"cliente{user_id}", f"cliente{user_id}@carga.lumina",
+               senha_hash, 'cliente', telefone, _endereco(user_id))
+
+
+def _linhas_produtos(rng, primeiro_id, quantidade, precos):
+    """Gera os produtos e preenche 'precos' (id -> preço) para os itens de pedido."""
+    pesos = [c[1] for c in CATEGORIAS]
+    for produto_id in range(primeiro_id, primeiro_id + quantidade):
+        categoria, _, mediana, tipos = rng.choices(CATEGORIAS, weights=pesos)[0]
+        # Log-normal: a maioria perto da mediana, alguns bem mais caros
+        preco = max(4.90, math.floor(rng.lognormvariate(math.log(mediana), 0.45)) + 0.90)
+        precos[produto_id] = preco
+        tipo = rng.choice(tipos)
+        adjetivo = rng.choice(ADJETIVOS)
+        nome = f"{tipo} {adjetivo} {rng.choice(LINHAS_PRODUTO)} {produto_id}"
+        estoque = 0 if rng.random() < 0.05 else rng.randint(1, 500)
+        yield (produto_id, f"CARGA-{produto_id:07d}", nome, preco,
+               f"{nome} - linha {categoria}.", model.IMAGEM_PADRAO, estoque, categoria, TAGS_ADJETIVO[adjetivo])
+
+
+def _linhas_pedidos(rng, primeiro_pedido, total_linhas, usuarios, produtos, precos, itens):
+    """
+    Gera os pedidos (em ordem de data) até somar 'total_linhas' itens.
+    Os itens de cada pedido vão para a lista 'itens' (gravada junto, lote a lote).
+    """
+    sortear_produto = _sorteador(rng, produtos, _pesos_zipf(len(produtos), 1.07))
+    sortear_usuario = _sorteador(rng, usuarios, _pesos_zipf(len(usuarios), 0.8))
+    sortear_n_itens = _sorteador(rng, *ITENS_POR_PEDIDO)
+    sortear_quantidade = _sorteador(rng, *QUANTIDADE_ITEM)
+    sortear_status = _sorteador(rng, *STATUS)
+    sortear_metodo = _sorteador(rng, *METODOS)
+
+    media_itens = (sum(q * p for q, p in zip(*ITENS_POR_PEDIDO)) / sum(ITENS_POR_PEDIDO[1]))
+    estimativa_pedidos = max(1, int(total_linhas / media_itens))
+    passo = DIAS_HISTORICO * 86400 / estimativa_pedidos  # Segundos entre pedidos (média)
+    instante = DATA_FINAL - timedelta(days=DIAS_HISTORICO)
+
+    pedido_id = primeiro_pedido
+    restantes = total_linhas
+    while restantes > 0:
+        n_itens = min(restantes, sortear_n_itens())
+        escolhidos = {sortear_produto() for _ in range(n_itens)}
+        user_id = sortear_usuario()
+        instante += timedelta(seconds=rng.expovariate(1 / passo))
+
+        total = 0.0
+        for produto_id in escolhidos:
+            quantidade = sortear_quantidade()
+            preco = precos[produto_id]
+            total += preco * quantidade
+            itens.append((pedido_id, produto_id, quantidade, preco))
+
+        yield (pedido_id, user_id, instante.strftime('%Y-%m-%d %H:%M:%S'), round(total, 2),
+               sortear_status(), sortear_metodo(), _endereco(user_id))
+        restantes -= len(escolhidos)
+        pedido_id += 1
+
+
+# --- EXECUÇÃO ---
+
+
+def gerar(banco, usuarios, produtos, linhas, semente=42):
+    """Cria/preenche 'banco' com os volumes pedidos. Retorna um resumo (dict)."""
+    if os.path.abspath(banco) == os.path.abspath(model.DB_NAME):
+        raise ValueError(f"'{banco}' é o banco da loja; use outro arquivo")
+
+    rng = random.Random(semente)
+    model.DB_NAME = banco
+    migracoes.migrar()
+
+    conn = model.get_db_connection()
+    # Carga descartável: se cair no meio, gera de novo (troca segurança por velocidade)
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA cache_size=-262144')  # 256 MB
+    conn.execute('PRAGMA temp_store=MEMORY')
+    resumo = {}
+    inicio = time.perf_counter()
+
+    try:
+        # 1. Usuários (um hash só para todos: scrypt em 1M de senhas levaria horas)
+        t = time.perf_counter()
+        primeiro = _proximo_id(conn, 'users')
+        resumo['users'] = _em_lotes(conn, '''
+            INSERT INTO users (id, nome, username, email, senha, papel, telefone, endereco)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', _linhas_usuarios(rng, primeiro, usuarios, senhas.gerar_hash(SENHA_PADRAO)))
+        ids_usuarios = range(primeiro, primeiro + usuarios)
+        print(f"   -> {resumo['users']} usuários em {time.perf_counter() - t:.1f}s")
+
+        # 2. Produtos
+        t = time.perf_counter()
+        precos = {}
+        primeiro = _proximo_id(conn, 'produtos')
+        resumo['produtos'] = _em_lotes(conn, '''
+            INSERT INTO produtos (id, sku, nome, preco, descricao, imagem, estoque, categoria, tags)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', _linhas_produtos(rng, primeiro, produtos, precos))
+        # Ordem de popularidade aleatória (o mais vendido não é sempre o id mais baixo)
+        ids_produtos = list(precos)
+        rng.shuffle(ids_produtos)
+        print(f"   -> {resumo['produtos']} produtos em {time.perf_counter() - t:.1f}s")
+
+        # 3. Pedidos + itens (gravados juntos, lote a lote)
+        t = time.perf_counter()
+        resumo['pedidos'] = resumo['itens_pedido'] = 0
+        if linhas and usuarios and produtos:
+            itens = []
+            pedidos = _linhas_pedidos(rng, _proximo_id(conn, 'pedidos'), linhas,
+                                      ids_usuarios, ids_produtos, precos, itens)
+            while True:
+                lote = [p for _, p in zip(range(LOTE // 2), pedidos)]
+                if not lote:
+                    break
+                conn.execute('BEGIN')
+                conn.executemany('''
+                    INSERT INTO pedidos (id, user_id, data_pedido, valor_total, status,
+                                         metodo_pagamento, endereco_entrega)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', lote)
+                conn.executemany('''
+                    INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unitario)
+                    VALUES (?, ?, ?, ?)
+                ''', itens)
+                conn.commit()
+                resumo['pedidos'] += len(lote)
+                resumo['itens_pedido'] += len(itens)
+                itens.clear()
+                decorrido = time.perf_counter() - t
+                print(f"   -> {resumo['itens_pedido']} itens de pedido "
+                      f"({resumo['itens_pedido'] / decorrido:.0f} linhas/s)")
+        print(f"   -> {resumo['pedidos']} pedidos em {time.perf_counter() - t:.1f}s")
+
+        # Avisa os processos que estiverem usando este banco (caches em memória)
+        model.registrar_mudanca_catalogo(conn)
+        conn.commit()
+
+        # 4. Estatísticas para o planejador de consultas + WAL zerado
+        conn.execute('ANALYZE')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.close()
+
+    model.cache_catalogo.invalidar()
+    resumo['segundos'] = round(time.perf_counter() - inicio, 1)
+    return resumo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Gera uma base sintética grande para testes de carga.')
+    parser.add_argument('--banco', default='lumina_carga.db', help='arquivo SQLite de destino')
+    parser.add_argument('--usuarios', type=int, default=10_000)
+    parser.add_argument('--produtos', type=int, default=2_000)
+    parser.add_argument('--linhas', type=int, default=100_000, help='linhas de itens_pedido')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"--- GERANDO {args.banco} (semente {args.semente}) ---")
+    try:
+        resumo = gerar(args.banco, args.usuarios, args.produtos, args.linhas, args.semente)
+    except ValueError as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
+    print(f"--- FIM: {resumo['users']} usuários, {resumo['produtos']} produtos, "
+          f"{resumo['pedidos']} pedidos, {resumo['itens_pedido']} itens em {resumo['segundos']}s ---")
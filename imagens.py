@@ -0,0 +1,215 @@
+"""
+Versões responsivas e comprimidas das imagens de static/images.
+
+    python imagens.py            -> gera o que faltar (só reprocessa imagens alteradas)
+    python imagens.py --tudo     -> refaz todas
+
+Para cada imagem gera AVIF, WebP e JPEG (PNG se tiver transparência) em
+algumas larguras (LARGURAS, nunca maiores que a original). O nome leva um
+hash do conteúdo (sombra1-320w.3fa9c2b1d0.webp): se a imagem mudar, o nome
+muda, então o navegador pode guardar o arquivo "para sempre" (immutable).
+
+Nos templates:
+
+    {{ imagem_responsiva('sombra1.png', 'Rosto', sizes='(min-width: 992px) 25vw, 100vw', class='category-img') }}
+
+gera um <picture> com srcset por formato. Se a imagem ainda não foi
+processada, cai num <img> simples com o arquivo original.
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+
+from flask import request, url_for
+from markupsafe import Markup, escape
+from PIL import Image
+
+PASTA_ORIGEM = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'images')
+SUBPASTA = 'derivadas'  # Dentro de static/images
+PASTA_DESTINO = os.path.join(PASTA_ORIGEM, SUBPASTA)
+MANIFESTO = os.path.join(PASTA_DESTINO, 'manifesto.json')
+
+LARGURAS = (160, 320, 640, 1024, 1600)
+EXTENSOES = ('.jpg', '.jpeg', '.png')
+CACHE_IMUTAVEL = 31536000  # 1 ano (o nome muda quando o conteúdo muda)
+
+# formato -> (tipo MIME, opções do Pillow); a ordem é a de preferência no <picture>
+FORMATOS = {
+    'avif': ('image/avif', {'quality': 55, 'speed': 8}),  # speed 8: ~4x mais rápido, mesmo tamanho
+    'webp': ('image/webp', {'quality': 78, 'method': 6}),
+    'jpeg': ('image/jpeg', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'png': ('image/png', {'optimize': True}),
+}
+EXTENSAO = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+
+
+# --- GERAÇÃO ---
+
+
+def _hash(dados, tamanho=10):
+    return hashlib.sha1(dados).hexdigest()[:tamanho]
+
+
+def _larguras(largura_original):
+    """Larguras a gerar: as da lista menores que a original, mais a original (até o máximo)."""
+    larguras = [l for l in LARGURAS if l < largura_original]
+    if largura_original <= LARGURAS[-1]:
+        larguras.append(largura_original)
+    return larguras or [LARGURAS[-1]]
+
+
+def _processar(nome, dados):
+    """Gera as variantes de uma imagem. Retorna a entrada do manifesto."""
+    original = Image.open(io.BytesIO(dados))
+    original.load()
+    transparente = original.mode in ('RGBA', 'LA') or 'transparency' in original.info
+    imagem = original.convert('RGBA' if transparente else 'RGB')
+    base = os.path.splitext(nome)[0]
+    # JPEG não tem transparência: PNG vira a opção "funciona em qualquer navegador"
+    formatos = ['avif', 'webp', 'png' if transparente else 'jpeg']
+
+    variantes = {f: [] for f in formatos}
+    for largura in _larguras(imagem.width):
+        altura = round(imagem.height * largura / imagem.width)
+        reduzida = imagem if largura == imagem.width else imagem.resize((largura, altura), Image.LANCZOS)
+        for formato in formatos:
+            buf = io.BytesIO()
+            reduzida.save(buf, format=formato.upper(), **FORMATOS[formato][1])
+            conteudo = buf.getvalue()
+            arquivo = f'{base}-{largura}w.{_hash(conteudo)}.{EXTENSAO[formato]}'
+            with open(os.path.join(PASTA_DESTINO, arquivo), 'wb') as saida:
+                saida.write(conteudo)
+            variantes[formato].append([largura, arquivo, len(conteudo)])
+
+    return {
+        'origem_sha1': _hash(dados, 40),
+        'largura': imagem.width,
+        'altura': imagem.height,
+        'variantes': variantes,
+    }
+
+
+def gerar_derivadas(tudo=False, verbose=False):
+    """Processa as imagens novas ou alteradas e apaga variantes que sobraram. Retorna quantas processou."""
+    os.makedirs(PASTA_DESTINO, exist_ok=True)
+    manifesto = {} if tudo else _ler_manifesto()
+    novo = {}
+    processadas = 0
+
+    for nome in sorted(os.listdir(PASTA_ORIGEM)):
+        caminho = os.path.join(PASTA_ORIGEM, nome)
+        if not os.path.isfile(caminho) or not nome.lower().endswith(EXTENSOES):
+            continue
+        with open(caminho, 'rb') as arquivo:
+            dados = arquivo.read()
+
+        anterior = manifesto.get(nome)
+        if anterior and anterior['origem_sha1'] == _hash(dados, 40):
+            novo[nome] = anterior
+            continue
+
+        novo[nome] = _processar(nome, dados)
+        processadas += 1
+        if verbose:
+            largura, _, tamanho = novo[nome]['variantes']['avif'][-1]
+            print(f"   -> {nome}: {len(dados) // 1024} KB -> AVIF {largura}w {tamanho // 1024} KB "
+                  f"({len(novo[nome]['variantes']['avif'])} larguras)")
+
+    # Variantes de imagens alteradas/removidas não servem mais
+    em_uso = {v[1] for entrada in novo.values() for lista in entrada['variantes'].values() for v in lista}
+    for arquivo in os.listdir(PASTA_DESTINO):
+        if arquivo != os.path.basename(MANIFESTO) and arquivo not in em_uso:
+            os.remove(os.path.join(PASTA_DESTINO, arquivo))
+
+    with open(MANIFESTO, 'w', encoding='utf-8') as saida:
+        json.dump(novo, saida, indent=1, sort_keys=True)
+    _cache['mtime'] = None  # Força reler no próximo uso
+    return processadas
+
+
+# --- USO NOS TEMPLATES ---
+
+_cache = {'mtime': None, 'manifesto': {}}
+
+
+def _ler_manifesto():
+    try:
+        with open(MANIFESTO, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return {}
+
+
+def _manifesto():
+    """Manifesto em memória (relido só se o arquivo mudar)."""
+    try:
+        mtime = os.stat(MANIFESTO).st_mtime
+    except OSError:
+        return {}
+    if mtime != _cache['mtime']:
+        _cache['manifesto'] = _ler_manifesto()
+        _cache['mtime'] = mtime
+    return _cache['manifesto']
+
+
+def _atributos(atributos):
+    return ''.join(f' {escape(nome)}="{escape(valor)}"' for nome, valor in atributos.items() if valor is not None)
+
+
+def imagem_responsiva(nome, alt='', sizes='100vw', **atributos):
+    """
+    <picture> com AVIF/WebP/JPEG em várias larguras para static/images/<nome>.
+    'atributos' vão para o <img> (class, loading, width, height...).
+    """
+    atributos = {'loading': 'lazy', 'decoding': 'async', **atributos}
+    entrada = _manifesto().get(nome)
+    if entrada is None:
+        # Ainda não processada: imagem original
+        src = url_for('static', filename=f'images/{nome}')
+        return Markup(f'<img src="{escape(src)}" alt="{escape(alt)}"{_atributos(atributos)}>')
+
+    def srcset(formato):
+        return ', '.join(f"{url_for('static', filename=f'images/{SUBPASTA}/{arquivo}')} {largura}w"
+                         for largura, arquivo, _ in entrada['variantes'][formato])
+
+    fontes = [f for f in FORMATOS if f in entrada['variantes']]
+    reserva = fontes[-1]  # JPEG ou PNG: o que todo navegador abre
+    # src de quem ignora srcset: a maior variante até 1024px
+    candidatas = [v for v in entrada['variantes'][reserva] if v[0] <= 1024] or entrada['variantes'][reserva][:1]
+    _, arquivo, _ = candidatas[-1]
+
+    atributos = {'width': entrada['largura'], 'height': entrada['altura'], **atributos}
+    partes = ['<picture class="img-responsiva">']
+    for formato in fontes[:-1]:
+        partes.append(f'<source type="{FORMATOS[formato][0]}" srcset="{escape(srcset(formato))}" sizes="{escape(sizes)}">')
+    partes.append(
+        f'<img src="{escape(url_for("static", filename=f"images/{SUBPASTA}/{arquivo}"))}" '
+        f'srcset="{escape(srcset(reserva))}" sizes="{escape(sizes)}" alt="{escape(alt)}"{_atributos(atributos)}>'
+    )
+    partes.append('</picture>')
+    return Markup(''.join(partes))
+
+
+def _cache_imutavel(resposta):
+    """Variantes têm hash no nome: podem ficar no cache do navegador por 1 ano."""
+    if request.endpoint == 'static' and request.view_args.get('filename', '').startswith(f'images/{SUBPASTA}/') \
+            and resposta.status_code in (200, 304):
+        resposta.cache_control.public = True
+        resposta.cache_control.max_age = CACHE_IMUTAVEL
+        resposta.cache_control.immutable = True
+        resposta.cache_control.no_cache = None
+    return resposta
+
+
+def instalar(app):
+    """Registra o helper nos templates e o cache longo das variantes."""
+    app.jinja_env.globals['imagem_responsiva'] = imagem_responsiva
+    app.after_request(_cache_imutavel)
+
+
+if __name__ == "__main__":
+    print(f"--- GERANDO IMAGENS RESPONSIVAS ({', '.join(FORMATOS)}) ---")
+    total = gerar_derivadas(tudo='--tudo' in sys.argv, verbose=True)
+    print(f"--- {total} imagem(ns) processada(s). Manifesto: {MANIFESTO} ---")
@@ -0,0 +1,167 @@
+"""
+Métricas por rota (latência, tamanho da resposta e SQL), no formato Prometheus.
+
+    metricas.instalar(app)   -> liga os ganchos before/after_request no Flask
+    GET /admin/metrics       -> texto para o Prometheus (só admin)
+
+O SQL é contado pelo cursor das conexões do model (model.CursorMedido):
+cada comando soma no contador da requisição atual (thread-local), e no fim
+da requisição o total vai para o histograma do endpoint.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+
+# Limites superiores dos baldes ("le" no Prometheus)
+BALDES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BALDES_TAMANHO = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+BALDES_COMANDOS_SQL = (0, 1, 2, 5, 10, 20, 50, 100)
+BALDES_TEMPO_SQL = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+_local = threading.local()
+
+
+class ContadorSQL:
+    """SQL de UMA requisição: comandos, tempo (s) e linhas lidas."""
+    __slots__ = ('comandos', 'segundos', 'linhas')
+
+    def __init__(self):
+        self.comandos = 0
+        self.segundos = 0.0
+        self.linhas = 0
+
+
+def contador_sql():
+    """Contador da requisição atual (None fora de uma requisição)."""
+    return getattr(_local, 'sql', None)
+
+
+class Histograma:
+    """Histograma com baldes fixos (contagem por balde, soma e total)."""
+
+    def __init__(self, baldes):
+        self.baldes = baldes
+        self.contagens = [0] * (len(baldes) + 1)  # Último = acima do maior limite
+        self.soma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.baldes, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome, rotulos):
+        """Linhas _bucket/_sum/_count (baldes acumulados, como o Prometheus espera)."""
+        acumulado = 0
+        for limite, contagem in zip(self.baldes, self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}'
+        yield f'{nome}_bucket{{{rotulos},le="+Inf"}} {self.total}'
+        yield f'{nome}_sum{{{rotulos}}} {self.soma}'
+        yield f'{nome}_count{{{rotulos}}} {self.total}'
+
+
+class MetricasRotas:
+    """Acumula as métricas de todas as requisições, separadas por endpoint."""
+
+    # nome da métrica -> (ajuda, baldes)
+    HISTOGRAMAS = {
+        'lumina_requisicao_segundos': ('Latência da requisição por endpoint.', BALDES_LATENCIA),
+        'lumina_resposta_bytes': ('Tamanho da resposta por endpoint.', BALDES_TAMANHO),
+        'lumina_sql_comandos': ('Comandos SQL por requisição.', BALDES_COMANDOS_SQL),
+        'lumina_sql_segundos': ('Tempo em SQL por requisição.', BALDES_TEMPO_SQL),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requisicoes = {}  # (endpoint, método, status) -> contagem
+        self._histogramas = {}  # (métrica, endpoint) -> Histograma
+        self._linhas_sql = {}   # endpoint -> linhas lidas
+
+    def registrar(self, endpoint, metodo, status, segundos, tamanho, sql):
+        valores = {
+            'lumina_requisicao_segundos': segundos,
+            'lumina_resposta_bytes': tamanho,
+            'lumina_sql_comandos': sql.comandos,
+            'lumina_sql_segundos': sql.segundos,
+        }
+        with self._lock:
+            chave = (endpoint, metodo, status)
+            self._requisicoes[chave] = self._requisicoes.get(chave, 0) + 1
+            for metrica, valor in valores.items():
+                histograma = self._histogramas.get((metrica, endpoint))
+                if histograma is None:
+                    histograma = Histograma(self.HISTOGRAMAS[metrica][1])
+                    self._histogramas[(metrica, endpoint)] = histograma
+                histograma.observar(valor)
+            self._linhas_sql[endpoint] = self._linhas_sql.get(endpoint, 0) + sql.linhas
+
+    def prometheus(self, extras=()):
+        """
+        Texto no formato de exposição do Prometheus.
+        'extras': lista de (nome, tipo, ajuda, valor) sem rótulos (ex: cache, fila de hash).
+        """
+        saida = [
+            '# HELP lumina_requisicoes_total Requisições por endpoint, método e status.',
+            '# TYPE lumina_requisicoes_total counter',
+        ]
+        with self._lock:
+            for (endpoint, metodo, status), total in sorted(self._requisicoes.items()):
+                saida.append(f'lumina_requisicoes_total{{endpoint="{_escapar(endpoint)}",'
+                             f'metodo="{metodo}",status="{status}"}} {total}')
+
+            for metrica, (ajuda, _) in self.HISTOGRAMAS.items():
+                saida.append(f'# HELP {metrica} {ajuda}')
+                saida.append(f'# TYPE {metrica} histogram')
+                for (nome, endpoint), histograma in sorted(self._histogramas.items()):
+                    if nome == metrica:
+                        saida.extend(histograma.linhas(metrica, f'endpoint="{_escapar(endpoint)}"'))
+
+            saida.append('# HELP lumina_sql_linhas_total Linhas lidas do banco por endpoint.')
+            saida.append('# TYPE lumina_sql_linhas_total counter')
+            for endpoint, total in sorted(self._linhas_sql.items()):
+                saida.append(f'lumina_sql_linhas_total{{endpoint="{_escapar(endpoint)}"}} {total}')
+
+        for nome, tipo, ajuda, valor in extras:
+            saida.append(f'# HELP {nome} {ajuda}')
+            saida.append(f'# TYPE {nome} {tipo}')
+            saida.append(f'{nome} {valor}')
+        return '\n'.join(saida) + '\n'
+
+
+def _escapar(valor):
+    """Escapa valor de rótulo (barra, aspas e quebra de linha)."""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+rotas = MetricasRotas()
+
+
+# --- GANCHOS DO FLASK ---
+
+
+def _inicio_requisicao():
+    g.metricas_inicio = time.perf_counter()
+    _local.sql = ContadorSQL()
+
+
+def _fim_requisicao(resposta):
+    inicio = g.pop('metricas_inicio', None)
+    sql = getattr(_local, 'sql', None)
+    _local.sql = None
+    if inicio is None or sql is None:
+        return resposta  # before_request não rodou (ex: erro antes dele)
+
+    # Respostas em streaming não têm tamanho conhecido: conta 0
+    tamanho = resposta.calculate_content_length() or 0
+    rotas.registrar(request.endpoint or 'desconhecido', request.method, resposta.status_code,
+                    time.perf_counter() - inicio, tamanho, sql)
+    return resposta
+
+
+def instalar(app):
+    """Liga a coleta em todas as requisições do app."""
+    app.before_request(_inicio_requisicao)
+    app.after_request(_fim_requisicao)
@@ -0,0 +1,347 @@
+"""
+Migrações do banco de dados (versionadas).
+
+Cada passo roda UMA vez e fica registrado na tabela 'schema_versao'.
+Rodar no deploy (ou depois de atualizar o código):
+
+    python migracoes.py           -> aplica o que estiver pendente
+    python migracoes.py status    -> mostra a versão atual e o que falta
+
+Para mudar o banco, adicione um passo novo no FINAL de MIGRACOES
+(nunca edite um passo que já foi aplicado).
+"""
+import sys
+from werkzeug.security import generate_password_hash
+import model
+
+
+# --- PASSOS ---
+
+
+def _m001_schema_inicial(conn):
+    """Tabelas originais (IF NOT EXISTS para bancos criados pelo antigo init_db)."""
+    # 1. Usuários
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            senha TEXT NOT NULL,
+            senha_plana TEXT,
+            papel TEXT DEFAULT 'cliente',
+            telefone TEXT,
+            endereco TEXT
+        )
+    ''')
+
+    # 2. Produtos
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS produtos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            preco REAL NOT NULL,
+            descricao TEXT,
+            imagem TEXT,
+            estoque INTEGER DEFAULT 0,
+            categoria TEXT
+        )
+    ''')
+
+    # 3. Pedidos (O Cabeçalho da Compra)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pedidos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            data_pedido DATETIME DEFAULT CURRENT_TIMESTAMP,
+            valor_total REAL NOT NULL,
+            status TEXT DEFAULT 'Pago',  -- Ex: Pendente, Pago, Enviado
+            metodo_pagamento TEXT,       -- Ex: Pix, Cartão
+            endereco_entrega TEXT,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+
+    # 4. Itens do Pedido (Os detalhes do que foi comprado)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS itens_pedido (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER NOT NULL,
+            produto_id INTEGER NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco_unitario REAL NOT NULL, -- Importante: Preço no momento da compra
+            FOREIGN KEY(pedido_id) REFERENCES pedidos(id),
+            FOREIGN KEY(produto_id) REFERENCES produtos(id)
+        )
+    ''')
+
+    # Cria Admin Padrão se não existir
+    if conn.execute('SELECT count(*) FROM users').fetchone()[0] == 0:
+        senha_hash = generate_password_hash('123')
+        conn.execute('''
+            INSERT INTO users (nome, username, email, senha, senha_plana, papel)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', ('Administrador', 'admin', 'admin@lumina.com', senha_hash, '123', 'admin'))
+
+
+def _m002_busca_fts(conn):
+    """Índice de busca (FTS5) sobre nome, descrição e categoria."""
+    # 'remove_diacritics' faz "labios" achar "Lábios"
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5(
+            nome, descricao, categoria,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+
+    # Gatilhos mantêm o índice em dia com qualquer escrita em 'produtos'
+    # (rowid do índice = id do produto)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_insert AFTER INSERT ON produtos BEGIN
+            INSERT OR REPLACE INTO produtos_fts (rowid, nome, descricao, categoria)
+            VALUES (new.id, new.nome, new.descricao, new.categoria);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_delete AFTER DELETE ON produtos BEGIN
+            DELETE FROM produtos_fts WHERE rowid = old.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_update AFTER UPDATE OF nome, descricao, categoria ON produtos BEGIN
+            INSERT OR REPLACE INTO produtos_fts (rowid, nome, descricao, categoria)
+            VALUES (new.id, new.nome, new.descricao, new.categoria);
+        END
+    ''')
+
+    # Indexa os produtos que já existiam
+    conn.execute('''
+        INSERT OR REPLACE INTO produtos_fts (rowid, nome, descricao, categoria)
+        SELECT id, nome, descricao, categoria FROM produtos
+    ''')
+
+
+def _m003_categoria_normalizada(conn):
+    """Categoria normalizada + índices da página de categoria."""
+    colunas = [c['name'] for c in conn.execute('PRAGMA table_xinfo(produtos)')]
+    if 'categoria_norm' not in colunas:
+        conn.execute('''
+            ALTER TABLE produtos ADD COLUMN
+            categoria_norm TEXT GENERATED ALWAYS AS (LOWER(TRIM(categoria))) VIRTUAL
+        ''')
+
+    # Um índice para cada ordenação possível
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_produtos_categoria ON produtos (categoria_norm)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_produtos_categoria_preco ON produtos (categoria_norm, preco)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_produtos_categoria_nome ON produtos (categoria_norm, nome COLLATE NOCASE)')
+
+
+def _m004_indices_pedidos(conn):
+    """Índices das chaves estrangeiras (histórico e itens de pedido)."""
+    # Cobre "WHERE user_id = ? ORDER BY data_pedido DESC" sem ordenar em memória
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_user_data ON pedidos (user_id, data_pedido)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido ON itens_pedido (pedido_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_itens_pedido_produto ON itens_pedido (produto_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_produtos_categoria_exata ON produtos (categoria)')
+
+
+def _m005_carrinho_servidor(conn):
+    """Carrinho guardado no banco (o cookie fica só com o user_id)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS carrinho_itens (
+            user_id INTEGER NOT NULL,
+            produto_id INTEGER NOT NULL,
+            quantidade INTEGER NOT NULL,
+            adicionado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, produto_id),
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(produto_id) REFERENCES produtos(id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Frete escolhido para o carrinho de cada usuário
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS carrinhos (
+            user_id INTEGER PRIMARY KEY,
+            frete REAL,
+            frete_label TEXT,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+
+
+def _m006_sku_produtos(conn):
+    """SKU do fornecedor: chave do import em lote do catálogo."""
+    colunas = [c['name'] for c in conn.execute('PRAGMA table_xinfo(produtos)')]
+    if 'sku' not in colunas:
+        conn.execute('ALTER TABLE produtos ADD COLUMN sku TEXT')
+    # UNIQUE aceita vários NULL (produtos cadastrados sem SKU)
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_produtos_sku ON produtos (sku)')
+
+    # No upsert (INSERT ... ON CONFLICT DO UPDATE) o "OR REPLACE" de dentro do
+    # gatilho é ignorado; apaga e reinsere no índice de busca em vez disso
+    conn.execute('DROP TRIGGER IF EXISTS produtos_fts_update')
+    conn.execute('''
+        CREATE TRIGGER produtos_fts_update AFTER UPDATE OF nome, descricao, categoria ON produtos BEGIN
+            DELETE FROM produtos_fts WHERE rowid = old.id;
+            INSERT INTO produtos_fts (rowid, nome, descricao, categoria)
+            VALUES (new.id, new.nome, new.descricao, new.categoria);
+        END
+    ''')
+
+
+def _m007_produtos_atualizado_em(conn):
+    """Data da última alteração de cada produto (validador do GET condicional)."""
+    colunas = [c['name'] for c in conn.execute('PRAGMA table_xinfo(produtos)')]
+    if 'atualizado_em' not in colunas:
+        # Microssegundos desde 1970 (UTC); gravada pelas funções de escrita do model
+        conn.execute('ALTER TABLE produtos ADD COLUMN atualizado_em INTEGER')
+    conn.execute('''
+        UPDATE produtos SET atualizado_em = CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER)
+        WHERE atualizado_em IS NULL
+    ''')
+    # MAX por categoria lido direto do índice
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_produtos_categoria_atualizado
+        ON produtos (categoria_norm, atualizado_em)
+    ''')
+
+    # Valores do catálogo como um todo (ex: 'saida_em' = último produto apagado
+    # ou que mudou de categoria; a linha some, então a data fica guardada aqui)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalogo_meta (
+            chave TEXT PRIMARY KEY,
+            valor INTEGER
+        )
+    ''')
+
+
+def _m008_frete_por_peso(conn):
+    """Peso dos produtos (faixas de peso do frete) e CEP usado no frete do carrinho."""
+    colunas = [c['name'] for c in conn.execute('PRAGMA table_xinfo(produtos)')]
+    if 'peso_gramas' not in colunas:
+        # NULL = usa o peso padrão da categoria (frete.PESO_PADRAO_CATEGORIA)
+        conn.execute('ALTER TABLE produtos ADD COLUMN peso_gramas INTEGER')
+    colunas = [c['name'] for c in conn.execute('PRAGMA table_xinfo(carrinhos)')]
+    if 'cep' not in colunas:
+        # Guardado para recalcular o frete quando o carrinho muda
+        conn.execute('ALTER TABLE carrinhos ADD COLUMN cep TEXT')
+
+
+def _m009_tags_produtos(conn):
+    """Tags dos produtos (recomendação do Quiz)."""
+    colunas = [c['name'] for c in conn.execute('PRAGMA table_xinfo(produtos)')]
+    if 'tags' not in colunas:
+        # Separadas por vírgula ("matte,ousado"); a categoria já conta como tag
+        conn.execute('ALTER TABLE produtos ADD COLUMN tags TEXT')
+
+
+def _m010_comprados_juntos(conn):
+    """Produtos comprados juntos (gravados por compras_juntas.py, lidos pelas páginas)."""
+    # Matriz esparsa de co-ocorrência: quantos pedidos tiveram os dois produtos.
+    # Cada par é guardado nos dois sentidos (A->B e B->A): os parceiros de um
+    # produto ficam numa faixa só da chave primária
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS compras_pares (
+            produto_id INTEGER NOT NULL,
+            outro_id INTEGER NOT NULL,
+            vezes INTEGER NOT NULL,
+            PRIMARY KEY (produto_id, outro_id)
+        ) WITHOUT ROWID
+    ''')
+    # Os k parceiros mais frequentes de cada produto, já em ordem: a página
+    # lê só a faixa do produto na chave primária
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS compras_juntas (
+            produto_id INTEGER NOT NULL,
+            posicao INTEGER NOT NULL,
+            relacionado_id INTEGER NOT NULL,
+            vezes INTEGER NOT NULL,
+            gravado_em INTEGER NOT NULL,
+            PRIMARY KEY (produto_id, posicao)
+        ) WITHOUT ROWID
+    ''')
+
+
+# Ordem de aplicação: (versão, descrição, função)
+MIGRACOES = [
+    (1, 'schema inicial', _m001_schema_inicial),
+    (2, 'busca FTS5 de produtos', _m002_busca_fts),
+    (3, 'categoria normalizada e índices', _m003_categoria_normalizada),
+    (4, 'índices de pedidos e itens', _m004_indices_pedidos),
+    (5, 'carrinho no servidor', _m005_carrinho_servidor),
+    (6, 'SKU dos produtos', _m006_sku_produtos),
+    (7, 'data de alteração dos produtos', _m007_produtos_atualizado_em),
+    (8, 'peso dos produtos e CEP do frete', _m008_frete_por_peso),
+    (9, 'tags dos produtos', _m009_tags_produtos),
+    (10, 'produtos comprados juntos', _m010_comprados_juntos),
+]
+
+
+# --- EXECUÇÃO ---
+
+
+def _criar_tabela_versao(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_versao (
+            versao INTEGER PRIMARY KEY,
+            nome TEXT NOT NULL,
+            aplicada_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def versao_atual(conn=None):
+    """Retorna a última versão aplicada (0 = banco vazio)."""
+    conn = conn or model.get_db_connection()
+    _criar_tabela_versao(conn)
+    return conn.execute('SELECT COALESCE(MAX(versao), 0) FROM schema_versao').fetchone()[0]
+
+
+def pendentes(conn=None):
+    atual = versao_atual(conn)
+    return [m for m in MIGRACOES if m[0] > atual]
+
+
+def migrar(verbose=False):
+    """Aplica, em ordem, todas as migrações pendentes. Retorna quantas rodaram."""
+    conn = model.get_db_connection()
+    aplicadas = 0
+    try:
+        for versao, nome, passo in MIGRACOES:
+            # Cada passo numa transação; IMMEDIATE evita dois processos migrando juntos
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if versao <= versao_atual(conn):
+                    conn.rollback()
+                    continue
+                passo(conn)
+                conn.execute('INSERT INTO schema_versao (versao, nome) VALUES (?, ?)', (versao, nome))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            aplicadas += 1
+            if verbose:
+                print(f"   -> Migração {versao:03d}: {nome} (OK)")
+        if aplicadas:
+            # Migração pode mexer no catálogo: os processos que já estão no ar limpam os caches
+            model.registrar_mudanca_catalogo(conn)
+            conn.commit()
+    finally:
+        conn.close()
+
+    if aplicadas:
+        model.cache_catalogo.invalidar()
+    return aplicadas
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        print(f"Versão atual: {versao_atual()}")
+        for versao, nome, _ in pendentes():
+            print(f"   pendente {versao:03d}: {nome}")
+    else:
+        print("--- APLICANDO MIGRAÇÕES ---")
+        total = migrar(verbose=True)
+        print(f"--- {total} migração(ões) aplicada(s). Versão atual: {versao_atual()} ---")
@@ -1,145 +1,710 @@
 import sqlite3
+import re
+import json
+import base64
+import threading
+import queue
+import time
+from collections import OrderedDict
 from functools import wraps
 from flask import session, redirect, url_for, flash
-from werkzeug.security import generate_password_hash, check_password_hash
+import senhas
+import metricas
+import consultas_lentas
+import sugestoes
+import recomendador
 
 
 # Configuração do Banco de Dados
 DB_NAME = "lumina_beauty.db"
 
+# Configuração do pool de conexões
+POOL_TAMANHO = 8            # Conexões ociosas guardadas para reaproveitar
+BUSY_TIMEOUT_MS = 5000      # Quanto tempo esperar por um lock antes de falhar
+CACHE_STATEMENTS = 256      # Cache de SQL compilado por conexão
 
-def get_db_connection():
-    """Conecta ao banco de dados SQLite e retorna linhas como dicionários."""
-    conn = sqlite3.connect(DB_NAME)
+_pool = queue.LifoQueue(maxsize=POOL_TAMANHO)
+_local = threading.local()
+
+
+class CursorMedido(sqlite3.Cursor):
+    """
+    Cursor que mede cada comando:
+    - soma comandos, tempo e linhas lidas no contador SQL da requisição (metricas.py);
+    - se o registro de consultas lentas estiver ligado, guarda o comando que
+      passar do limite (o tempo conta o execute e as leituras das linhas).
+    Fora de uma requisição e com o registro desligado, não mede nada.
+    """
+
+    def _medir(self, metodo, *args):
+        contador = metricas.contador_sql()
+        limite = consultas_lentas.LIMITE_S
+        if contador is None and limite is None:
+            return metodo(self, *args)
+        inicio = time.perf_counter()
+        try:
+            return metodo(self, *args)
+        finally:
+            duracao = time.perf_counter() - inicio
+            if contador is not None:
+                contador.segundos += duracao
+            if limite is not None and hasattr(self, '_sql'):
+                self._tempo_comando += duracao
+                if self._registro_lento is not None:
+                    self._registro_lento['ms'] = round(self._tempo_comando * 1000, 2)
+                elif self._tempo_comando >= limite:
+                    self._registro_lento = consultas_lentas.registrar(
+                        self.connection, self._sql, self._parametros, self._tempo_comando)
+
+    def _novo_comando(self, sql, parametros):
+        contador = metricas.contador_sql()
+        if contador is not None:
+            contador.comandos += 1
+        if consultas_lentas.LIMITE_S is not None:
+            self._sql = sql
+            self._parametros = parametros
+            self._tempo_comando = 0.0
+            self._registro_lento = None
+
+    def execute(self, sql, parametros=()):
+        self._novo_comando(sql, parametros)
+        return self._medir(sqlite3.Cursor.execute, sql, parametros)
+
+    def executemany(self, sql, parametros):
+        if consultas_lentas.LIMITE_S is not None:
+            # Pode ser um gerador: o plano usa o primeiro conjunto de parâmetros
+            parametros = list(parametros)
+        self._novo_comando(sql, parametros[0] if consultas_lentas.LIMITE_S is not None and parametros else ())
+        return self._medir(sqlite3.Cursor.executemany, sql, parametros)
+
+    def fetchone(self):
+        linha = self._medir(sqlite3.Cursor.fetchone)
+        contador = metricas.contador_sql()
+        if contador is not None and linha is not None:
+            contador.linhas += 1
+        return linha
+
+    def fetchmany(self, size=None):
+        linhas = self._medir(sqlite3.Cursor.fetchmany, size or self.arraysize)
+        contador = metricas.contador_sql()
+        if contador is not None:
+            contador.linhas += len(linhas)
+        return linhas
+
+    def fetchall(self):
+        linhas = self._medir(sqlite3.Cursor.fetchall)
+        contador = metricas.contador_sql()
+        if contador is not None:
+            contador.linhas += len(linhas)
+        return linhas
+
+    def __next__(self):
+        linha = self._medir(sqlite3.Cursor.__next__)
+        contador = metricas.contador_sql()
+        if contador is not None:
+            contador.linhas += 1
+        return linha
+
+
+class ConexaoPool(sqlite3.Connection):
+    """
+    Conexão SQLite reaproveitável.
+    O close() NÃO fecha de verdade: só desfaz o que não foi commitado,
+    porque a mesma conexão é emprestada para todas as funções da thread.
+    Os comandos passam pelo CursorMedido (métricas de SQL por requisição).
+    """
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    # O execute() do sqlite3 cria um cursor interno sem passar por cursor()
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def fechar(self):
+        """Fecha a conexão de verdade."""
+        sqlite3.Connection.close(self)
+
+
+def _nova_conexao():
+    """Abre e configura uma conexão nova (PRAGMAs aplicados uma única vez)."""
+    conn = sqlite3.connect(
+        DB_NAME,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        factory=ConexaoPool,
+        cached_statements=CACHE_STATEMENTS,
+        check_same_thread=False,  # A conexão volta para o pool e muda de thread
+    )
+    conn.db_name = DB_NAME
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    return conn
+
+
+def get_db_connection():
+    """
+    Retorna a conexão da thread/requisição atual (linhas como dicionários).
+    Na primeira chamada pega uma do pool (ou abre uma nova); as próximas
+    chamadas na mesma requisição reaproveitam a mesma conexão.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and conn.db_name == DB_NAME:
+        return conn
+    if conn is not None:
+        # DB_NAME mudou (ex: scripts apontando para outro arquivo)
+        _local.conn = None
+        conn.fechar()
+
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            conn = _nova_conexao()
+            break
+        if conn.db_name == DB_NAME:
+            break
+        conn.fechar()
+
+    _local.conn = conn
     return conn
 
 
-def init_db():
-    """Cria todas as tabelas do sistema, incluindo Pedidos e Itens."""
+def close_db_connection(exc=None):
+    """Devolve a conexão da thread ao pool (usado no teardown do Flask)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        return
+    _local.conn = None
+    conn.close()  # Desfaz transação pendente, se houver
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.fechar()
+
+
+# --- CACHE DO CATÁLOGO ---
+
+
+class CacheCatalogo:
+    """
+    Guarda os produtos em memória para as páginas não irem ao banco toda hora.
+    - Produtos por ID (LRU, limitado a 'max_itens').
+    - Listas (catálogo completo ou por categoria) guardadas como listas de IDs.
+    - 'versao': número que sobe a cada mudança visível do catálogo (produto
+      criado/alterado/apagado ou que esgotou). O cache de HTML (fragmentos.py)
+      usa a versão na chave, então uma grade antiga nunca é servida.
+    - 'versao_banco': (banco, versão) de catalogo_meta já vista por este
+      processo. Cada escrita no catálogo sobe a versão do banco; quem for de
+      outro processo (scripts, outros workers) é percebida em acompanhar().
+    As funções de escrita do model invalidam/atualizam o cache.
+    """
+
+    TODOS = '__todos__'  # Chave da lista com o catálogo completo
+
+    def __init__(self, max_itens=5000, max_listas=64):
+        self.max_itens = max_itens
+        self.max_listas = max_listas
+        self.hits = 0
+        self.misses = 0
+        self.versao = 0
+        self.versao_banco = None
+        self._lock = threading.Lock()
+        self._produtos = OrderedDict()  # id -> dict do produto
+        self._listas = OrderedDict()    # chave -> [ids]
+
+    def _guardar(self, produto):
+        self._produtos[produto['id']] = produto
+        self._produtos.move_to_end(produto['id'])
+        while len(self._produtos) > self.max_itens:
+            self._produtos.popitem(last=False)
+
+    def get_produto(self, id):
+        with self._lock:
+            produto = self._produtos.get(id)
+            if produto is None:
+                self.misses += 1
+                return None
+            self._produtos.move_to_end(id)
+            self.hits += 1
+            return dict(produto)
+
+    def set_produto(self, produto):
+        with self._lock:
+            self._guardar(dict(produto))
+
+    def get_lista(self, chave):
+        with self._lock:
+            ids = self._listas.get(chave)
+            # Se algum produto da lista saiu do LRU, a lista não serve mais
+            if ids is None or any(i not in self._produtos for i in ids):
+                self._listas.pop(chave, None)
+                self.misses += 1
+                return None
+            self._listas.move_to_end(chave)
+            self.hits += 1
+            return [dict(self._produtos[i]) for i in ids]
+
+    def set_lista(self, chave, produtos):
+        if len(produtos) > self.max_itens:
+            return  # Grande demais para caber no cache
+        with self._lock:
+            for p in produtos:
+                self._guardar(dict(p))
+            self._listas[chave] = [p['id'] for p in produtos]
+            while len(self._listas) > self.max_listas:
+                self._listas.popitem(last=False)
+
+    def baixar_estoque(self, id, quantidade, atualizado_em=None):
+        """Atualiza o estoque no cache sem precisar invalidar as listas."""
+        with self._lock:
+            produto = self._produtos.get(id)
+            if produto is not None:
+                produto['estoque'] -= quantidade
+                if atualizado_em is not None:
+                    produto['atualizado_em'] = atualizado_em
+
+    def nova_versao(self):
+        """O catálogo mudou de um jeito que aparece nas páginas (ex: produto esgotou)."""
+        with self._lock:
+            self.versao += 1
+
+    def acompanhar(self, versao_banco, propria=False):
+        """
+        Confere a versão do banco. Mudou por outro processo: limpa tudo e
+        retorna True. 'propria': versão gerada por uma escrita deste processo
+        (que já invalidou o que precisava); só é aceita se for a seguinte à
+        conhecida, senão outro processo escreveu no meio e a limpeza fica
+        para o próximo acompanhar().
+        """
+        with self._lock:
+            conhecida = self.versao_banco
+            if versao_banco == conhecida:
+                return False
+            if propria:
+                if conhecida and conhecida[0] == versao_banco[0] and conhecida[1] + 1 == versao_banco[1]:
+                    self.versao_banco = versao_banco
+                return False
+            self.versao_banco = versao_banco
+            self._produtos.clear()
+            self._listas.clear()
+            self.versao += 1
+            return True
+
+    def invalidar(self, id=None):
+        """Remove um produto (e as listas) do cache. Sem ID, limpa tudo."""
+        with self._lock:
+            if id is None:
+                self._produtos.clear()
+            else:
+                self._produtos.pop(id, None)
+            # Produto novo/alterado pode mudar qualquer lista (ex: trocou de categoria)
+            self._listas.clear()
+            self.versao += 1
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'produtos': len(self._produtos),
+                'listas': len(self._listas),
+                'versao': self.versao,
+                'versao_banco': self.versao_banco[1] if self.versao_banco else None,
+            }
+
+
+cache_catalogo = CacheCatalogo()
+
+
+def registrar_mudanca_catalogo(conn):
+    """
+    Sobe a versão do catálogo em catalogo_meta, dentro da transação de quem
+    escreveu (chamar antes do commit). Os outros processos veem a versão nova
+    em sincronizar_catalogo() e limpam os caches deles. Retorna a versão.
+    """
+    return conn.execute('''
+        INSERT INTO catalogo_meta (chave, valor) VALUES ('versao', 1)
+        ON CONFLICT (chave) DO UPDATE SET valor = valor + 1
+        RETURNING valor
+    ''').fetchone()[0]
+
+
+def _mudanca_propria(versao):
+    """Depois do commit de uma escrita deste processo (que já limpou os próprios caches)."""
+    cache_catalogo.acompanhar((DB_NAME, versao), propria=True)
+
+
+def sincronizar_catalogo():
+    """
+    Chamado no começo de cada requisição: os caches em memória (produtos,
+    grades de HTML, sugestões, Quiz) são por processo, então uma escrita de
+    outro worker ou de um script (carga, migração, gerar_dados) só chega
+    aqui pela versão gravada no banco. Uma busca pela chave primária.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
-   
-    # 1. Usuários
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT NOT NULL,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            senha TEXT NOT NULL,
-            senha_plana TEXT,
-            papel TEXT DEFAULT 'cliente',
-            telefone TEXT,
-            endereco TEXT
-        )
-    ''')
-
-    # 2. Produtos
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS produtos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT NOT NULL,
-            preco REAL NOT NULL,
-            descricao TEXT,
-            imagem TEXT,
-            estoque INTEGER DEFAULT 0,
-            categoria TEXT
-        )
-    ''')
-
-
-    # --- NOVAS TABELAS ---
-
-    # 3. Pedidos (O Cabeçalho da Compra)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS pedidos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            data_pedido DATETIME DEFAULT CURRENT_TIMESTAMP,
-            valor_total REAL NOT NULL,
-            status TEXT DEFAULT 'Pago',  -- Ex: Pendente, Pago, Enviado
-            metodo_pagamento TEXT,       -- Ex: Pix, Cartão
-            endereco_entrega TEXT,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-
-    # 4. Itens do Pedido (Os detalhes do que foi comprado)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS itens_pedido (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pedido_id INTEGER NOT NULL,
-            produto_id INTEGER NOT NULL,
-            quantidade INTEGER NOT NULL,
-            preco_unitario REAL NOT NULL, -- Importante: Preço no momento da compra
-            FOREIGN KEY(pedido_id) REFERENCES pedidos(id),
-            FOREIGN KEY(produto_id) REFERENCES produtos(id)
-        )
-    ''')
-   
-    # Cria Admin Padrão se não existir
-    cursor.execute('SELECT count(*) FROM users')
-    if cursor.fetchone()[0] == 0:
-        senha_hash = generate_password_hash('123')
-        cursor.execute('''
-            INSERT INTO users (nome, username, email, senha, senha_plana, papel)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', ('Administrador', 'admin', 'admin@lumina.com', senha_hash, '123', 'admin'))
+    linha = conn.execute("SELECT valor FROM catalogo_meta WHERE chave = 'versao'").fetchone()
+    if cache_catalogo.acompanhar((DB_NAME, linha[0] if linha else 0)):
+        indice_sugestoes.descartar()
+        matriz_quiz.descartar()
+
+# Sugestões da caixa de busca (carregadas do banco no primeiro uso)
+indice_sugestoes = sugestoes.IndiceSugestoes()
+
+
+def sugerir_produtos(texto, limite=8):
+    """
+    Produtos mais vendidos cujo nome (ou categoria) começa com o texto digitado.
+    Só lê o banco na primeira chamada (ou se o banco mudar); depois é tudo em memória.
+    """
+    if not indice_sugestoes.carregado or indice_sugestoes.origem != DB_NAME:
+        conn = get_db_connection()
+        produtos = [dict(p) for p in conn.execute(
+            f'SELECT {", ".join(sugestoes.CAMPOS)} FROM produtos').fetchall()]
+        vendidos = dict(conn.execute(
+            'SELECT produto_id, SUM(quantidade) FROM itens_pedido GROUP BY produto_id').fetchall())
+        conn.close()
+        indice_sugestoes.carregar(produtos, vendidos, origem=DB_NAME)
+    return indice_sugestoes.sugerir(texto, limite)
 
-    conn.commit()
-    conn.close()
+
+# Matriz de tags do Quiz (carregada do banco no primeiro uso)
+matriz_quiz = recomendador.MatrizTags()
+
+
+def recomendar_quiz(tags, limite=4):
+    """
+    Produtos que mais combinam com as tags das respostas do Quiz (mais vendido
+    desempata). Só lê o banco na primeira chamada ou depois que o catálogo muda.
+    """
+    if not matriz_quiz.carregado or matriz_quiz.origem != DB_NAME:
+        conn = get_db_connection()
+        produtos = [dict(p) for p in conn.execute(
+            f'SELECT {", ".join(recomendador.CAMPOS)}, tags FROM produtos').fetchall()]
+        vendidos = dict(conn.execute(
+            'SELECT produto_id, SUM(quantidade) FROM itens_pedido GROUP BY produto_id').fetchall())
+        conn.close()
+        matriz_quiz.carregar(produtos, vendidos, origem=DB_NAME)
+    return matriz_quiz.recomendar(tags, limite)
 
 
 # --- FUNÇÕES DE PRODUTO (CRUD) ---
 
+_ultimo_carimbo = 0
+_carimbo_lock = threading.Lock()
+
+
+def _carimbo():
+    """
+    Valor da coluna produtos.atualizado_em: microssegundos desde 1970 (UTC),
+    sempre crescente neste processo. Serve de data de alteração (Last-Modified)
+    e de versão da linha (ETag): nunca se repete, nem depois de um DELETE.
+    """
+    global _ultimo_carimbo
+    with _carimbo_lock:
+        _ultimo_carimbo = max(_ultimo_carimbo + 1, time.time_ns() // 1000)
+        return _ultimo_carimbo
+
+
+def _registrar_saida(conn, carimbo):
+    """
+    Um produto pode ter saído de alguma lista (apagado ou trocou de categoria).
+    Como a linha não está mais lá para levar a data, ela fica em catalogo_meta.
+    """
+    conn.execute('''
+        INSERT INTO catalogo_meta (chave, valor) VALUES ('saida_em', ?)
+        ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor
+    ''', (carimbo,))
+
 
 def get_all_produtos():
+    produtos = cache_catalogo.get_lista(CacheCatalogo.TODOS)
+    if produtos is not None:
+        return produtos
     conn = get_db_connection()
-    produtos = conn.execute('SELECT * FROM produtos').fetchall()
+    produtos = [dict(p) for p in conn.execute('SELECT * FROM produtos').fetchall()]
     conn.close()
-    return [dict(p) for p in produtos]
+    cache_catalogo.set_lista(CacheCatalogo.TODOS, produtos)
+    return produtos
 
 
 def get_produtos_by_categoria(categoria):
+    produtos = cache_catalogo.get_lista(categoria)
+    if produtos is not None:
+        return produtos
     conn = get_db_connection()
-    produtos = conn.execute('SELECT * FROM produtos WHERE categoria = ?', (categoria,)).fetchall()
+    produtos = [dict(p) for p in conn.execute('SELECT * FROM produtos WHERE categoria = ?', (categoria,)).fetchall()]
     conn.close()
-    return [dict(p) for p in produtos]
+    cache_catalogo.set_lista(categoria, produtos)
+    return produtos
 
 
 def get_produto_by_id(id):
+    produto = cache_catalogo.get_produto(id)
+    if produto is not None:
+        return produto
     conn = get_db_connection()
     produto = conn.execute('SELECT * FROM produtos WHERE id = ?', (id,)).fetchone()
     conn.close()
-    return dict(produto) if produto else None
+    if not produto:
+        return None
+    produto = dict(produto)
+    cache_catalogo.set_produto(produto)
+    return produto
+
+
+# Ordenações aceitas na página de categoria: sort -> (coluna, decrescente?)
+ORDENACOES_CATEGORIA = {
+    'menor_preco': ('preco', False),
+    'maior_preco': ('preco', True),
+    'az': ('nome COLLATE NOCASE', False),
+    'za': ('nome COLLATE NOCASE', True),
+}
+PRODUTOS_POR_PAGINA = 24
+
+
+def _codificar_cursor(valores):
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+
+
+def _decodificar_cursor(cursor):
+    """Cursor inválido (editado na URL) volta para a primeira página."""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return valores if isinstance(valores, list) else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _filtros_categoria(categoria, preco_min, preco_max, apenas_estoque):
+    """Condições do WHERE (e parâmetros) dos filtros da página de categoria."""
+    where = ['categoria_norm = ?']
+    params = [categoria.strip().lower()]
+
+    if preco_min is not None:
+        where.append('preco >= ?')
+        params.append(preco_min)
+    if preco_max is not None:
+        where.append('preco <= ?')
+        params.append(preco_max)
+    if apenas_estoque:
+        where.append('estoque > 0')
+    return where, params
+
+
+def contar_produtos_categoria(categoria, preco_min=None, preco_max=None, apenas_estoque=False):
+    """Total de produtos da categoria com os filtros (todas as páginas), contado no índice."""
+    where, params = _filtros_categoria(categoria, preco_min, preco_max, apenas_estoque)
+    conn = get_db_connection()
+    total = conn.execute(f'SELECT COUNT(*) FROM produtos WHERE {" AND ".join(where)}', params).fetchone()[0]
+    conn.close()
+    return total
+
+
+def filtrar_produtos_categoria(categoria, preco_min=None, preco_max=None, apenas_estoque=False,
+                               ordem=None, cursor=None, limite=PRODUTOS_POR_PAGINA):
+    """
+    Monta UMA consulta indexada com os filtros da página de categoria.
+    Paginação por "keyset": o cursor guarda a última linha vista (valor, id),
+    então a página 100 custa o mesmo que a primeira.
+    Retorna (produtos, cursor_da_proxima_pagina ou None).
+    """
+    coluna, desc = ORDENACOES_CATEGORIA.get(ordem, ('id', False))
+    direcao = 'DESC' if desc else 'ASC'
+    operador = '<' if desc else '>'
+
+    where, params = _filtros_categoria(categoria, preco_min, preco_max, apenas_estoque)
+
+    ultimo = _decodificar_cursor(cursor) if cursor else None
+    if ultimo and coluna == 'id' and len(ultimo) == 1:
+        where.append(f'id {operador} ?')
+        params.extend(ultimo)
+    elif ultimo and coluna != 'id' and len(ultimo) == 2:
+        where.append(f'({coluna}, id) {operador} (?, ?)')
+        params.extend(ultimo)
+
+    ordem_sql = f'id {direcao}' if coluna == 'id' else f'{coluna} {direcao}, id {direcao}'
+    sql = f'SELECT * FROM produtos WHERE {" AND ".join(where)} ORDER BY {ordem_sql} LIMIT ?'
+    params.append(limite + 1)  # Uma linha a mais diz se existe próxima página
+
+    conn = get_db_connection()
+    linhas = conn.execute(sql, params).fetchall()
+    conn.close()
+
+    produtos = [dict(p) for p in linhas[:limite]]
+    proximo = None
+    if len(linhas) > limite:
+        p = produtos[-1]
+        if coluna == 'id':
+            proximo = _codificar_cursor([p['id']])
+        elif coluna == 'preco':
+            proximo = _codificar_cursor([p['preco'], p['id']])
+        else:
+            proximo = _codificar_cursor([p['nome'], p['id']])
+    return produtos, proximo
+
+
+def ultima_saida():
+    """Quando um produto saiu de alguma lista pela última vez (microssegundos; 0 = nunca)."""
+    conn = get_db_connection()
+    linha = conn.execute("SELECT valor FROM catalogo_meta WHERE chave = 'saida_em'").fetchone()
+    conn.close()
+    return linha[0] if linha else 0
+
+
+def versao_categoria(categoria):
+    """
+    Última alteração (microssegundos) de qualquer produto da categoria: criado,
+    alterado, vendido ou que saiu dela. Duas buscas no índice, sem ler produtos.
+    Serve de validador do GET condicional (ETag / Last-Modified).
+    """
+    conn = get_db_connection()
+    ultima = conn.execute('''
+        SELECT MAX(COALESCE((SELECT MAX(atualizado_em) FROM produtos WHERE categoria_norm = ?), 0),
+                   COALESCE((SELECT valor FROM catalogo_meta WHERE chave = 'saida_em'), 0))
+    ''', (categoria.strip().lower(),)).fetchone()[0]
+    conn.close()
+    return ultima
+
+
+# --- COMPRADOS JUNTOS (listas gravadas por compras_juntas.py) ---
+
+_CAMPOS_RELACIONADO = ('id', 'nome', 'preco', 'imagem', 'categoria', 'estoque')
+
+
+def get_comprados_juntos(produto_id, limite=4):
+    """
+    Produtos comprados junto com este, já na ordem (uma faixa da chave primária).
+    Retorna (produtos, versao): só os que existem e têm estoque, e a última mudança
+    (microssegundos) em qualquer coisa que a lista mostra, para o GET condicional.
+    """
+    conn = get_db_connection()
+    linhas = conn.execute('''
+        SELECT c.gravado_em, p.id, p.nome, p.preco, p.imagem, p.categoria, p.estoque, p.atualizado_em,
+               (SELECT valor FROM catalogo_meta WHERE chave = 'saida_em') AS saida_em
+        FROM compras_juntas c LEFT JOIN produtos p ON p.id = c.relacionado_id
+        WHERE c.produto_id = ? ORDER BY c.posicao
+    ''', (produto_id,)).fetchall()
+    conn.close()
+
+    versao = 0
+    produtos = []
+    for l in linhas:
+        if l['id'] is None:
+            # Parceiro apagado: a linha dele não existe mais, vale a data em que saiu do catálogo
+            versao = max(versao, l['gravado_em'], l['saida_em'] or 0)
+            continue
+        versao = max(versao, l['gravado_em'], l['atualizado_em'] or 0)
+        if l['estoque'] > 0 and len(produtos) < limite:
+            produtos.append({c: l[c] for c in _CAMPOS_RELACIONADO})
+    return produtos, versao
+
+
+def get_comprados_juntos_carrinho(produto_ids, limite=4):
+    """Sugestões do carrinho: parceiros dos itens (somando as vezes), fora os que já estão nele."""
+    ids = list(produto_ids)
+    if not ids:
+        return []
+    marcadores = ', '.join('?' * len(ids))
+    conn = get_db_connection()
+    linhas = conn.execute(f'''
+        SELECT p.id, p.nome, p.preco, p.imagem, p.categoria, p.estoque, SUM(c.vezes) AS vezes
+        FROM compras_juntas c JOIN produtos p ON p.id = c.relacionado_id
+        WHERE c.produto_id IN ({marcadores}) AND c.relacionado_id NOT IN ({marcadores}) AND p.estoque > 0
+        GROUP BY p.id ORDER BY vezes DESC, p.id LIMIT ?
+    ''', ids + ids + [limite]).fetchall()
+    conn.close()
+    return [{c: l[c] for c in _CAMPOS_RELACIONADO} for l in linhas]
+
+
+def buscar_produtos(termo, limite=20):
+    """
+    Busca por texto no índice FTS5 (nome, descrição e categoria).
+    Ignora acentos, aceita palavras pela metade ("bat" acha "Batom")
+    e ordena por relevância (o nome pesa mais que a descrição).
+    """
+    palavras = re.findall(r'\w+', termo or '')
+    if not palavras:
+        return []
+    # Cada palavra vira um prefixo entre aspas (evita sintaxe FTS vinda do usuário)
+    consulta = ' '.join(f'"{p}"*' for p in palavras)
+
+    conn = get_db_connection()
+    produtos = conn.execute('''
+        SELECT p.id, p.nome, p.preco, p.imagem, p.categoria, p.atualizado_em
+        FROM produtos_fts
+        JOIN produtos p ON p.id = produtos_fts.rowid
+        WHERE produtos_fts MATCH ?
+        ORDER BY bm25(produtos_fts, 10.0, 1.0, 5.0)
+        LIMIT ?
+    ''', (consulta, limite)).fetchall()
+    conn.close()
+    return [dict(p) for p in produtos]
+
 
+# Imagem usada quando o produto é cadastrado sem foto
+IMAGEM_PADRAO = 'https://placehold.co/400x300/E0D0D4/6B4950?text=Sem+Imagem'
 
-def add_produto(nome, preco, descricao, imagem, estoque, categoria):
+
+def limpar_tags(tags):
+    """'Matte, Ousado,,matte' -> 'matte,ousado' (tags do Quiz; None continua None)."""
+    if tags is None:
+        return None
+    vistas = []
+    for tag in (sugestoes.normalizar(t) for t in str(tags).split(',')):
+        if tag and tag not in vistas:
+            vistas.append(tag)
+    return ','.join(vistas)
+
+
+def add_produto(nome, preco, descricao, imagem, estoque, categoria, tags=None):
     conn = get_db_connection()
     # Se não vier imagem, coloca uma padrão
-    if not imagem: imagem = 'https://placehold.co/400x300/E0D0D4/6B4950?text=Sem+Imagem'
-    conn.execute('''
-        INSERT INTO produtos (nome, preco, descricao, imagem, estoque, categoria)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (nome, preco, descricao, imagem, estoque, categoria))
+    if not imagem: imagem = IMAGEM_PADRAO
+    cursor = conn.execute('''
+        INSERT INTO produtos (nome, preco, descricao, imagem, estoque, categoria, tags, atualizado_em)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (nome, preco, descricao, imagem, estoque, categoria, limpar_tags(tags), _carimbo()))
+    novo_id = cursor.lastrowid
+    versao = registrar_mudanca_catalogo(conn)
     conn.commit()
     conn.close()
+    cache_catalogo.invalidar()
+    _mudanca_propria(versao)
+    indice_sugestoes.atualizar({'id': novo_id, 'nome': nome, 'preco': preco,
+                                'imagem': imagem, 'categoria': categoria})
+    matriz_quiz.descartar()
 
 
-def update_produto(id, nome, preco, descricao, imagem, estoque, categoria):
+def update_produto(id, nome, preco, descricao, imagem, estoque, categoria, tags=None):
+    """Atualiza o produto. Sem imagem (ou tags = None), mantém a que já estava."""
     conn = get_db_connection()
+    carimbo = _carimbo()
     try:
-        if imagem:
-            conn.execute('''
-                UPDATE produtos SET nome=?, preco=?, descricao=?, imagem=?, estoque=?, categoria=? WHERE id=?
-            ''', (nome, preco, descricao, imagem, estoque, categoria, id))
-        else:
-            conn.execute('''
-                UPDATE produtos SET nome=?, preco=?, descricao=?, estoque=?, categoria=? WHERE id=?
-            ''', (nome, preco, descricao, estoque, categoria, id))
+        conn.execute('''
+            UPDATE produtos SET nome=?, preco=?, descricao=?, imagem=COALESCE(?, imagem), estoque=?,
+                                categoria=?, tags=COALESCE(?, tags), atualizado_em=?
+            WHERE id=?
+        ''', (nome, preco, descricao, imagem or None, estoque, categoria,
+              limpar_tags(tags) if tags is not None else None, carimbo, id))
+        _registrar_saida(conn, carimbo)  # Pode ter trocado de categoria
+        versao = registrar_mudanca_catalogo(conn)
         conn.commit()
         conn.close()
+        cache_catalogo.invalidar(id)
+        _mudanca_propria(versao)
+        produto = get_produto_by_id(id)
+        if produto:
+            indice_sugestoes.atualizar(produto)
+        matriz_quiz.descartar()
         return True
     except Exception:
         conn.close()
@@ -149,12 +714,114 @@ def update_produto(id, nome, preco, descricao, imagem, estoque, categoria):
 def delete_produto(id):
     conn = get_db_connection()
     cursor = conn.execute('DELETE FROM produtos WHERE id = ?', (id,))
+    _registrar_saida(conn, _carimbo())
+    versao = registrar_mudanca_catalogo(conn)
     conn.commit()
     sucesso = cursor.rowcount > 0
     conn.close()
+    cache_catalogo.invalidar(id)
+    _mudanca_propria(versao)
+    indice_sugestoes.remover(id)
+    matriz_quiz.descartar()
     return sucesso
 
 
+def delete_all_produtos():
+    """Apaga o catálogo inteiro (botão 'Deletar Todos' do admin)."""
+    conn = get_db_connection()
+    conn.execute('DELETE FROM produtos')
+    _registrar_saida(conn, _carimbo())
+    versao = registrar_mudanca_catalogo(conn)
+    conn.commit()
+    conn.close()
+    cache_catalogo.invalidar()
+    _mudanca_propria(versao)
+    indice_sugestoes.descartar()
+    matriz_quiz.descartar()
+
+
+# --- IMPORTAÇÃO / EXPORTAÇÃO EM LOTE DO CATÁLOGO ---
+
+# Colunas que o import/export conhece (ordem do CSV exportado)
+COLUNAS_CATALOGO = ['id', 'sku', 'nome', 'preco', 'descricao', 'imagem', 'estoque', 'categoria', 'tags']
+
+# Só atualiza a linha se algo mudou de fato (evita reescrever o índice de busca à toa).
+# Arquivo sem a coluna 'tags' (NULL) mantém as tags que já estavam no produto.
+_SET_SE_MUDOU = '''
+    DO UPDATE SET nome=excluded.nome, preco=excluded.preco, descricao=excluded.descricao,
+                  imagem=excluded.imagem, estoque=excluded.estoque, categoria=excluded.categoria,
+                  tags=COALESCE(excluded.tags, produtos.tags), atualizado_em=excluded.atualizado_em
+    WHERE (nome, preco, descricao, imagem, estoque, categoria, tags)
+          IS NOT (excluded.nome, excluded.preco, excluded.descricao,
+                  excluded.imagem, excluded.estoque, excluded.categoria,
+                  COALESCE(excluded.tags, produtos.tags))
+'''
+
+
+def importar_lote_produtos(registros):
+    """
+    Grava um lote de produtos numa única transação (executemany).
+    Cada registro é um dict com nome, preco e opcionalmente id, sku, descricao,
+    imagem, estoque, categoria e tags. Com 'sku' a chave é o SKU; senão, o 'id'
+    (sem id, vira produto novo). Retorna quantas linhas mudaram de fato.
+    """
+    por_sku = []
+    por_id = []
+    carimbo = _carimbo()  # O lote inteiro conta como uma alteração só
+    for r in registros:
+        valores = (r['nome'], r['preco'], r.get('descricao'), r.get('imagem') or IMAGEM_PADRAO,
+                   r.get('estoque') or 0, r.get('categoria'), limpar_tags(r.get('tags')), carimbo)
+        if r.get('sku'):
+            por_sku.append((r['sku'],) + valores)
+        else:
+            por_id.append((r.get('id'),) + valores)
+
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN')
+        alterados = 0
+        if por_sku:
+            alterados += conn.executemany(f'''
+                INSERT INTO produtos (sku, nome, preco, descricao, imagem, estoque, categoria, tags, atualizado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (sku) {_SET_SE_MUDOU}
+            ''', por_sku).rowcount
+        if por_id:
+            alterados += conn.executemany(f'''
+                INSERT INTO produtos (id, nome, preco, descricao, imagem, estoque, categoria, tags, atualizado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) {_SET_SE_MUDOU}
+            ''', por_id).rowcount
+        if alterados:
+            _registrar_saida(conn, carimbo)  # Produto alterado pode ter trocado de categoria
+            versao = registrar_mudanca_catalogo(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if alterados:
+        cache_catalogo.invalidar()
+        indice_sugestoes.descartar()  # Lote grande: mais barato recarregar do que atualizar um a um
+        matriz_quiz.descartar()
+        _mudanca_propria(versao)
+    return alterados
+
+
+def exportar_produtos():
+    """Gera os produtos um a um (o cursor do SQLite lê aos poucos, sem carregar tudo)."""
+    conn = get_db_connection()
+    cursor = conn.execute(f'SELECT {", ".join(COLUNAS_CATALOGO)} FROM produtos ORDER BY id')
+    try:
+        for linha in cursor:
+            yield dict(linha)
+    finally:
+        cursor.close()
+        conn.close()
+
+
 # --- FUNÇÕES DE USUÁRIO ---
 
 
@@ -186,8 +853,17 @@ def baixar_estoque(produto_id, quantidade):
         # Verifica estoque atual
         atual = conn.execute('SELECT estoque FROM produtos WHERE id = ?', (produto_id,)).fetchone()
         if atual and atual['estoque'] >= quantidade:
-            conn.execute('UPDATE produtos SET estoque = estoque - ? WHERE id = ?', (quantidade, produto_id))
+            carimbo = _carimbo()
+            conn.execute('UPDATE produtos SET estoque = estoque - ?, atualizado_em = ? WHERE id = ?',
+                         (quantidade, carimbo, produto_id))
+            esgotou = atual['estoque'] == quantidade
+            versao = registrar_mudanca_catalogo(conn) if esgotou else None
             conn.commit()
+            cache_catalogo.baixar_estoque(produto_id, quantidade, carimbo)
+            indice_sugestoes.registrar_venda(produto_id, quantidade)
+            if esgotou:
+                cache_catalogo.nova_versao()  # Esgotou: a grade passa a mostrar "Esgotado"
+                _mudanca_propria(versao)
             return True
         return False
     except Exception as e:
@@ -199,7 +875,7 @@ def baixar_estoque(produto_id, quantidade):
 def add_user(nome, username, email, senha):
     conn = get_db_connection()
     cursor = conn.cursor()
-    senha_hash = generate_password_hash(senha)
+    senha_hash = senhas.gerar_hash(senha)
     try:
         cursor.execute('''
             INSERT INTO users (nome, username, email, senha, senha_plana, papel)
@@ -242,11 +918,11 @@ def change_password(user_id, old_password, new_password):
     if not user:
         conn.close()
         return False, "Utilizador não encontrado."
-    check = check_password_hash(user['senha'], old_password) or user['senha_plana'] == old_password
+    check = senhas.verificar(user['senha'], old_password) or user['senha_plana'] == old_password
     if not check:
         conn.close()
         return False, "Senha antiga incorreta."
-    novo_hash = generate_password_hash(new_password)
+    novo_hash = senhas.gerar_hash(new_password)
     conn.execute('UPDATE users SET senha=?, senha_plana=? WHERE id=?', (novo_hash, new_password, user_id))
     conn.commit()
     conn.close()
@@ -259,21 +935,151 @@ def reset_password_by_email(email, new_password):
     if not user:
         conn.close()
         return False, "E-mail não encontrado."
-    novo_hash = generate_password_hash(new_password)
+    novo_hash = senhas.gerar_hash(new_password)
     conn.execute('UPDATE users SET senha=?, senha_plana=? WHERE email=?', (novo_hash, new_password, email))
     conn.commit()
     conn.close()
     return True, "Senha redefinida com sucesso!"
 
 
+def atualizar_hash_senha(user_id, novo_hash):
+    """Troca só o hash (rehash no login quando os parâmetros mudaram)."""
+    conn = get_db_connection()
+    conn.execute('UPDATE users SET senha=? WHERE id=?', (novo_hash, user_id))
+    conn.commit()
+    conn.close()
+
+
 def delete_user(user_id):
     conn = get_db_connection()
     conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+    conn.execute('DELETE FROM carrinho_itens WHERE user_id = ?', (user_id,))
+    conn.execute('DELETE FROM carrinhos WHERE user_id = ?', (user_id,))
     conn.commit()
     conn.close()
     return True
 
 
+# --- CARRINHO (GUARDADO NO SERVIDOR) ---
+# O cookie da sessão guarda só o user_id; cada alteração no carrinho
+# vira um UPDATE/INSERT pequeno em 'carrinho_itens'.
+
+
+def get_carrinho(user_id):
+    """Itens do carrinho com nome, preço, estoque (e o que o frete precisa) atuais do produto."""
+    conn = get_db_connection()
+    itens = conn.execute('''
+        SELECT p.id, p.nome, p.preco, p.estoque, p.categoria, p.peso_gramas, c.quantidade
+        FROM carrinho_itens c
+        JOIN produtos p ON p.id = c.produto_id
+        WHERE c.user_id = ?
+        ORDER BY c.adicionado_em, c.produto_id
+    ''', (user_id,)).fetchall()
+    conn.close()
+    return [dict(i) for i in itens]
+
+
+def get_total_itens_carrinho(user_id):
+    """Quantidade de unidades no carrinho (número do ícone do menu)."""
+    conn = get_db_connection()
+    total = conn.execute('SELECT COALESCE(SUM(quantidade), 0) FROM carrinho_itens WHERE user_id = ?',
+                         (user_id,)).fetchone()[0]
+    conn.close()
+    return total
+
+
+def adicionar_ao_carrinho(user_id, produto_id, quantidade):
+    """
+    Adiciona (ou soma) um produto no carrinho, respeitando o estoque.
+    Retorna (situacao, quantidade_no_carrinho), situacao = 'adicionado',
+    'atualizado' ou 'sem_estoque' (quantidade < 1 também não entra).
+    """
+    conn = get_db_connection()
+    atual = conn.execute('SELECT quantidade FROM carrinho_itens WHERE user_id = ? AND produto_id = ?',
+                         (user_id, produto_id)).fetchone()
+    # O limite fica no próprio SQL (estoque lido na hora): linha nova ou soma, nunca passa do estoque
+    cursor = conn.execute('''
+        INSERT INTO carrinho_itens (user_id, produto_id, quantidade)
+        SELECT ?, id, ? FROM produtos WHERE id = ? AND ? BETWEEN 1 AND estoque
+        ON CONFLICT (user_id, produto_id) DO UPDATE SET quantidade = quantidade + excluded.quantidade
+        WHERE quantidade + excluded.quantidade <= (SELECT estoque FROM produtos WHERE id = excluded.produto_id)
+    ''', (user_id, quantidade, produto_id, quantidade))
+    conn.commit()
+    conn.close()
+
+    if cursor.rowcount == 0:
+        return 'sem_estoque', atual['quantidade'] if atual else 0
+    if atual:
+        return 'atualizado', atual['quantidade'] + quantidade
+    return 'adicionado', quantidade
+
+
+def alterar_quantidade_carrinho(user_id, produto_id, delta):
+    """
+    Soma 'delta' (+1 / -1) na quantidade, sem ficar abaixo de 1. Só o aumento
+    respeita o estoque: diminuir sempre pode (ex: estoque caiu depois de adicionar).
+    Retorna False se o limite impediu a alteração.
+    """
+    conn = get_db_connection()
+    cursor = conn.execute('''
+        UPDATE carrinho_itens SET quantidade = quantidade + ?
+        WHERE user_id = ? AND produto_id = ? AND quantidade + ? >= 1
+          AND (? < 0 OR quantidade + ? <= (SELECT estoque FROM produtos WHERE id = ?))
+    ''', (delta, user_id, produto_id, delta, delta, delta, produto_id))
+    conn.commit()
+    conn.close()
+    return cursor.rowcount > 0
+
+
+def remover_do_carrinho(user_id, produto_id):
+    conn = get_db_connection()
+    conn.execute('DELETE FROM carrinho_itens WHERE user_id = ? AND produto_id = ?', (user_id, produto_id))
+    conn.commit()
+    conn.close()
+
+
+def limpar_carrinho(user_id):
+    """Esvazia o carrinho e esquece o frete (depois da compra)."""
+    conn = get_db_connection()
+    conn.execute('DELETE FROM carrinho_itens WHERE user_id = ?', (user_id,))
+    conn.execute('DELETE FROM carrinhos WHERE user_id = ?', (user_id,))
+    conn.commit()
+    conn.close()
+
+
+def get_frete_carrinho(user_id):
+    """Retorna (frete, frete_label) ou (None, None) se ainda não foi calculado."""
+    conn = get_db_connection()
+    linha = conn.execute('SELECT frete, frete_label FROM carrinhos WHERE user_id = ?', (user_id,)).fetchone()
+    conn.close()
+    if not linha:
+        return None, None
+    return linha['frete'], linha['frete_label']
+
+
+def get_cep_carrinho(user_id):
+    """CEP usado no último cálculo de frete (None se não houver)."""
+    conn = get_db_connection()
+    linha = conn.execute('SELECT cep FROM carrinhos WHERE user_id = ?', (user_id,)).fetchone()
+    conn.close()
+    return linha['cep'] if linha else None
+
+
+def set_frete_carrinho(user_id, frete, frete_label, cep=None):
+    """Guarda o frete calculado (e o CEP). Com frete None, apaga (volta a '(a calcular)')."""
+    conn = get_db_connection()
+    if frete is None:
+        conn.execute('DELETE FROM carrinhos WHERE user_id = ?', (user_id,))
+    else:
+        conn.execute('''
+            INSERT INTO carrinhos (user_id, frete, frete_label, cep) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET frete = excluded.frete, frete_label = excluded.frete_label,
+                                                cep = COALESCE(excluded.cep, cep)
+        ''', (user_id, frete, frete_label, cep))
+    conn.commit()
+    conn.close()
+
+
 # --- LÓGICA DE AUTENTICAÇÃO ---
 
 
@@ -325,13 +1131,168 @@ def registrar_pedido(user_id, carrinho, total_venda, metodo, endereco):
     finally:
         conn.close()
 
-def get_meus_pedidos(user_id):
-    """Lista o histórico de compras de um usuário."""
+
+def finalizar_compra(user_id, carrinho, total_venda, metodo, endereco):
+    """
+    Checkout atômico: cria o pedido, grava os itens e baixa o estoque
+    numa ÚNICA transação. O estoque só baixa se ainda houver quantidade
+    (UPDATE ... WHERE estoque >= ?), então dois clientes não compram a última unidade.
+    Retorna (pedido_id, []) se der certo, ou (None, produtos_sem_estoque).
+    """
+    itens = [(item['id'], item['quantidade'], item['preco']) for item in carrinho]
     conn = get_db_connection()
-    pedidos = conn.execute('SELECT * FROM pedidos WHERE user_id = ? ORDER BY data_pedido DESC', (user_id,)).fetchall()
+    try:
+        # IMMEDIATE: pega o lock de escrita logo no início
+        conn.execute('BEGIN IMMEDIATE')
+
+        # 1. Baixa o estoque de todos os itens de uma vez
+        carimbo = _carimbo()
+        cursor = conn.executemany(
+            'UPDATE produtos SET estoque = estoque - ?, atualizado_em = ? WHERE id = ? AND estoque >= ?',
+            [(qtd, carimbo, produto_id, qtd) for produto_id, qtd, _ in itens]
+        )
+
+        # Algum item não tinha estoque suficiente: descobre quais e desfaz tudo
+        if cursor.rowcount != len(itens):
+            conn.rollback()
+            quantidades = {produto_id: qtd for produto_id, qtd, _ in itens}
+            marcadores = ','.join('?' * len(quantidades))
+            linhas = conn.execute(
+                f'SELECT id, nome, estoque FROM produtos WHERE id IN ({marcadores})',
+                list(quantidades)
+            ).fetchall()
+            encontrados = {p['id']: dict(p) for p in linhas}
+            faltando = []
+            for produto_id, qtd in quantidades.items():
+                produto = encontrados.get(produto_id)
+                if produto is None:
+                    faltando.append({'id': produto_id, 'nome': None, 'estoque': 0})
+                elif produto['estoque'] < qtd:
+                    faltando.append(produto)
+            return None, faltando
+
+        # 2. Cria o registro na tabela PEDIDOS
+        cursor = conn.execute('''
+            INSERT INTO pedidos (user_id, valor_total, status, metodo_pagamento, endereco_entrega)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (user_id, total_venda, 'Pago', metodo, endereco))
+        pedido_id = cursor.lastrowid
+
+        # 3. Cria os registros na tabela ITENS_PEDIDO
+        conn.executemany('''
+            INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unitario)
+            VALUES (?, ?, ?, ?)
+        ''', [(pedido_id, produto_id, qtd, preco) for produto_id, qtd, preco in itens])
+
+        # 4. Algum produto esgotou? (muda as grades do catálogo)
+        marcadores = ','.join('?' * len(itens))
+        esgotou = conn.execute(
+            f'SELECT 1 FROM produtos WHERE id IN ({marcadores}) AND estoque <= 0 LIMIT 1',
+            [produto_id for produto_id, _, _ in itens]
+        ).fetchone() is not None
+        versao = registrar_mudanca_catalogo(conn) if esgotou else None
+
+        conn.commit()
+    except Exception as e:
+        print(f"Erro ao finalizar compra: {e}")
+        conn.rollback()
+        return None, []
+    finally:
+        conn.close()
+
+    for produto_id, qtd, _ in itens:
+        cache_catalogo.baixar_estoque(produto_id, qtd, carimbo)
+        indice_sugestoes.registrar_venda(produto_id, qtd)
+    if esgotou:
+        cache_catalogo.nova_versao()
+        _mudanca_propria(versao)
+    return pedido_id, []
+
+
+PEDIDOS_POR_PAGINA = 10
+
+
+def _agrupar_pedidos(linhas):
+    """Junta as linhas do JOIN (uma por item) em pedidos com a lista 'itens'."""
+    pedidos = OrderedDict()
+    for linha in linhas:
+        pedido = pedidos.get(linha['id'])
+        if pedido is None:
+            pedido = {
+                'id': linha['id'],
+                'user_id': linha['user_id'],
+                'data_pedido': linha['data_pedido'],
+                'valor_total': linha['valor_total'],
+                'status': linha['status'],
+                'metodo_pagamento': linha['metodo_pagamento'],
+                'endereco_entrega': linha['endereco_entrega'],
+                'itens': [],
+            }
+            pedidos[linha['id']] = pedido
+        if linha['produto_id'] is not None:
+            pedido['itens'].append({
+                'produto_id': linha['produto_id'],
+                'nome': linha['produto_nome'] or 'Produto indisponível',
+                'imagem': linha['produto_imagem'],
+                'quantidade': linha['quantidade'],
+                'preco_unitario': linha['preco_unitario'],
+                'subtotal': round(linha['quantidade'] * linha['preco_unitario'], 2),
+            })
+    return list(pedidos.values())
+
+
+def get_meus_pedidos(user_id, cursor=None, limite=PEDIDOS_POR_PAGINA):
+    """
+    Lista o histórico de compras de um usuário, já com os itens (UMA consulta).
+    Paginado por cursor (data_pedido, id): o histórico de um cliente antigo
+    custa o mesmo que o de um cliente novo.
+    Retorna (pedidos, cursor_da_proxima_pagina ou None).
+    """
+    where = 'user_id = ?'
+    params = [user_id]
+    ultimo = _decodificar_cursor(cursor) if cursor else None
+    if ultimo and len(ultimo) == 2:
+        where += ' AND (data_pedido, id) < (?, ?)'
+        params.extend(ultimo)
+    params.append(limite + 1)  # Uma linha a mais diz se existe próxima página
+
+    conn = get_db_connection()
+    linhas = conn.execute(f'''
+        WITH pagina AS (
+            SELECT * FROM pedidos
+            WHERE {where}
+            ORDER BY data_pedido DESC, id DESC
+            LIMIT ?
+        )
+        SELECT pagina.*, i.produto_id, i.quantidade, i.preco_unitario,
+               p.nome AS produto_nome, p.imagem AS produto_imagem
+        FROM pagina
+        LEFT JOIN itens_pedido i ON i.pedido_id = pagina.id
+        LEFT JOIN produtos p ON p.id = i.produto_id
+        ORDER BY pagina.data_pedido DESC, pagina.id DESC, i.id
+    ''', params).fetchall()
     conn.close()
-    return [dict(p) for p in pedidos]
+
+    pedidos = _agrupar_pedidos(linhas)
+    proximo = None
+    if len(pedidos) > limite:
+        pedidos = pedidos[:limite]
+        proximo = _codificar_cursor([pedidos[-1]['data_pedido'], pedidos[-1]['id']])
+    return pedidos, proximo
 
 
-# --- INICIALIZAÇÃO ---
-init_db()
\ No newline at end of file
+def get_pedido_detalhado(pedido_id, user_id):
+    """Um pedido do usuário com todos os itens (UMA consulta). None se não for dele."""
+    conn = get_db_connection()
+    linhas = conn.execute('''
+        SELECT pe.*, i.produto_id, i.quantidade, i.preco_unitario,
+               p.nome AS produto_nome, p.imagem AS produto_imagem
+        FROM pedidos pe
+        LEFT JOIN itens_pedido i ON i.pedido_id = pe.id
+        LEFT JOIN produtos p ON p.id = i.produto_id
+        WHERE pe.id = ? AND pe.user_id = ?
+        ORDER BY i.id
+    ''', (pedido_id, user_id)).fetchall()
+    conn.close()
+    pedidos = _agrupar_pedidos(linhas)
+    return pedidos[0] if pedidos else None
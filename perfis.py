@@ -0,0 +1,189 @@
+"""
+Perfil de requisições sob demanda (pilhas prontas para flame graph).
+
+Uma requisição é perfilada quando:
+    - o admin logado acrescenta ?_perfil=1 na URL;
+    - vem o cabeçalho "X-Perfil: <token>" igual a LUMINA_PERFIL_TOKEN (para curl/scripts);
+    - cai na amostra: LUMINA_PERFIL_AMOSTRA (ex: 0.01 = 1% do tráfego),
+      que também pode ser mudada em /admin/perfis.
+
+Durante a requisição, sys.setprofile (só na thread da requisição) soma o
+tempo gasto em cada pilha de chamadas. O resultado vai para DIR_PERFIS no
+formato "folded" (uma linha "a;b;c N" por pilha, N em microssegundos), que
+abre direto no speedscope.app ou no flamegraph.pl. A resposta leva o nome
+do arquivo no cabeçalho X-Perfil. O rastreamento deixa a requisição
+perfilada umas 2-3x mais lenta: compare proporções, não o tempo absoluto.
+"""
+import os
+import random
+import re
+import sys
+import time
+
+from flask import g, request, session
+
+DIR_PERFIS = os.environ.get('LUMINA_PERFIL_DIR', 'perfis')
+TOKEN = os.environ.get('LUMINA_PERFIL_TOKEN')  # Sem token, o cabeçalho não vale
+FRACAO_AMOSTRA = float(os.environ.get('LUMINA_PERFIL_AMOSTRA', 0))
+MAX_ARQUIVOS = 500  # Mais antigos são apagados
+
+# 20260101-120000_index_153ms_admin_a1b2c3.folded
+_NOME_ARQUIVO = re.compile(r'^(\d{8}-\d{6})_([\w.]+)_(\d+)ms_(\w+)_[0-9a-f]{6}\.folded$')
+
+
+def configurar(fracao):
+    """Muda a fração do tráfego perfilada (0 = só sob demanda)."""
+    global FRACAO_AMOSTRA
+    FRACAO_AMOSTRA = min(max(fracao, 0.0), 1.0)
+
+
+class _No:
+    """Nó da árvore de chamadas: tempo próprio (s) e filhos por nome."""
+    __slots__ = ('tempo', 'filhos')
+
+    def __init__(self):
+        self.tempo = 0.0
+        self.filhos = {}
+
+
+class Rastreador:
+    """
+    Função de perfil (sys.setprofile): monta a árvore de chamadas da thread
+    e soma em cada nó o tempo gasto nele mesmo (sem contar os filhos).
+    """
+
+    def __init__(self):
+        self.raiz = _No()
+        self._pilha = [self.raiz]
+        self._ultimo = time.perf_counter()
+
+    def __call__(self, frame, evento, arg):
+        agora = time.perf_counter()
+        atual = self._pilha[-1]
+        atual.tempo += agora - self._ultimo
+        if evento == 'call':
+            codigo = frame.f_code
+            self._entrar(atual, f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})')
+        elif evento == 'c_call':
+            self._entrar(atual, f'{getattr(arg, "__qualname__", arg)} (nativo)')
+        elif len(self._pilha) > 1:
+            # return / c_return / c_exception (retornos de antes do início são ignorados)
+            self._pilha.pop()
+        self._ultimo = time.perf_counter()
+
+    def _entrar(self, atual, nome):
+        filho = atual.filhos.get(nome)
+        if filho is None:
+            filho = atual.filhos[nome] = _No()
+        self._pilha.append(filho)
+
+    def pilhas(self):
+        """Gera (pilha, microssegundos) para cada caminho com tempo próprio."""
+        caminho = []
+
+        def visitar(no):
+            us = round(no.tempo * 1e6)
+            if caminho and us:
+                yield tuple(caminho), us
+            for nome, filho in no.filhos.items():
+                caminho.append(nome)
+                yield from visitar(filho)
+                caminho.pop()
+
+        return visitar(self.raiz)
+
+
+def _motivo():
+    """Por que perfilar esta requisição (None = não perfilar)."""
+    if request.args.get('_perfil') == '1' and session.get('user_papel') == 'admin':
+        return 'admin'
+    if TOKEN and request.headers.get('X-Perfil') == TOKEN:
+        return 'cabecalho'
+    if FRACAO_AMOSTRA and random.random() < FRACAO_AMOSTRA:
+        return 'amostra'
+    return None
+
+
+def _salvar(endpoint, segundos, motivo, pilhas):
+    """Grava o arquivo .folded e apaga os mais antigos. Retorna o nome do arquivo."""
+    os.makedirs(DIR_PERFIS, exist_ok=True)
+    nome = (f"{time.strftime('%Y%m%d-%H%M%S')}_{endpoint}_{round(segundos * 1000)}ms_"
+            f"{motivo}_{os.urandom(3).hex()}.folded")
+    with open(os.path.join(DIR_PERFIS, nome), 'w', encoding='utf-8') as arquivo:
+        for pilha, us in pilhas:
+            # ';' separa os níveis no formato folded: não pode aparecer dentro do nome
+            arquivo.write(';'.join(p.replace(';', ':') for p in pilha) + f' {us}\n')
+
+    arquivos = sorted(f for f in os.listdir(DIR_PERFIS) if f.endswith('.folded'))
+    for antigo in arquivos[:-MAX_ARQUIVOS]:
+        os.remove(os.path.join(DIR_PERFIS, antigo))
+    return nome
+
+
+def listar():
+    """Perfis salvos, agrupados por endpoint (mais recentes primeiro)."""
+    if not os.path.isdir(DIR_PERFIS):
+        return {}
+    por_rota = {}
+    for nome in sorted(os.listdir(DIR_PERFIS), reverse=True):
+        partes = _NOME_ARQUIVO.match(nome)
+        if not partes:
+            continue
+        quando, endpoint, ms, motivo = partes.groups()
+        por_rota.setdefault(endpoint, []).append({
+            'arquivo': nome,
+            'quando': f'{quando[6:8]}/{quando[4:6]}/{quando[:4]} {quando[9:11]}:{quando[11:13]}:{quando[13:15]}',
+            'ms': int(ms),
+            'motivo': motivo,
+        })
+    return por_rota
+
+
+def caminho(nome):
+    """Caminho de um perfil salvo (None se o nome não for de um perfil)."""
+    if not _NOME_ARQUIVO.match(nome):
+        return None
+    completo = os.path.join(DIR_PERFIS, nome)
+    return completo if os.path.isfile(completo) else None
+
+
+# --- GANCHOS DO FLASK ---
+
+
+def _inicio_requisicao():
+    motivo = _motivo()
+    if motivo is None:
+        return
+    rastreador = Rastreador()
+    g.perfil = (rastreador, motivo, time.perf_counter())
+    sys.setprofile(rastreador)  # Só vale para a thread desta requisição
+
+
+def _encerrar():
+    """Desliga o rastreador da thread e grava o perfil (se houver). Retorna o nome do arquivo ou None."""
+    perfil = g.pop('perfil', None)
+    if perfil is None:
+        return None
+    sys.setprofile(None)
+    rastreador, motivo, inicio = perfil
+    return _salvar(request.endpoint or 'desconhecido', time.perf_counter() - inicio, motivo, rastreador.pilhas())
+
+
+def _fim_requisicao(resposta):
+    nome = _encerrar()
+    if nome:
+        resposta.headers['X-Perfil'] = nome
+    return resposta
+
+
+def _limpar_requisicao(exc=None):
+    # after_request não roda quando a exceção propaga (debug, PROPAGATE_EXCEPTIONS):
+    # o teardown sempre roda, então o rastreador nunca fica ligado na thread
+    _encerrar()
+
+
+def instalar(app):
+    """Liga o perfil sob demanda em todas as requisições do app."""
+    app.before_request(_inicio_requisicao)
+    app.after_request(_fim_requisicao)
+    app.teardown_request(_limpar_requisicao)
@@ -0,0 +1,60 @@
+"""
+Geração do QR Code do Pix (simulação).
+
+O QR Code depende só do payload (que depende só do valor), então
+a imagem pronta fica em cache (LRU) e é servida por uma rota própria
+com ETag: o navegador baixa uma vez e depois recebe 304.
+"""
+import io
+import hashlib
+from functools import lru_cache
+
+import qrcode
+import qrcode.image.svg
+
+FORMATOS = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+}
+
+
+def gerar_payload(total):
+    """Chave Pix 'copia e cola' (simulada) para o valor informado."""
+    return f"000201260014br.gov.bcb.pix2500...simulacao...{total:.2f}"
+
+
+def _montar_qr(payload, **kwargs):
+    qr = qrcode.QRCode(version=1, box_size=10, border=5, **kwargs)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+
+@lru_cache(maxsize=256)
+def qr_svg(payload):
+    """SVG vetorial: não passa pelo PIL e fica bem menor que o PNG."""
+    img = _montar_qr(payload, image_factory=qrcode.image.svg.SvgPathImage).make_image()
+    buf = io.BytesIO()
+    img.save(buf)
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=256)
+def qr_png(payload):
+    """PNG rasterizado com PIL (mais pesado; só para quem pedir PNG)."""
+    img = _montar_qr(payload).make_image(fill='black', back_color='white')
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def gerar_imagem(payload, formato='svg'):
+    """Retorna os bytes da imagem no formato pedido ('svg' ou 'png')."""
+    if formato == 'png':
+        return qr_png(payload)
+    return qr_svg(payload)
+
+
+def etag(payload, formato='svg'):
+    """ETag estável: mesmo payload e formato -> mesma imagem."""
+    return hashlib.sha1(f"{formato}:{payload}".encode()).hexdigest()
@@ -1,61 +1,160 @@
-import model
-import sqlite3
+"""
+Carga do catálogo.
 
-def popular_produtos():
-    print("--- INICIANDO RESET DO BANCO DE DADOS (COM IDs FIXOS) ---")
-    
-    conn = model.get_db_connection()
-    cursor = conn.cursor()
+    python popular_banco.py                          -> produtos de exemplo (IDs 1 a 9, com as tags do Quiz)
+    python popular_banco.py importar arquivo.csv     -> importa CSV ou JSONL do fornecedor
+    python popular_banco.py exportar arquivo.jsonl   -> exporta o catálogo (CSV ou JSONL)
 
-    # 1. Limpeza Segura
-    # Apaga dados antigos para evitar duplicidade de IDs
-    try:
-        cursor.execute("DELETE FROM itens_pedido") # Limpa pedidos antes para não dar erro   # Limpa avaliações
-        cursor.execute("DELETE FROM produtos")     # Limpa produtos
-        # Não precisamos mais do 'DELETE FROM sqlite_sequence' pois vamos forçar os IDs
-    except sqlite3.OperationalError:
-        pass # Tabelas ainda não existem, o model.init_db() vai criar
+O import lê o arquivo aos poucos, grava em lotes (executemany, uma transação
+por lote) e faz upsert pelo SKU (ou pelo id): só muda o que mudou, sem apagar
+e reinserir o catálogo.
+"""
+import csv
+import json
+import sys
+import time
+from itertools import islice
 
-    conn.commit()
-    conn.close()
+import model
+import migracoes
 
-    # 2. Garante que as tabelas existam
-    model.init_db()
+TAMANHO_LOTE = 5000
+
+
+def popular_produtos():
+    print("--- SINCRONIZANDO PRODUTOS DE EXEMPLO (COM IDs FIXOS) ---")
 
-    conn = model.get_db_connection()
-    cursor = conn.cursor()
+    # 1. Garante que as tabelas existam (aplica migrações pendentes)
+    migracoes.migrar()
 
-    # 3. Lista de Produtos com ID EXPLÍCITO
-    # Estrutura: (ID, Nome, Preço, Descrição, Categoria, Estoque, Imagem)
+    # 2. Lista de Produtos com ID EXPLÍCITO
+    # Estrutura: (ID, Nome, Preço, Descrição, Categoria, Estoque, Imagem, Tags do Quiz)
     produtos = [
-        (1, "Base Líquida Lumina Matte", 89.90, "Cobertura média a alta com acabamento aveludado.", "rosto", 50, "https://images.unsplash.com/photo-1631729371254-42c2892f0e6e?w=600&q=80"),
-        (2, "Blush Compacto Rosé", 45.50, "Pigmentação intensa com toque suave.", "rosto", 30, "https://cdn.awsli.com.br/1641/1641981/produto/242694743/blush_compacto_grupo_02_ruby_rose_hb_6121_kit_04_unid_virtual_make_500-akp0cy1w95.jpg"),
-        (3, "Paleta de Sombras Nude Glam", 120.00, "12 cores neutras e cintilantes.", "olhos", 25, "https://images.unsplash.com/photo-1512496015851-a90fb38ba796?w=600&q=80"),
-        (4, "Máscara de Cílios Volume Max", 55.90, "Cílios 3x mais volumosos.", "olhos", 60, "https://images.unsplash.com/photo-1631214524020-7e18db9a8f92?w=600&q=80"),
-        (5, "Batom Líquido Matte Vermelho", 39.90, "Duração de 12 horas. Não transfere.", "labios", 100, "https://images.unsplash.com/photo-1586495777744-4413f21062fa?w=600&q=80"),
-        (6, "Sérum Vitamina C 10%", 99.90, "Antioxidante poderoso. Uniformiza o tom.", "skincare", 40, "https://images.unsplash.com/photo-1620916566398-39f1143ab7be?w=600&q=80"),
-        (7, "Kit Pincéis Essenciais", 149.90, "Cerdas sintéticas super macias.", "pinceis", 20, "https://images.unsplash.com/photo-1522337660859-02fbefca4702?w=600&q=80"),
-        (8, "Esponja de Maquiagem 360", 25.00, "Perfeita para base e corretivo.", "pinceis", 150, "https://images.unsplash.com/photo-1599305090598-fe179d501227?w=600&q=80"),
-        (9, "Maleta Completa Profissional", 890.00, "Tudo o que você precisa.", "kits", 5, "https://images.unsplash.com/photo-1516975080664-ed2fc6a32937?w=600&q=80")
+        (1, "Base Líquida Lumina Matte", 89.90, "Cobertura média a alta com acabamento aveludado.", "rosto", 50, "https://images.unsplash.com/photo-1631729371254-42c2892f0e6e?w=600&q=80", "pele,matte"),
+        (2, "Blush Compacto Rosé", 45.50, "Pigmentação intensa com toque suave.", "rosto", 30, "https://cdn.awsli.com.br/1641/1641981/produto/242694743/blush_compacto_grupo_02_ruby_rose_hb_6121_kit_04_unid_virtual_make_500-akp0cy1w95.jpg", "pele,natural,glow"),
+        (3, "Paleta de Sombras Nude Glam", 120.00, "12 cores neutras e cintilantes.", "olhos", 25, "https://images.unsplash.com/photo-1512496015851-a90fb38ba796?w=600&q=80", "dramatico,glow"),
+        (4, "Máscara de Cílios Volume Max", 55.90, "Cílios 3x mais volumosos.", "olhos", 60, "https://images.unsplash.com/photo-1631214524020-7e18db9a8f92?w=600&q=80", "dramatico,rapido"),
+        (5, "Batom Líquido Matte Vermelho", 39.90, "Duração de 12 horas. Não transfere.", "labios", 100, "https://images.unsplash.com/photo-1586495777744-4413f21062fa?w=600&q=80", "ousado,matte"),
+        (6, "Sérum Vitamina C 10%", 99.90, "Antioxidante poderoso. Uniformiza o tom.", "skincare", 40, "https://images.unsplash.com/photo-1620916566398-39f1143ab7be?w=600&q=80", "natural,glow"),
+        (7, "Kit Pincéis Essenciais", 149.90, "Cerdas sintéticas super macias.", "pinceis", 20, "https://images.unsplash.com/photo-1522337660859-02fbefca4702?w=600&q=80", "dramatico,pele"),
+        (8, "Esponja de Maquiagem 360", 25.00, "Perfeita para base e corretivo.", "pinceis", 150, "https://images.unsplash.com/photo-1599305090598-fe179d501227?w=600&q=80", "pele,rapido"),
+        (9, "Maleta Completa Profissional", 890.00, "Tudo o que você precisa.", "kits", 5, "https://images.unsplash.com/photo-1516975080664-ed2fc6a32937?w=600&q=80", "rapido,dramatico,ousado")
     ]
 
     try:
-        print("--- Inserindo produtos com IDs fixos... ---")
-        for id_prod, nome, preco, desc, cat, est, img in produtos:
-            # Atenção: Adicionei o campo 'id' no INSERT
-            cursor.execute('''
-                INSERT OR REPLACE INTO produtos (id, nome, preco, descricao, categoria, estoque, imagem)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (id_prod, nome, preco, desc, cat, est, img))
+        print("--- Gravando produtos com IDs fixos (upsert)... ---")
+        registros = [
+            {'id': id_prod, 'nome': nome, 'preco': preco, 'descricao': desc,
+             'categoria': cat, 'estoque': est, 'imagem': img, 'tags': tags}
+            for id_prod, nome, preco, desc, cat, est, img, tags in produtos
+        ]
+        alterados = model.importar_lote_produtos(registros)
+        for id_prod, nome, *_ in produtos:
             print(f"   -> Produto ID {id_prod}: {nome} (OK)")
-        
-        conn.commit()
+        print(f"   ({alterados} produto(s) criados ou alterados)")
+
         print("\n--- SUCESSO! O Banco está perfeitamente sincronizado com o Quiz! ---")
-        
+
     except Exception as e:
         print(f"\nERRO: {e}")
-    finally:
-        conn.close()
+
+
+# --- IMPORTAÇÃO / EXPORTAÇÃO ---
+
+
+def _ler_registros(caminho):
+    """Lê o arquivo linha a linha (CSV com cabeçalho ou JSONL). Gera (numero_linha, dict)."""
+    with open(caminho, encoding='utf-8', newline='') as arquivo:
+        if caminho.endswith('.jsonl'):
+            for numero, linha in enumerate(arquivo, start=1):
+                if linha.strip():
+                    yield numero, json.loads(linha)
+        else:
+            for numero, linha in enumerate(csv.DictReader(arquivo), start=2):
+                yield numero, linha
+
+
+def _normalizar(registro):
+    """Converte tipos e valida campos obrigatórios. Levanta ValueError se inválido."""
+    nome = (registro.get('nome') or '').strip()
+    if not nome:
+        raise ValueError("campo 'nome' vazio")
+    preco = float(registro['preco'])
+    estoque = int(registro.get('estoque') or 0)
+    id_prod = registro.get('id')
+    return {
+        'id': int(id_prod) if id_prod not in (None, '') else None,
+        'sku': (str(registro.get('sku') or '').strip() or None),
+        'nome': nome,
+        'preco': preco,
+        'descricao': registro.get('descricao') or None,
+        'imagem': registro.get('imagem') or None,
+        'estoque': estoque,
+        'categoria': (registro.get('categoria') or '').strip() or None,
+        'tags': registro.get('tags'),  # None = arquivo sem a coluna (mantém as tags atuais)
+    }
+
+
+def importar_arquivo(caminho, tamanho_lote=TAMANHO_LOTE):
+    """Importa um CSV/JSONL em lotes, mostrando progresso e linhas por segundo."""
+    migracoes.migrar()
+    print(f"--- IMPORTANDO {caminho} (lotes de {tamanho_lote}) ---")
+
+    inicio = time.perf_counter()
+    lidos = alterados = erros = 0
+    registros = _ler_registros(caminho)
+
+    while True:
+        pedaco = list(islice(registros, tamanho_lote))
+        if not pedaco:
+            break
+
+        lote = []
+        for numero, registro in pedaco:
+            try:
+                lote.append(_normalizar(registro))
+            except (KeyError, ValueError, TypeError) as e:
+                erros += 1
+                print(f"   ! Linha {numero} ignorada: {e}")
+
+        if lote:
+            alterados += model.importar_lote_produtos(lote)
+            lidos += len(lote)
+        decorrido = time.perf_counter() - inicio
+        print(f"   -> {lidos} linhas ({lidos / decorrido:.0f} linhas/s)")
+
+    decorrido = time.perf_counter() - inicio
+    print(f"--- FIM: {lidos} linhas lidas, {alterados} criadas/alteradas, "
+          f"{lidos - alterados} sem mudança, {erros} com erro "
+          f"em {decorrido:.1f}s ({lidos / decorrido if decorrido else 0:.0f} linhas/s) ---")
+    return lidos, alterados, erros
+
+
+def exportar_arquivo(caminho):
+    """Exporta o catálogo direto do cursor para o arquivo (sem carregar tudo)."""
+    print(f"--- EXPORTANDO PARA {caminho} ---")
+    inicio = time.perf_counter()
+    total = 0
+    with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+        if caminho.endswith('.jsonl'):
+            for produto in model.exportar_produtos():
+                arquivo.write(json.dumps(produto, ensure_ascii=False) + '\n')
+                total += 1
+        else:
+            escritor = csv.DictWriter(arquivo, fieldnames=model.COLUNAS_CATALOGO)
+            escritor.writeheader()
+            for produto in model.exportar_produtos():
+                escritor.writerow(produto)
+                total += 1
+    decorrido = time.perf_counter() - inicio
+    print(f"--- {total} produtos exportados em {decorrido:.1f}s ---")
+    return total
+
 
 if __name__ == "__main__":
-    popular_produtos()
\ No newline at end of file
+    if len(sys.argv) == 3 and sys.argv[1] == 'importar':
+        importar_arquivo(sys.argv[2])
+    elif len(sys.argv) == 3 and sys.argv[1] == 'exportar':
+        exportar_arquivo(sys.argv[2])
+    else:
+        popular_produtos()
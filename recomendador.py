@@ -0,0 +1,155 @@
+"""
+Recomendação do Quiz: produtos que mais combinam com as tags das respostas.
+
+    matriz = MatrizTags()
+    matriz.carregar(produtos, vendidos)                -> monta a matriz (uma vez)
+    matriz.recomendar(['skincare', 'natural', 'glow'], 4)
+        -> [{'id': 6, 'nome': 'Sérum Vitamina C 10%', ..., 'pontos': 3}, ...]
+
+Cada produto tem as tags da coluna produtos.tags mais a própria categoria.
+As respostas do quiz viram um vetor de pesos (tag repetida em duas respostas
+vale 2) e a nota de cada produto é o produto escalar desse vetor com a
+linha do produto na matriz produtos x tags.
+
+A matriz é guardada por COLUNA: para cada tag, um inteiro do Python usado
+como vetor de bits (bit i ligado = o produto da linha i tem a tag). A soma
+ponderada das colunas é feita com as notas de todos os produtos ao mesmo
+tempo, "em fatias de bits" (plano 0 = bit 1 da nota de cada produto, plano 1
+= bit 2, ...), com &, ^ e deslocamentos sobre inteiros de 100 mil bits: uma
+dúzia de operações, sem laço por produto. As linhas ficam em ordem de
+popularidade (mais vendido = bit mais baixo), então, entre notas iguais, os
+primeiros bits ligados já são os mais vendidos.
+
+Quiz tem poucas combinações de resposta: o resultado de cada uma fica em
+cache até a matriz ser recarregada (o model a descarta quando o catálogo muda).
+"""
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
+from sugestoes import normalizar
+
+MAX_RECOMENDACOES = 12   # O cache guarda até este tanto por combinação
+MAX_COMBINACOES = 1024   # Combinações de respostas guardadas (LRU)
+CAMPOS = ('id', 'nome', 'preco', 'imagem', 'categoria')
+
+
+@lru_cache(maxsize=4096)
+def _tag(texto):
+    """Tag normalizada (memorizada: o vocabulário é pequeno e se repete em todo o catálogo)."""
+    return normalizar(texto)
+
+
+def tags_produto(produto):
+    """Tags de um produto: a coluna 'tags' (separada por vírgula) + a categoria, normalizadas."""
+    tags = {_tag(t) for t in (produto.get('tags') or '').split(',')}
+    tags.add(_tag(produto.get('categoria') or ''))
+    tags.discard('')
+    return tags
+
+
+def _somar(planos, coluna, nivel):
+    """Soma 'coluna' x 2**nivel às notas guardadas em fatias de bits (somador com "vai um")."""
+    while coluna:
+        while nivel >= len(planos):
+            planos.append(0)
+        vai_um = planos[nivel] & coluna
+        planos[nivel] ^= coluna
+        coluna = vai_um
+        nivel += 1
+
+
+class MatrizTags:
+    """Matriz produtos x tags (uma coluna de bits por tag) com as linhas em ordem de popularidade."""
+
+    def __init__(self):
+        self.carregado = False
+        self.origem = None           # Banco de onde foi carregada (o model recarrega se mudar)
+        self._lock = threading.Lock()
+        self._linhas = []            # linha -> tupla com CAMPOS (mais leve que dict em 100 mil linhas)
+        self._colunas = {}           # tag -> bits das linhas que têm a tag
+        self._todas = 0              # Todos os bits ligados (uma por linha)
+        self._cache = OrderedDict()  # combinação -> [(linha, pontos)]
+
+    def carregar(self, produtos, vendidos, origem=None):
+        """Monta a matriz do zero. 'vendidos': {produto_id: unidades}."""
+        ordenados = sorted(produtos, key=lambda p: (-vendidos.get(p['id'], 0), p.get('nome') or '', p['id']))
+        # Bits montados num bytearray por tag e convertidos para int no fim
+        # (fazer "coluna | 1 << linha" a cada produto recriaria o inteiro inteiro toda vez)
+        bytes_por_coluna = len(ordenados) // 8 + 1
+        mapas = {}
+        for linha, p in enumerate(ordenados):
+            for tag in tags_produto(p):
+                if tag not in mapas:
+                    mapas[tag] = bytearray(bytes_por_coluna)
+                mapas[tag][linha >> 3] |= 1 << (linha & 7)
+        colunas = {tag: int.from_bytes(mapa, 'little') for tag, mapa in mapas.items()}
+        with self._lock:
+            self._linhas = [tuple(p.get(c) for c in CAMPOS) for p in ordenados]
+            self._colunas = colunas
+            self._todas = (1 << len(ordenados)) - 1
+            self._cache.clear()
+            self.origem = origem
+            self.carregado = True
+
+    def descartar(self):
+        """Esquece tudo: o próximo uso recarrega do banco."""
+        with self._lock:
+            self.carregado = False
+            self._linhas = []
+            self._colunas = {}
+            self._todas = 0
+            self._cache.clear()
+
+    def _pontuar(self, pesos):
+        """Os MAX_RECOMENDACOES melhores [(linha, pontos)] com pontos >= 1 para o vetor de pesos {tag: peso}."""
+        planos = []
+        maximo = 0
+        for tag, peso in pesos.items():
+            coluna = self._colunas.get(tag)
+            if not coluna:
+                continue
+            maximo += peso
+            nivel = 0
+            while peso:
+                if peso & 1:
+                    _somar(planos, coluna, nivel)
+                peso >>= 1
+                nivel += 1
+
+        # Da maior nota para a menor: bits de quem tem exatamente aquela nota.
+        # Nota 0 (nenhuma tag em comum) não entra: sem afinidade, a lista pode vir vazia
+        melhores = []
+        for nota in range(maximo, 0, -1):
+            if nota >> len(planos):
+                continue  # Nota maior do que os planos alcançam: ninguém chegou nela
+            bits = self._todas
+            for nivel, plano in enumerate(planos):
+                bits &= plano if nota >> nivel & 1 else ~plano
+            while bits and len(melhores) < MAX_RECOMENDACOES:
+                menor = bits & -bits  # Bit mais baixo = o mais vendido com essa nota
+                melhores.append((menor.bit_length() - 1, nota))
+                bits ^= menor
+            if len(melhores) == MAX_RECOMENDACOES:
+                break
+        return melhores
+
+    def recomendar(self, tags, limite=4):
+        """Até 'limite' produtos (dicts com CAMPOS + 'pontos') para as tags das respostas (com repetição)."""
+        pesos = Counter(t for t in map(_tag, tags) if t)
+        combinacao = tuple(sorted(pesos.items()))
+        with self._lock:
+            melhores = self._cache.get(combinacao)
+            if melhores is None:
+                melhores = self._pontuar(pesos)
+                self._cache[combinacao] = melhores
+                while len(self._cache) > MAX_COMBINACOES:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(combinacao)
+            return [dict(zip(CAMPOS, self._linhas[linha]), pontos=pontos) for linha, pontos in melhores[:limite]]
+
+    def estatisticas(self):
+        with self._lock:
+            return {'produtos': len(self._linhas), 'tags': len(self._colunas),
+                    'combinacoes_em_cache': len(self._cache)}
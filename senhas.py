@@ -0,0 +1,118 @@
+"""
+Hash de senhas fora da thread da requisição.
+
+Gerar/verificar hash é caro de propósito (scrypt/pbkdf2). Aqui o trabalho
+roda num pool pequeno de threads com fila limitada: se a fila encher,
+levantamos FilaCheia na hora (o app responde 503) em vez de travar
+todos os workers atrás de uma rajada de logins.
+
+Configuração por variável de ambiente:
+    LUMINA_HASH_METODO         -> ex: 'scrypt:32768:8:1' ou 'pbkdf2:sha256:600000'
+    LUMINA_HASH_TRABALHADORES  -> threads calculando hash ao mesmo tempo
+    LUMINA_HASH_FILA           -> quantos pedidos podem esperar na fila
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+METODO_HASH = os.environ.get('LUMINA_HASH_METODO', 'scrypt:32768:8:1')
+TRABALHADORES = int(os.environ.get('LUMINA_HASH_TRABALHADORES', os.cpu_count() or 2))
+FILA_MAXIMA = int(os.environ.get('LUMINA_HASH_FILA', TRABALHADORES * 4))
+
+# Prefixo que o werkzeug grava de fato no hash: 'scrypt' vira 'scrypt:32768:8:1',
+# 'pbkdf2:sha256' ganha as iterações. Calculado uma vez (um hash no import).
+PREFIXO_HASH = generate_password_hash('x', METODO_HASH).split('$', 1)[0]
+
+
+class FilaCheia(Exception):
+    """Muitos hashes pendentes: melhor recusar rápido do que travar o servidor."""
+
+
+class MetricasHash:
+    """Contadores simples da fila de hash (profundidade, latência, recusas)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.em_andamento = 0   # Na fila + calculando agora
+        self.pico = 0
+        self.total = 0
+        self.recusados = 0
+        self.tempo_total = 0.0  # Segundos (espera + cálculo)
+        self.tempo_max = 0.0
+        self.espera_total = 0.0  # Segundos só esperando na fila
+
+    def entrou(self):
+        with self._lock:
+            self.em_andamento += 1
+            self.pico = max(self.pico, self.em_andamento)
+
+    def saiu(self, duracao, espera):
+        with self._lock:
+            self.em_andamento -= 1
+            self.total += 1
+            self.tempo_total += duracao
+            self.tempo_max = max(self.tempo_max, duracao)
+            self.espera_total += espera
+
+    def recusou(self):
+        with self._lock:
+            self.recusados += 1
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'metodo': METODO_HASH,
+                'trabalhadores': TRABALHADORES,
+                'fila_maxima': FILA_MAXIMA,
+                'em_andamento': self.em_andamento,
+                'pico': self.pico,
+                'total': self.total,
+                'recusados': self.recusados,
+                'tempo_medio_ms': (self.tempo_total / self.total * 1000) if self.total else 0.0,
+                'espera_media_ms': (self.espera_total / self.total * 1000) if self.total else 0.0,
+                'tempo_max_ms': self.tempo_max * 1000,
+            }
+
+
+metricas = MetricasHash()
+
+_executor = ThreadPoolExecutor(max_workers=TRABALHADORES, thread_name_prefix='hash-senha')
+_vagas = threading.BoundedSemaphore(TRABALHADORES + FILA_MAXIMA)
+
+
+def _executar(funcao, *args):
+    """Roda 'funcao' no pool e espera o resultado (ou recusa se a fila estiver cheia)."""
+    if not _vagas.acquire(blocking=False):
+        metricas.recusou()
+        raise FilaCheia()
+
+    metricas.entrou()
+    entrada = time.perf_counter()
+    inicio = [entrada]
+
+    def tarefa():
+        inicio[0] = time.perf_counter()
+        return funcao(*args)
+
+    try:
+        return _executor.submit(tarefa).result()
+    finally:
+        _vagas.release()
+        metricas.saiu(time.perf_counter() - entrada, inicio[0] - entrada)
+
+
+def gerar_hash(senha):
+    return _executar(generate_password_hash, senha, METODO_HASH)
+
+
+def verificar(senha_hash, senha):
+    return _executar(check_password_hash, senha_hash, senha)
+
+
+def precisa_rehash(senha_hash):
+    """True se o hash foi gerado com parâmetros diferentes dos atuais."""
+    metodo = senha_hash.split('$', 1)[0] if senha_hash else ''
+    return metodo != PREFIXO_HASH
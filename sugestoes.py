@@ -0,0 +1,174 @@
+"""
+Sugestões da caixa de busca (enquanto o cliente digita), 100% em memória.
+
+    indice = IndiceSugestoes()
+    indice.carregar(produtos, vendidos)      -> monta tudo (uma vez)
+    indice.sugerir('bat', 8)                 -> 8 produtos mais vendidos que casam com "bat"
+    indice.atualizar(produto) / remover(id)  -> mantém em dia sem recarregar
+
+Cada produto vira algumas chaves SEM acento e em minúsculas: o nome a partir
+de cada palavra ("batom matte rose", "matte rose", "rose") e a categoria.
+As chaves ficam numa lista ordenada; os produtos que começam com um prefixo
+estão todos numa faixa contínua dela, achada com bisect (O(log n)). Os
+resultados por prefixo ficam em cache ("b", "ba", "bat" se repetem muito)
+e só são descartados quando um produto daquele prefixo muda; uma venda
+apenas reposiciona o produto nas listas guardadas.
+
+Quem usa é o model (model.sugerir_produtos), que carrega o índice do banco
+na primeira vez e o atualiza nas funções de escrita do catálogo.
+"""
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+MAX_SUGESTOES = 20     # O cache guarda até este tanto por prefixo
+MAX_PREFIXOS = 2048    # Prefixos guardados no cache (LRU)
+CAMPOS = ('id', 'nome', 'preco', 'imagem', 'categoria')  # O que a caixa de busca mostra
+
+_FIM = '\U0010ffff'  # Maior caractere possível: "prefixo + _FIM" fecha a faixa do bisect
+
+
+def normalizar(texto):
+    """Minúsculas, sem acento e com espaços simples ("  Pó  Compacto" -> "po compacto")."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acento = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acento.casefold().split())
+
+
+def chaves(produto):
+    """Chaves de busca de um produto: o nome a partir de cada palavra e a categoria."""
+    palavras = normalizar(produto.get('nome')).split()
+    resultado = {' '.join(palavras[i:]) for i in range(len(palavras))}
+    categoria = normalizar(produto.get('categoria'))
+    if categoria:
+        resultado.add(categoria)
+    return resultado
+
+
+class IndiceSugestoes:
+    """Lista ordenada de (chave, id) + popularidade (unidades vendidas) por produto."""
+
+    def __init__(self):
+        self.carregado = False
+        self.origem = None         # Banco de onde foi carregado (o model recarrega se mudar)
+        self._lock = threading.Lock()
+        self._entradas = []        # [(chave, id)] em ordem
+        self._produtos = {}        # id -> dict com CAMPOS
+        self._chaves = {}          # id -> chaves do produto (para remover)
+        self._vendidos = {}        # id -> unidades vendidas
+        self._cache = OrderedDict()  # prefixo -> [ids] (os MAX_SUGESTOES melhores)
+
+    def carregar(self, produtos, vendidos, origem=None):
+        """Monta o índice do zero. 'vendidos': {produto_id: unidades}."""
+        entradas = []
+        por_id = {}
+        chaves_por_id = {}
+        for p in produtos:
+            por_id[p['id']] = {c: p.get(c) for c in CAMPOS}
+            chaves_por_id[p['id']] = chaves(p)
+            entradas.extend((c, p['id']) for c in chaves_por_id[p['id']])
+        entradas.sort()
+        with self._lock:
+            self._entradas = entradas
+            self._produtos = por_id
+            self._chaves = chaves_por_id
+            self._vendidos = dict(vendidos)
+            self._cache.clear()
+            self.origem = origem
+            self.carregado = True
+
+    def descartar(self):
+        """Esquece tudo: o próximo uso recarrega do banco."""
+        with self._lock:
+            self.carregado = False
+            self._entradas = []
+            self._produtos = {}
+            self._chaves = {}
+            self._vendidos = {}
+            self._cache.clear()
+
+    def _esquecer_prefixos(self, chaves_afetadas):
+        """Tira do cache os prefixos que casam com alguma das chaves."""
+        for prefixo in [p for p in self._cache if any(c.startswith(p) for c in chaves_afetadas)]:
+            del self._cache[prefixo]
+
+    def _tirar(self, id):
+        antigas = self._chaves.pop(id, set())
+        for chave in antigas:
+            i = bisect_left(self._entradas, (chave, id))
+            if i < len(self._entradas) and self._entradas[i] == (chave, id):
+                del self._entradas[i]
+        self._produtos.pop(id, None)
+        return antigas
+
+    def atualizar(self, produto):
+        """Produto novo ou alterado (nome/categoria/preço...)."""
+        if not self.carregado:
+            return  # Será lido do banco quando carregar
+        with self._lock:
+            antigas = self._tirar(produto['id'])
+            novas = chaves(produto)
+            for chave in novas:
+                insort(self._entradas, (chave, produto['id']))
+            self._produtos[produto['id']] = {c: produto.get(c) for c in CAMPOS}
+            self._chaves[produto['id']] = novas
+            self._esquecer_prefixos(antigas | novas)
+
+    def remover(self, id):
+        if not self.carregado:
+            return
+        with self._lock:
+            self._esquecer_prefixos(self._tirar(id))
+            self._vendidos.pop(id, None)
+
+    def registrar_venda(self, id, quantidade):
+        """Mais vendas = sobe no ranking das sugestões."""
+        if not self.carregado:
+            return
+        with self._lock:
+            self._vendidos[id] = self._vendidos.get(id, 0) + quantidade
+            chaves_produto = self._chaves.get(id, ())
+            # Venda só faz o produto subir: basta reposicioná-lo nas listas do
+            # cache (sem recalcular a faixa inteira a cada venda)
+            for prefixo, ids in self._cache.items():
+                if not any(c.startswith(prefixo) for c in chaves_produto):
+                    continue
+                if id in ids:
+                    ids.remove(id)
+                ids.append(id)
+                ids.sort(key=self._ordem)
+                del ids[MAX_SUGESTOES:]
+
+    def _ordem(self, id):
+        """Mais vendido primeiro; empate -> nome em ordem alfabética."""
+        return -self._vendidos.get(id, 0), self._produtos[id]['nome'] or '', id
+
+    def _melhores(self, prefixo):
+        """IDs dos MAX_SUGESTOES mais vendidos com alguma chave começando com 'prefixo'."""
+        inicio = bisect_left(self._entradas, (prefixo,))
+        fim = bisect_left(self._entradas, (prefixo + _FIM,))
+        ids = {id for _, id in self._entradas[inicio:fim]}
+        return heapq.nsmallest(MAX_SUGESTOES, ids, key=self._ordem)
+
+    def sugerir(self, texto, limite=8):
+        """Até 'limite' produtos (dicts com CAMPOS) que casam com o texto digitado."""
+        prefixo = normalizar(texto)
+        if not prefixo:
+            return []
+        with self._lock:
+            ids = self._cache.get(prefixo)
+            if ids is None:
+                ids = self._melhores(prefixo)
+                self._cache[prefixo] = ids
+                while len(self._cache) > MAX_PREFIXOS:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(prefixo)
+            return [dict(self._produtos[i]) for i in ids[:limite]]
+
+    def estatisticas(self):
+        with self._lock:
+            return {'produtos': len(self._produtos), 'chaves': len(self._entradas),
+                    'prefixos_em_cache': len(self._cache)}
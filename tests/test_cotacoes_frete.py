@@ -0,0 +1,47 @@
+"""Cotação de frete em lote: um item com peso/valor inválido não derruba o lote."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as aplicacao  # noqa: E402
+import migracoes  # noqa: E402
+import model  # noqa: E402
+
+CHAVE = 'chave-teste'
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.setattr(model, 'DB_NAME', str(tmp_path / 'teste.db'))
+    migracoes.migrar()
+    monkeypatch.setattr(aplicacao, 'CHAVES_PARCEIROS', {CHAVE})
+    yield aplicacao.app.test_client()
+    model.close_db_connection()
+
+
+@pytest.mark.parametrize('campo, valor', [
+    ('peso_gramas', 'inf'),
+    ('peso_gramas', '1e400'),
+    ('peso_gramas', 'nan'),
+    ('peso_gramas', -900000),
+    ('subtotal', 'inf'),
+    ('subtotal', -10),
+])
+def test_medida_invalida_volta_erro_no_item(campo, valor):
+    resposta = aplicacao._cotacao_parceiro({'cep': '88010-400', campo: valor})
+    assert resposta == {'cep': '88010-400', 'erro': 'formato inválido'}
+
+
+def test_item_invalido_nao_derruba_o_lote(cliente):
+    resposta = cliente.post('/api/frete/cotacoes', headers={'X-Api-Key': CHAVE}, json={'cotacoes': [
+        {'cep': '88010-400', 'peso_gramas': 'inf'},
+        {'cep': '88010-400', 'peso_gramas': -900000},
+        {'cep': '88010-400', 'peso_gramas': 800, 'subtotal': 120.0},
+    ]})
+    assert resposta.status_code == 200
+    cotacoes = resposta.get_json()['cotacoes']
+    assert [c.get('erro') for c in cotacoes[:2]] == ['formato inválido'] * 2
+    assert cotacoes[2]['valor'] > 0